@@ -1,16 +1,13 @@
 import os
 import sys
-import pandas as pd
-import getopt
 
 pwd = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, os.path.join(pwd, 'py'))
 
+#### only light modules are imported upfront, so that --help and parameter errors do not load pandas or matplotlib;
+#### modules of each stage are imported when the stage starts
 import config_utils
-import visualization_utils as vis_utils
-import utils
-import data_utils
-import tool_builder
+import profile_utils
 
 def PrintPatchWorkLogo():
     print(' _ _ _ _ _ _')
@@ -21,29 +18,74 @@ def PrintPatchWorkLogo():
     print('    |_ _ \\|_|')
     print('          |_|')
 
-def main(command_args):
-    default_params_txt = 'config.txt'
-    config = config_utils.Config(default_params_txt, command_args)
-    utils.PrepareDir(config.output_dir)
+def LoadAlignedDataSnapshot(config):
+    import data_utils
+    import snapshot_utils
+    try:
+        snapshot_meta = snapshot_utils.ReadSnapshotMeta(config)
+        input_data = data_utils.InputData(config.input_csv, snapshot_meta['locus_lens'])
+        return data_utils.AlignedData.FromSnapshot(input_data, config, snapshot_meta)
+    except snapshot_utils.SnapshotError as e:
+        print('ERROR: ' + str(e))
+        sys.exit(1)
 
-    input_data = data_utils.InputData(config.input_csv)
-    utils.PrepareDir(config.align_dir)
-    utils.PrepareDir(config.pairwise_plot_dir)
-
-    aligner_builder = tool_builder.AlignerFactory(config)
-    pairwise_aligner = aligner_builder.GetAligner()
-    aligned_data = data_utils.AlignedData(input_data, pairwise_aligner, config)
-    aligned_data.ReportSummaryAlignmentStats(config.align_stats_csv)
+def RunAlignmentStage(config, profiler):
+    import utils
+    import data_utils
+    import tool_builder
+    import snapshot_utils
+    if config.render_only:
+        with profiler.Stage('LoadSnapshot'):
+            aligned_data = LoadAlignedDataSnapshot(config)
+    else:
+        with profiler.Stage('InputData'):
+            input_data = data_utils.InputData(config.input_csv)
+        utils.PrepareDir(config.align_dir)
+        aligner_builder = tool_builder.AlignerFactory(config, input_data)
+        pairwise_aligner = aligner_builder.GetAligner()
+        aligned_data = data_utils.AlignedData(input_data, pairwise_aligner, config)
+        with profiler.Stage('SaveSnapshot'):
+            snapshot_utils.SaveSnapshot(aligned_data, config)
+    with profiler.Stage('ReportSummaryAlignmentStats'):
+        aligned_data.ReportSummaryAlignmentStats(config.align_stats_csv)
     print('Alignment stage is complete')
+    return aligned_data
 
+def RunVisualizationStage(aligned_data, config, profiler):
+    import utils
+    import tool_builder
+    import visualization_utils as vis_utils
+    import tile_utils
     print('\nVisualizing alignments...')
+    utils.PrepareDir(config.pairwise_plot_dir)
     visualizer_builder = tool_builder.VisualizerBuilder(config, aligned_data)
     plot_visualizer = visualizer_builder.GetPlotVisualizer()
     vis_utils.VisualizePlot(plot_visualizer, aligned_data, config)
-    vis_utils.PlotPairwiseAlignments(plot_visualizer, aligned_data, config)
-
+    with profiler.Stage('PlotPairwiseAlignments'):
+        vis_utils.PlotPairwiseAlignments(plot_visualizer, aligned_data, config)
+    if config.tiles:
+        with profiler.Stage('RenderTiles'):
+            tile_utils.RenderTiles(plot_visualizer, aligned_data, config)
     print('Visualization stage is complete')
 
+def main(command_args):
+    default_params_txt = 'config.txt'
+    config = config_utils.Config(default_params_txt, command_args)
+    import utils
+    utils.PrepareDir(config.output_dir)
+    profiler = profile_utils.profiler
+    if config.profile:
+        profiler.Enable(config.cprofile)
+
+    aligned_data = RunAlignmentStage(config, profiler)
+    if config.serve_port > 0:
+        import server_utils
+        server_utils.Serve(aligned_data, config)
+        return
+
+    RunVisualizationStage(aligned_data, config, profiler)
+    profiler.Write(config.output_dir)
+
     print('\nThank you for using PatchWorkPlot!')
     PrintPatchWorkLogo()
 
@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+pwd = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(pwd, '..', 'py'))
+
+import parser_utils
+
+#### python3 benchmarks/parser_benchmark.py [NUM_ROWS] [MIN_ALIGN_LEN]
+
+def WriteSyntheticPaf(paf_fname, num_rows, seed = 0):
+    rng = np.random.default_rng(seed)
+    target_len = 5000000
+    query_len = 4000000
+    start1 = rng.integers(0, target_len - 50000, num_rows)
+    start2 = rng.integers(0, query_len - 50000, num_rows)
+    lengths = rng.integers(100, 50000, num_rows)
+    matches = (lengths * rng.uniform(0.7, 1.0, num_rows)).astype(int)
+    df = pd.DataFrame({0 : 'query', 1 : query_len, 2 : start2, 3 : start2 + lengths, 4 : rng.choice(['+', '-'], num_rows),
+                       5 : 'target', 6 : target_len, 7 : start1, 8 : start1 + lengths, 9 : matches, 10 : lengths, 11 : 60})
+    df.to_csv(paf_fname, sep = '\t', header = False, index = False)
+
+def LegacyParsePaf(paf_fname, min_align_len):
+    #### the python-engine parser with string identities used before the typed parsers
+    df = pd.read_csv(paf_fname, header=None, sep='\t', usecols=range(10), comment="#", engine="python")
+    df = df.rename(columns={5: '#name1', 4: 'strand1', 7: 'start1', 8: 'end1', 0: 'name2', 2: 'start2+', 3: 'end2+', 9: 'id%'})
+    df['length1'] = (df['end1'].astype(int) - df['start1'].astype(int))
+    df['length2'] = (df['end2+'].astype(int) - df['start2+'].astype(int))
+    df['strand2'] = df['strand1']
+    df['strand1'] = '+'
+    df['id%'] = df['id%'] / df[['length1', 'length2']].min(axis=1) * 100
+    df['id%'] = df['id%'].apply(lambda x: str(round(x, 1)) + '%')
+    df = df.loc[(df['length1'] >= min_align_len) & (df['length2'] >= min_align_len)].reset_index()
+    df['id%'] = [float(df['id%'][i][:-1]) for i in range(len(df))]
+    return df
+
+def TimeCall(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def main(num_rows, min_align_len):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paf_fname = os.path.join(tmp_dir, 'synthetic.paf')
+        WriteSyntheticPaf(paf_fname, num_rows)
+        print('PAF: ' + str(num_rows) + ' rows, ' + str(round(os.path.getsize(paf_fname) / 1024 / 1024, 1)) + ' MB')
+        legacy_time, legacy_df = TimeCall(LegacyParsePaf, paf_fname, min_align_len)
+        typed_time, typed_df = TimeCall(parser_utils.ReadPafTable, paf_fname, '\t', min_align_len)
+        if len(legacy_df) != len(typed_df) or not np.array_equal(legacy_df['id%'].to_numpy(), typed_df['id%'].to_numpy()):
+            print('ERROR: parsers produced different tables')
+            sys.exit(1)
+        print('legacy parser: ' + str(round(legacy_time, 2)) + ' s')
+        print('typed parser:  ' + str(round(typed_time, 2)) + ' s (' + str(round(legacy_time / typed_time, 1)) + 'x)')
+        print('rows kept: ' + str(len(typed_df)))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000, int(sys.argv[2]) if len(sys.argv) > 2 else 5000)
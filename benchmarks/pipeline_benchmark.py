@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import time
+import getopt
+import platform
+import tempfile
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+
+pwd = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(pwd, '..', 'py'))
+
+import config_utils
+import data_utils
+import tool_builder
+import utils
+import profile_utils
+import visualization_utils as vis_utils
+
+#### python3 benchmarks/pipeline_benchmark.py --samples 10 --locus-len 1000000 --aligns 2000 -o results.json [--show-bp] [--lod] [--memory-budget MB] [--baseline old.json]
+
+STAGES = ['InputData', '_ReadAlignments', '_RedefineStrands', '_RedirectAlignments', 'VisualizePlot', 'PlotPairwiseAlignments']
+
+class BenchmarkParams:
+    def __init__(self, command_args):
+        self.num_samples = 5
+        self.locus_len = 500000
+        self.aligns_per_pair = 1000
+        self.min_align_len = 5000
+        self.num_threads = 1
+        self.seed = 0
+        self.output_json = 'benchmark_results.json'
+        self.baseline_json = ''
+        self.tolerance = 1.25
+        self.show_breakpoints = False
+        self.lod = False
+        self.memory_budget = 0
+        opts, args = getopt.getopt(command_args, 'o:', ['samples=', 'locus-len=', 'aligns=', 'min-len=', 'threads=', 'seed=',
+                                                        'baseline=', 'tolerance=', 'show-bp', 'lod', 'memory-budget='])
+        for opt, arg in opts:
+            if opt == '-o':
+                self.output_json = arg
+            elif opt == '--samples':
+                self.num_samples = int(arg)
+            elif opt == '--locus-len':
+                self.locus_len = int(arg)
+            elif opt == '--aligns':
+                self.aligns_per_pair = int(arg)
+            elif opt == '--min-len':
+                self.min_align_len = int(arg)
+            elif opt == '--threads':
+                self.num_threads = int(arg)
+            elif opt == '--seed':
+                self.seed = int(arg)
+            elif opt == '--baseline':
+                self.baseline_json = arg
+            elif opt == '--tolerance':
+                self.tolerance = float(arg)
+            elif opt == '--show-bp':
+                self.show_breakpoints = True
+            elif opt == '--lod':
+                self.lod = True
+            elif opt == '--memory-budget':
+                self.memory_budget = int(arg)
+
+    def ToDict(self):
+        return {'num_samples' : self.num_samples, 'locus_len' : self.locus_len, 'aligns_per_pair' : self.aligns_per_pair,
+                'min_align_len' : self.min_align_len, 'num_threads' : self.num_threads, 'seed' : self.seed,
+                'show_breakpoints' : self.show_breakpoints, 'lod' : self.lod,
+                'memory_budget' : self.memory_budget}
+
+
+class SyntheticDataset:
+    def __init__(self, params, data_dir):
+        self.params = params
+        self.data_dir = data_dir
+        self.rng = np.random.default_rng(params.seed)
+        self.sample_names = ['sample' + str(i) for i in range(params.num_samples)]
+        self.locus_lens = [int(params.locus_len * self.rng.uniform(0.8, 1.2)) for i in range(params.num_samples)]
+        self.config_csv = os.path.join(data_dir, 'config.csv')
+
+    def _WriteFasta(self, fasta, name, seq_len):
+        seq = np.frombuffer(b'ACGT', dtype = np.uint8)[self.rng.integers(0, 4, seq_len)].tobytes().decode()
+        with open(fasta, 'w') as fh:
+            fh.write('>' + name + '\n')
+            for pos in range(0, seq_len, 80):
+                fh.write(seq[pos : pos + 80] + '\n')
+
+    def _WriteBed(self, bed, seq_len):
+        starts = np.sort(self.rng.integers(0, seq_len - 500, max(1, seq_len // 5000)))
+        df = pd.DataFrame({'chrom' : 'NA', 'start' : starts, 'end' : starts + 300})
+        for column in ['name', 'score', 'strand', 'thick_start', 'thick_end']:
+            df[column] = 'NA'
+        df['color'] = '0,0,0'
+        df.to_csv(bed, sep = '\t', header = False, index = False)
+
+    def WriteInputs(self):
+        config_df = {'SampleID' : [], 'Label' : [], 'Fasta' : [], 'Annotation' : [], 'Strand' : []}
+        for name, seq_len in zip(self.sample_names, self.locus_lens):
+            fasta = os.path.join(self.data_dir, name + '.fasta')
+            bed = os.path.join(self.data_dir, name + '.bed')
+            self._WriteFasta(fasta, name, seq_len)
+            self._WriteBed(bed, seq_len)
+            config_df['SampleID'].append(name)
+            config_df['Label'].append(name)
+            config_df['Fasta'].append(fasta)
+            config_df['Annotation'].append(bed)
+            config_df['Strand'].append('')
+        pd.DataFrame(config_df).to_csv(self.config_csv, index = False)
+
+    def _WriteAlignmentTable(self, output_fname, len1, len2):
+        num_aligns = self.params.aligns_per_pair
+        align_lens = self.rng.integers(self.params.min_align_len // 2, self.params.min_align_len * 4, num_aligns)
+        align_lens = np.minimum(align_lens, min(len1, len2) - 2)
+        start1 = self.rng.integers(1, len1 - align_lens)
+        start2 = self.rng.integers(1, len2 - align_lens)
+        df = pd.DataFrame({'#name1' : 'seq1', 'strand1' : '+', 'start1' : start1, 'end1' : start1 + align_lens, 'length1' : align_lens,
+                           'name2' : 'seq2', 'strand2' : self.rng.choice(['+', '-'], num_aligns), 'start2+' : start2,
+                           'end2+' : start2 + align_lens, 'length2' : align_lens})
+        df['id%'] = [str(pi) + '%' for pi in np.round(self.rng.uniform(70, 100, num_aligns), 1)]
+        df.to_csv(output_fname, sep = '\t', index = False)
+
+    def WriteAlignments(self, align_dir):
+        #### tables follow the naming of the custom aligner
+        for i, name1 in enumerate(self.sample_names):
+            for j in range(i, len(self.sample_names)):
+                name2 = self.sample_names[j]
+                if i == j:
+                    output_fname = os.path.join(align_dir, 'self_' + str(i) + '-' + name1 + '.tsv')
+                else:
+                    output_fname = os.path.join(align_dir, 'pair_' + str(i) + '-' + name1 + '_' + str(j) + '-' + name2 + '.tsv')
+                self._WriteAlignmentTable(output_fname, self.locus_lens[i], self.locus_lens[j])
+
+
+class StageTimer:
+    def __init__(self):
+        self.results = dict()
+
+    def Run(self, stage_name, func, *args):
+        sampler = profile_utils.RssSampler()
+        start_rss = profile_utils.GetCurrentRss()
+        sampler.Start()
+        start = time.perf_counter()
+        result = func(*args)
+        wall_time = time.perf_counter() - start
+        peak_rss = sampler.Stop()
+        peak_mb = round(peak_rss / 1024 / 1024, 2)
+        delta_mb = round((peak_rss - start_rss) / 1024 / 1024, 2)
+        self.results[stage_name] = {'wall_s' : round(wall_time, 4), 'peak_rss_mb' : peak_mb, 'peak_rss_growth_mb' : delta_mb}
+        print('  ' + stage_name + ': ' + str(round(wall_time, 3)) + ' s, peak RSS ' + str(peak_mb) + ' MB (+' + str(delta_mb) + ' MB)')
+        return result
+
+
+def BuildAligner(config, input_data):
+    #### AlignerFactory takes input_data since the built-in k-mer aligner was added
+    try:
+        aligner_builder = tool_builder.AlignerFactory(config, input_data)
+    except TypeError:
+        aligner_builder = tool_builder.AlignerFactory(config)
+    return aligner_builder.GetAligner()
+
+def RunPipeline(params, work_dir):
+    dataset = SyntheticDataset(params, work_dir)
+    dataset.WriteInputs()
+    output_dir = os.path.join(work_dir, 'output')
+    config_args = ['-i', dataset.config_csv, '-o', output_dir, '--aligner', 'custom', '--show-annot',
+                   '--threads', str(params.num_threads), '--min-len', str(params.min_align_len), '-v', '0']
+    if params.show_breakpoints:
+        config_args.append('--show-bp')
+    if params.lod:
+        config_args.append('--lod')
+    if params.memory_budget > 0:
+        config_args += ['--memory-budget', str(params.memory_budget)]
+    config = config_utils.Config('', config_args)
+    for dir_name in [config.output_dir, config.align_dir, config.pairwise_plot_dir]:
+        utils.PrepareDir(dir_name)
+    dataset.WriteAlignments(config.align_dir)
+
+    timer = StageTimer()
+    input_data = timer.Run('InputData', data_utils.InputData, config.input_csv)
+    #### the stages of AlignedData are timed separately instead of running its constructor
+    aligned_data = data_utils.AlignedData.__new__(data_utils.AlignedData)
+    aligned_data.input_data = input_data
+    aligned_data.pairwise_aligner = BuildAligner(config, input_data)
+    aligned_data.align_dir = config.align_dir
+    aligned_data.config = config
+    #### the benchmark is also run on older trees for baselines, stages added later are optional
+    if hasattr(aligned_data, '_PrescreenPairs'):
+        aligned_data._PrescreenPairs()
+    aligned_data._PerformPairwiseAlignments()
+    timer.Run('_ReadAlignments', aligned_data._ReadAlignments)
+    timer.Run('_RedefineStrands', aligned_data._RedefineStrands)
+    timer.Run('_RedirectAlignments', aligned_data._RedirectAlignments)
+    plot_visualizer = tool_builder.VisualizerBuilder(config, aligned_data).GetPlotVisualizer()
+    timer.Run('VisualizePlot', vis_utils.VisualizePlot, plot_visualizer, aligned_data, config)
+    timer.Run('PlotPairwiseAlignments', vis_utils.PlotPairwiseAlignments, plot_visualizer, aligned_data, config)
+    return timer.results
+
+def CompareWithBaseline(results, baseline_json, tolerance):
+    with open(baseline_json) as fh:
+        baseline = json.load(fh)
+    regressions = []
+    print('\nComparison with ' + baseline_json + ':')
+    for stage in STAGES:
+        if stage not in baseline['stages'] or stage not in results['stages']:
+            continue
+        old_time = baseline['stages'][stage]['wall_s']
+        new_time = results['stages'][stage]['wall_s']
+        ratio = new_time / old_time if old_time > 0 else 1
+        print('  ' + stage + ': ' + str(round(ratio, 2)) + 'x of baseline time')
+        if ratio > tolerance:
+            regressions.append(stage)
+    return regressions
+
+def main(command_args):
+    params = BenchmarkParams(command_args)
+    print('Running synthetic benchmark: ' + str(params.ToDict()))
+    with tempfile.TemporaryDirectory() as work_dir:
+        stage_results = RunPipeline(params, work_dir)
+    results = {'params' : params.ToDict(),
+               'environment' : {'python' : platform.python_version(), 'numpy' : np.__version__, 'pandas' : pd.__version__,
+                                'matplotlib' : matplotlib.__version__, 'machine' : platform.machine()},
+               'stages' : stage_results}
+    with open(params.output_json, 'w') as fh:
+        json.dump(results, fh, indent = 2)
+    print('Results were written to ' + params.output_json)
+    if params.baseline_json != '':
+        regressions = CompareWithBaseline(results, params.baseline_json, params.tolerance)
+        if len(regressions) != 0:
+            print('ERROR: stages slower than ' + str(params.tolerance) + 'x of the baseline: ' + ', '.join(regressions))
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
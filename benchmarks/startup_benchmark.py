@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import getopt
+import platform
+import tempfile
+import subprocess
+
+pwd = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.join(pwd, '..')
+
+#### python3 benchmarks/startup_benchmark.py -o startup.json [--repeats 5] [--max-ms 300] [--baseline old.json] [--tolerance 1.5]
+
+#### libraries that should be imported only by the stages that use them
+HEAVY_MODULES = ['pandas', 'numpy', 'matplotlib', 'Bio', 'seaborn']
+
+class BenchmarkParams:
+    def __init__(self, command_args):
+        self.repeats = 5
+        self.max_ms = 300
+        self.output_json = 'startup_results.json'
+        self.baseline_json = ''
+        self.tolerance = 1.5
+        opts, args = getopt.getopt(command_args, 'o:', ['repeats=', 'max-ms=', 'baseline=', 'tolerance='])
+        for opt, arg in opts:
+            if opt == '-o':
+                self.output_json = arg
+            elif opt == '--repeats':
+                self.repeats = int(arg)
+            elif opt == '--max-ms':
+                self.max_ms = float(arg)
+            elif opt == '--baseline':
+                self.baseline_json = arg
+            elif opt == '--tolerance':
+                self.tolerance = float(arg)
+
+    def ToDict(self):
+        return {'repeats' : self.repeats, 'max_ms' : self.max_ms, 'tolerance' : self.tolerance}
+
+
+def GetScenarios(work_dir):
+    #### (name, python arguments, modules that should not be imported, whether --max-ms applies)
+    patchworkplot = os.path.join(root_dir, 'PatchWorkPlot.py')
+    alignment_modules = 'import sys; sys.path.insert(0, ' + repr(os.path.join(root_dir, 'py')) + '); import data_utils, tool_builder, snapshot_utils'
+    return [('help', [patchworkplot, '--help'], HEAVY_MODULES, True),
+            ('config_error', [patchworkplot, '-i', os.path.join(work_dir, 'missing.csv'), '-o', os.path.join(work_dir, 'output')], HEAVY_MODULES, True),
+            ('alignment_stage_imports', ['-c', alignment_modules], ['matplotlib', 'Bio', 'seaborn'], False)]
+
+def ParseImportTimes(stderr):
+    #### returns cumulative import times (in microseconds) of top-level imports and names of all imported modules
+    import_times = dict()
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        splits = line[len('import time:'):].split('|')
+        if len(splits) != 3:
+            continue
+        modules.add(splits[2].strip())
+        if not splits[2].startswith('  '):
+            import_times[splits[2].strip()] = int(splits[1])
+    return import_times, modules
+
+def RunScenario(args, repeats):
+    #### the fastest of the repeats is reported, as it is least affected by the other load of the machine
+    best_ms = None
+    modules = set()
+    for i in range(repeats):
+        result = subprocess.run([sys.executable, '-X', 'importtime'] + args, stdout = subprocess.DEVNULL, stderr = subprocess.PIPE, cwd = root_dir)
+        import_times, modules = ParseImportTimes(result.stderr.decode(errors = 'replace'))
+        total_ms = sum(import_times.values()) / 1000
+        best_ms = total_ms if best_ms is None else min(best_ms, total_ms)
+    return round(best_ms, 2), modules
+
+def main(command_args):
+    params = BenchmarkParams(command_args)
+    print('Running startup benchmark: ' + str(params.ToDict()))
+    results = {'params' : params.ToDict(), 'environment' : {'python' : platform.python_version(), 'machine' : platform.machine()},
+               'scenarios' : dict()}
+    failures = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, args, forbidden_modules, time_limited in GetScenarios(work_dir):
+            import_ms, imported = RunScenario(args, params.repeats)
+            heavy_imports = sorted(module for module in imported if module in forbidden_modules)
+            results['scenarios'][name] = {'import_ms' : import_ms, 'heavy_imports' : heavy_imports}
+            print('  ' + name + ': ' + str(import_ms) + ' ms of imports' + ('' if len(heavy_imports) == 0 else ', heavy imports: ' + ', '.join(heavy_imports)))
+            if len(heavy_imports) != 0:
+                failures.append(name + ' imports ' + ', '.join(heavy_imports))
+            if time_limited and import_ms > params.max_ms:
+                failures.append(name + ' takes ' + str(import_ms) + ' ms (limit: ' + str(params.max_ms) + ' ms)')
+    with open(params.output_json, 'w') as fh:
+        json.dump(results, fh, indent = 2)
+    print('Results were written to ' + params.output_json)
+    if params.baseline_json != '':
+        with open(params.baseline_json) as fh:
+            baseline = json.load(fh)
+        print('\nComparison with ' + params.baseline_json + ':')
+        for name, scenario in results['scenarios'].items():
+            if name not in baseline['scenarios'] or baseline['scenarios'][name]['import_ms'] <= 0:
+                continue
+            ratio = scenario['import_ms'] / baseline['scenarios'][name]['import_ms']
+            print('  ' + name + ': ' + str(round(ratio, 2)) + 'x of baseline time')
+            if ratio > params.tolerance:
+                failures.append(name + ' is ' + str(round(ratio, 2)) + 'x slower than the baseline')
+    if len(failures) != 0:
+        print('ERROR: startup regressions: ' + '; '.join(failures))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,30 +1,47 @@
 import os
 import sys
-import pandas as pd
-import py.paf_utils
+import getopt
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 pwd = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, os.path.join(pwd, 'py'))
 
-#### python3 generate_alignment_files.py {alignment.config.tsv} {output} || name 0-x, 1-y
-
-align_config_path = sys.argv[1].split()[0]
-out_dir = sys.argv[2].split()[0]
-
-sep = '\t' if align_config_path.endswith('.tsv') else ','
-align_config = pd.read_csv(align_config_path, sep=sep)
-
-for index, row in align_config.iterrows():
-
-    name_1 = row['name1']
-    name_2 = row['name2']
-    paf_path = row['pafPath']
-
-    print(f'Generating alignment file from {paf_path}...')
-    parser = py.paf_utils.PafReader(paf_path, sep='\t')
-    paf = parser.ParsePaf()
-
-    if name_1 == name_2:
-        paf.to_csv(f'{out_dir}/self_{name_1}.tsv', sep='\t', index=False)
+import paf_utils
+
+#### python3 generate_alignment_files.py {alignment.config.tsv} {output} [--threads N] || name 0-x, 1-y
+
+def main(command_args):
+    align_config_path = command_args[0].split()[0]
+    out_dir = command_args[1].split()[0]
+    num_threads = 1
+    opts, args = getopt.getopt(command_args[2:], '', ['threads='])
+    for opt, arg in opts:
+        if opt == '--threads':
+            num_threads = int(arg)
+
+    align_config = paf_utils.ReadAlignmentConfig(align_config_path)
+
+    conversions = []
+    for index, row in align_config.iterrows():
+        name_1 = row['name1']
+        name_2 = row['name2']
+        if name_1 == name_2:
+            output_tsv = f'{out_dir}/self_{name_1}.tsv'
+        else:
+            output_tsv = f'{out_dir}/pair_{name_1}_{name_2}.tsv'
+        conversions.append((row['pafPath'], output_tsv))
+
+    #### files are converted in chunks, so that each worker keeps a single chunk in memory
+    if num_threads <= 1:
+        for paf_path, output_tsv in conversions:
+            print(f'Generating alignment file from {paf_path}...')
+            paf_utils.ConvertPaf(paf_path, output_tsv)
     else:
-        paf.to_csv(f'{out_dir}/pair_{name_1}_{name_2}.tsv', sep='\t', index=False)
\ No newline at end of file
+        with ProcessPoolExecutor(max_workers = num_threads) as executor:
+            futures = {executor.submit(paf_utils.ConvertPaf, paf_path, output_tsv) : paf_path for paf_path, output_tsv in conversions}
+            for future in as_completed(futures):
+                num_rows = future.result()
+                print(f'Alignment file was generated from {futures[future]} ({num_rows} alignments)')
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,128 @@
+import os
+import sys
+import fcntl
+import shutil
+import hashlib
+import time
+import threading
+import subprocess
+from contextlib import contextmanager
+
+def GetToolVersion(tool_name):
+    try:
+        result = subprocess.run([tool_name, '--version'], stdout = subprocess.PIPE, stderr = subprocess.STDOUT, timeout = 30)
+    except (OSError, subprocess.TimeoutExpired):
+        return 'unknown'
+    lines = result.stdout.decode(errors = 'replace').strip().splitlines()
+    if len(lines) == 0:
+        return 'unknown'
+    return lines[0].strip()
+
+def SameFileStamp(stat1, stat2):
+    return stat1.st_size == stat2.st_size and stat1.st_mtime_ns == stat2.st_mtime_ns
+
+def GetTmpFname(fname):
+    return fname + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp'
+
+def LinkOrCopy(src_fname, dst_fname):
+    #### a hard link does not duplicate the file; it is copied across filesystems or where links are not supported.
+    #### Alignment files are always replaced by new files and never modified in place, so linked files stay intact
+    try:
+        os.link(src_fname, dst_fname)
+    except OSError:
+        shutil.copy2(src_fname, dst_fname)
+
+@contextmanager
+def FileLock(lock_fname, shared = False):
+    with open(lock_fname, 'a') as lock_fh:
+        fcntl.flock(lock_fh, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_fh, fcntl.LOCK_UN)
+
+
+class AlignmentCache:
+    def __init__(self, cache_dir, max_size_mb):
+        self.cache_dir = cache_dir
+        self.max_size = max_size_mb * 1024 * 1024
+        self.entry_dir = os.path.join(cache_dir, 'entries')
+        self.lock_dir = os.path.join(cache_dir, 'locks')
+        self.fasta_hashes = dict()
+        os.makedirs(self.entry_dir, exist_ok = True)
+        os.makedirs(self.lock_dir, exist_ok = True)
+
+    def _HashFasta(self, fasta):
+        stat = os.stat(fasta)
+        file_id = os.path.abspath(fasta), stat.st_size, stat.st_mtime_ns
+        if file_id not in self.fasta_hashes:
+            sha = hashlib.sha256()
+            with open(fasta, 'rb') as fh:
+                for block in iter(lambda : fh.read(1 << 20), b''):
+                    sha.update(block)
+            self.fasta_hashes[file_id] = sha.hexdigest()
+        return self.fasta_hashes[file_id]
+
+    def GetKey(self, fasta1, fasta2, aligner_fingerprint):
+        #### the key does not depend on the order of sequences, so that reordered samples reuse their alignments
+        sha = hashlib.sha256()
+        for item in sorted([self._HashFasta(fasta1), self._HashFasta(fasta2)]) + [aligner_fingerprint]:
+            sha.update(item.encode())
+            sha.update(b'\0')
+        return sha.hexdigest()
+
+    def IsMirrored(self, fasta1, fasta2):
+        #### whether sequences come in the reverse order of their hashes; entries are named by the order they were computed in
+        return self._HashFasta(fasta1) > self._HashFasta(fasta2)
+
+    def _GetEntryFname(self, key, mirrored):
+        return os.path.join(self.entry_dir, key + ('.mirrored' if mirrored else ''))
+
+    @contextmanager
+    def KeyLock(self, key):
+        #### held while an entry is computed, so that concurrent runs wait for the result instead of recomputing it
+        with FileLock(os.path.join(self.lock_dir, key + '.lock')):
+            yield
+
+    def Get(self, key, output_fname, mirrored = False):
+        #### returns None if the pair is not cached, otherwise whether the restored file has sequences in the reverse order
+        with FileLock(os.path.join(self.cache_dir, 'cache.lock'), shared = True):
+            for swapped in [False, True]:
+                entry_fname = self._GetEntryFname(key, mirrored != swapped)
+                if not os.path.exists(entry_fname):
+                    continue
+                entry_stat = os.stat(entry_fname)
+                #### links and copies keep the modification time of the entry, so an up-to-date output file is left untouched
+                if not os.path.exists(output_fname) or not SameFileStamp(os.stat(output_fname), entry_stat):
+                    tmp_fname = GetTmpFname(output_fname)
+                    LinkOrCopy(entry_fname, tmp_fname)
+                    os.replace(tmp_fname, output_fname)
+                #### access time is set explicitly and used for LRU eviction
+                os.utime(entry_fname, ns = (time.time_ns(), entry_stat.st_mtime_ns))
+                return swapped
+        return None
+
+    def Put(self, key, output_fname, mirrored = False):
+        entry_fname = self._GetEntryFname(key, mirrored)
+        tmp_fname = GetTmpFname(entry_fname)
+        LinkOrCopy(output_fname, tmp_fname)
+        with FileLock(os.path.join(self.cache_dir, 'cache.lock')):
+            os.replace(tmp_fname, entry_fname)
+            self._Evict()
+
+    def _Evict(self):
+        if self.max_size <= 0:
+            return
+        entries = []
+        total_size = 0
+        for fname in os.listdir(self.entry_dir):
+            if fname.endswith('.tmp'):
+                continue
+            stat = os.stat(os.path.join(self.entry_dir, fname))
+            entries.append((stat.st_atime, stat.st_size, fname))
+            total_size += stat.st_size
+        for atime, size, fname in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            os.remove(os.path.join(self.entry_dir, fname))
+            total_size -= size
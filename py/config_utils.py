@@ -18,6 +18,20 @@ class Config:
         self.lastz_params = '--step=20 --notransition --allocate:traceback=2130706432'
         self.minimap2_params = '--secondary=yes -P -k 10 -w 5 --no-long-join -r 100 -g 50'
         self.mashmap_params = '--pi 70'
+        self.kmer_size = 15
+        self.kmer_window = 10
+        self.paf_config = ''
+        self.num_threads = 1
+        self.cache_dir = ''
+        self.cache_max_size = 10240
+        self.binary_tables = False
+        self.incremental = False
+        self.aligner_timeout = 0
+        self.batch_align = False
+        self.symmetric_self = False
+        self.memory_budget = 0
+        self.render_only = False
+        self.prescreen_threshold = 0
 
         #### visualization params
         self.pi_min = 85
@@ -34,22 +48,30 @@ class Config:
         self.bp_color = '#7F7F7F'
         self.bp_min_len = 10000
         self.bp_linewidth = 0.2
+        self.lod = False
+        self.lod_color_bins = 32
+        self.tiles = False
+        self.tile_max_zoom = 0
 
         #### output params
         self.transparent = False
         self.output_dir = ''
         self.verbose = 2
+        self.profile = False
+        self.cprofile = False
+        self.serve_port = 0
 
     def _ParseCommandLineParams(self, command_args):
         opts = []
         try:
             opts, args = getopt.getopt(command_args, 'i:o:h:v:',  ['min-pi=', 'max-pi=', 'aligner=',
-                                                               'minimap2-params=', 'mashmap-params=',
+                                                               'minimap2-params=', 'mashmap-params=', 'kmer-size=', 'kmer-window=', 'paf-config=', 'threads=',
+                                                               'cache-dir=', 'cache-size=', 'binary-tables', 'incremental', 'aligner-timeout=', 'batch-align', 'symmetric-self', 'memory-budget=', 'render-only', 'prescreen-threshold=',
                                                                'min-len=', 'cmap=', 'reverse-cmap=',
                                                                'color=', 'lower', 'lwidth=', 'show-annot', 
                                                                'show-bp', 'bp-color=', 'bp-min-len=', 'bp-lwidth=',
-                                                               'transparent', 'help',
-                                                               'verbose=', 'hide-legend'])
+                                                               'lod', 'lod-color-bins=', 'tiles', 'tile-max-zoom=', 'transparent', 'help',
+                                                               'verbose=', 'hide-legend', 'profile', 'cprofile', 'serve='])
         except Exception as e:
             print(f"An error occurred: {e}")
             sys.exit(1)
@@ -68,6 +90,34 @@ class Config:
                 self.minimap2_params = arg
             elif opt == '--mashmap-params':
                 self.mashmap_params = arg
+            elif opt == '--kmer-size':
+                self.kmer_size = int(arg)
+            elif opt == '--kmer-window':
+                self.kmer_window = int(arg)
+            elif opt == '--paf-config':
+                self.paf_config = arg
+            elif opt == '--threads':
+                self.num_threads = int(arg)
+            elif opt == '--cache-dir':
+                self.cache_dir = arg
+            elif opt == '--cache-size':
+                self.cache_max_size = int(arg)
+            elif opt == '--binary-tables':
+                self.binary_tables = True
+            elif opt == '--incremental':
+                self.incremental = True
+            elif opt == '--aligner-timeout':
+                self.aligner_timeout = float(arg)
+            elif opt == '--batch-align':
+                self.batch_align = True
+            elif opt == '--symmetric-self':
+                self.symmetric_self = True
+            elif opt == '--memory-budget':
+                self.memory_budget = int(arg)
+            elif opt == '--render-only':
+                self.render_only = True
+            elif opt == '--prescreen-threshold':
+                self.prescreen_threshold = float(arg)
             elif opt == '--min-len':
                 self.min_align_len = int(arg)
             elif opt == '--cmap':
@@ -90,10 +140,25 @@ class Config:
                 self.bp_min_len = int(arg)
             elif opt == '--bp-lwidth':
                 self.bp_linewidth = float(arg)
+            elif opt == '--lod':
+                self.lod = True
+            elif opt == '--lod-color-bins':
+                self.lod_color_bins = int(arg)
+            elif opt == '--tiles':
+                self.tiles = True
+            elif opt == '--tile-max-zoom':
+                self.tile_max_zoom = int(arg)
             elif opt == '--transparent':
                 self.transparent = True
             elif opt == '--hide-legend':
                 self.hide_legend = True
+            elif opt == '--profile':
+                self.profile = True
+            elif opt == '--cprofile':
+                self.profile = True
+                self.cprofile = True
+            elif opt == '--serve':
+                self.serve_port = int(arg)
             elif opt == '--verbose' or opt == '-v':
                 self.verbose = int(arg)
             elif opt == '--help' or opt == '-h':
@@ -107,10 +172,21 @@ class Config:
         if self.output_dir == '':
             print('ERROR: output directory (-o) was not speficied')
             sys.exit(1)
+        if self.alignment_method == 'kmer' and not (1 <= self.kmer_size <= 31 and self.kmer_window >= 1):
+            print('ERROR: --kmer-size should be between 1 and 31 and --kmer-window should be positive')
+            sys.exit(1)
+        if self.paf_config != '' and (self.alignment_method != 'custom' or not os.path.exists(self.paf_config)):
+            print('ERROR: alignment config \"' + self.paf_config + '\" (--paf-config) was not found or the aligner is not custom')
+            sys.exit(1)
+        if not 0 <= self.prescreen_threshold <= 1:
+            print('ERROR: --prescreen-threshold should be between 0 and 1')
+            sys.exit(1)
 
         self.align_dir = os.path.join(self.output_dir, 'pairwise_alignments')
         self.align_stats_csv = os.path.join(self.output_dir, 'alignment_stats.csv')
         self.pairwise_plot_dir = os.path.join(self.output_dir, 'pairwise_dotplots')
+        self.tile_dir = os.path.join(self.output_dir, 'tiles')
+        self.snapshot_dir = os.path.join(self.output_dir, 'aligned_data_snapshot')
 
     def PrintHelpMessage(self):
         print('python PatchWorkPlot.py -i INPUT_CONFIG -o OUTPUT_DIR {OPTIONAL ARGUMENTS}')
@@ -120,9 +196,23 @@ class Config:
         print('\b')
         print('====OPTIONAL ARGUMENTS====')
         print('====Aligment options====')
-        print('--aligner NAME: choosen alignment tool. Avaliable options: lastz (default), yass, minimap2, mashmap, custom (in case input alignments are provided).')
+        print('--aligner NAME: choosen alignment tool. Avaliable options: lastz (default), yass, minimap2, mashmap, kmer (built-in exact k-mer matches), custom (in case input alignments are provided).')
         print('--minimap2-params "PARAMS": custom parameters. Default minimap2 parameters are set as \"--secondary=yes -P -k 10 -w 5 --no-long-join -r 100 -g 50\".')
         print('--mashmap-params "PARAMS": custom parameters. Default mashmap parameters are set as \"--pi 70\".')
+        print('--kmer-size INT: k-mer size of the kmer aligner, at most 31. Default: 15.')
+        print('--kmer-window INT: the kmer aligner uses the minimizer of each INT consecutive k-mers as a seed. Default: 10.')
+        print('--paf-config CSV: the custom aligner reads alignments from PAF files listed in CSV (columns name1, name2, pafPath) instead of OUTPUT_DIR/pairwise_alignments.')
+        print('--threads INT: total number of CPU threads used by alignment jobs and pairwise plot rendering. Default: 1.')
+        print('--cache-dir DIR: directory of the alignment cache; can be shared by several runs. Default: no cache, existing alignment files are reused.')
+        print('--cache-size INT: maximum size of the alignment cache in MB; least recently used entries are evicted. Default: 10240.')
+        print('--binary-tables: store parsed alignments as memory-mappable .npy columns next to the raw aligner outputs and reuse them in later runs.')
+        print('--batch-align: minimap2 and mashmap align each sequence against all its partners in a single run; minimap2 indices are stored in OUTPUT_DIR/pairwise_alignments/minimap2_index and reused.')
+        print('--symmetric-self: compute self-alignments in the self mode of lastz (--self --nomirror) or minimap2 (-X) and restore the symmetric dot plots from them.')
+        print('--memory-budget INT: memory in MB for alignment tables; tables that do not fit are kept on disk and loaded on demand. Default: 0 (no limit).')
+        print('--prescreen-threshold FLOAT: pairs of sequences sharing a smaller fraction of k-mers according to MinHash sketches are not aligned and are shown as empty panels. Default: 0 (all pairs are aligned).')
+        print('--aligner-timeout SEC: stop the run with an error if a single alignment job takes longer than SEC seconds. Default: 0 (no limit).')
+        print('--render-only: skip the alignment stage and visualize alignments saved in OUTPUT_DIR/aligned_data_snapshot by an earlier run with the same inputs and alignment options.')
+        print('--incremental: name alignment files by SampleID and keep track of them in OUTPUT_DIR/pairwise_alignments/manifest.json; only pairs that were never aligned are computed after adding, removing or reordering samples.')
         print('\n====Visualization options====')
         print('--cmap NAME: coloring map used for visualization. Default: Spectral.')
         print('--reverse-cmap BOOLEAN: reverse the colormap. Default: True.')
@@ -132,6 +222,10 @@ class Config:
         print('--min-len INT: only alignments of lengths exceeding min-len will be visualized. Default: 5000.')
         print('--lwidth FLOAT: the width of lines showing alignments on the final plot. Default: 1.')
         print('--lower: visualize alignments as a lower triangular matrix. Default: False.')
+        print('--lod: level of detail mode; alignments that share the output pixels and the color bin of another alignment with a higher identity are not drawn.')
+        print('--lod-color-bins INT: number of color bins the colormap is split into in the level of detail mode. Default: 32.')
+        print('--tiles: also render the matrix as a pyramid of 256x256 tiles in OUTPUT_DIR/tiles/{zoom}/{x}/{y}.png and write the viewer OUTPUT_DIR/tiles/index.html.')
+        print('--tile-max-zoom INT: the deepest zoom level of tiles. Default: 0 (chosen so that the smallest panel takes at least 512 pixels, at most 8).')
         print('--transparent: the .PNG version of the plot will have a transparent background.')
         print('\n====Additional options====')
         print('--show-annot: visualize annotations from INPUT_CONFIG.CSV (column Annotation). Default: False.')
@@ -140,5 +234,8 @@ class Config:
         print('--bp-color #COLOR: color of breakpoint lines. Default: #7F7F7F (grey).')
         print('--bp-min-len INT: minimum length of alignments used for breakpoint lines. Default: 10000.')
         print('--bp-lwidth FLOAT: the width of breakpoint lines. Default: 0.2.')
+        print('--profile: record wall time, CPU time and peak memory of each stage and alignment job in OUTPUT_DIR/run_metrics.json.')
+        print('--cprofile: same as --profile, and also dump cProfile statistics of the Python stages to OUTPUT_DIR/run_profile.pstats.')
+        print('--serve PORT: after the alignment stage, serve plots on http://127.0.0.1:PORT/ instead of writing them; plots are rendered on request with the visualization options given in the request.')
 
 
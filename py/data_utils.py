@@ -1,32 +1,56 @@
 import os
 import sys
+import time
+import shlex
+import hashlib
+import threading
 import pandas as pd
+import numpy as np
 from collections import Counter
-from Bio import SeqIO
 
 pwd = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, os.path.join(pwd, 'py'))
 import utils
+import parser_utils
+import scheduler_utils
+import cache_utils
+import fasta_utils
+import table_utils
+import profile_utils
+import manifest_utils
+import process_utils
+import store_utils
+import snapshot_utils
+import kmer_utils
 import paf_utils
+import sketch_utils
 
 class InputData:
-    def __init__(self, data_csv):
+    def __init__(self, data_csv, locus_lens = None):
+        #### locus_lens, if given, are known from an earlier run and FASTA files are not scanned
         self.data_csv = data_csv
-        self._InitiateData()
+        self._InitiateData(locus_lens)
 
-    def _InitiateData(self):
+    def _InitiateData(self, locus_lens):
         self.ending = '\t' if self.data_csv.endswith('.tsv') else ','
         self.data_df = pd.read_csv(self.data_csv, sep=self.ending)
-        self.seq_list = []
-        for i in range(len(self.data_df)):
-            seq = [str(r.seq).upper() for r in SeqIO.parse(self.data_df['Fasta'][i], 'fasta')][0]
-            self.seq_list.append(seq)
         self.species_names = list(self.data_df['SampleID'])
-        self.locus_lens = [len(seq) for seq in self.seq_list]
+        if locus_lens is not None and len(locus_lens) == len(self.species_names):
+            self.locus_lens = list(locus_lens)
+        else:
+            #### only lengths are needed upfront: they come from .fai indices or from a streaming scan
+            self.locus_lens = [fasta_utils.GetFirstRecordLength(fasta) for fasta in self.data_df['Fasta']]
+        self.seq_dict = dict()
+        self.gene_tables = dict()
 
     def GetLengthByIdx(self, idx):
         return self.locus_lens[idx]
 
+    def GetSequenceByIdx(self, idx):
+        if idx not in self.seq_dict:
+            self.seq_dict[idx] = fasta_utils.ReadFirstRecord(self.data_df['Fasta'][idx])
+        return self.seq_dict[idx]
+
     def GetSampleNameByIdx(self, idx):
         return self.data_df['SampleID'][idx]
 
@@ -41,115 +65,292 @@ class InputData:
     def GetFastaByIdx(self, idx):
         return self.data_df['Fasta'][idx]
 
+    def GetIdxByFasta(self, fasta):
+        #### the first sample with the FASTA file; samples sharing a file share its sequence
+        return list(self.data_df['Fasta']).index(fasta)
+
     def NumSamples(self):
         return len(self.species_names)
 
     def GetGeneTableByIdx(self, idx):
-        lines = open(self.data_df['Annotation'][idx]).readlines()
-        df = {'Start' : [], 'End' : [], 'Color' : []}
-        for l in lines:
-            splits = l.strip().split()
-            if splits[0] in ['browser', 'track']:
-                continue
-            start_pos = int(splits[1])
-            end_pos = int(splits[2])
+        #### each BED file is parsed once, the table is shared by all pairs of the sample
+        if idx not in self.gene_tables:
+            self.gene_tables[idx] = self._ReadGeneTable(self.data_df['Annotation'][idx])
+        return self.gene_tables[idx]
+
+    def _ReadGeneTable(self, bed_fname):
+        starts = []
+        ends = []
+        color_strs = []
+        with open(bed_fname) as fh:
+            for l in fh:
+                splits = l.split()
+                if len(splits) == 0 or splits[0] in ['browser', 'track']:
+                    continue
+                starts.append(splits[1])
+                ends.append(splits[2])
+                color_strs.append(splits[8] if len(splits) >= 9 else '')
+        color_dict = dict()
+        for color_str in set(color_strs):
             color = 'black'
-            if len(splits) >= 9:
-                color_splits = splits[8].split(',')
+            if color_str != '':
+                color_splits = color_str.split(',')
                 color = utils.rgb2hex(int(color_splits[0]), int(color_splits[1]), int(color_splits[2]))
-            df['Start'].append(start_pos)
-            df['End'].append(end_pos)
-            df['Color'].append(color)
-        return pd.DataFrame(df)
+            color_dict[color_str] = color
+        return pd.DataFrame({'Start' : np.array(starts, dtype = np.int64),
+                             'End' : np.array(ends, dtype = np.int64),
+                             'Color' : [color_dict[c] for c in color_strs]})
 
 
 class LastZPairwiseAligner:
     def __init__(self, config):
         self.config = config
         self.lastz_params = '--step=20 --notransition --format=general:name1,strand1,start1,end1,length1,name2,strand2,start2+,end2+,length2,id%'
+        self.fingerprint = None
+
+    def IsMultithreaded(self):
+        return False
+
+    def SupportsBatches(self):
+        return False
+
+    def GetFingerprint(self):
+        if self.fingerprint is None:
+            self.fingerprint = '\t'.join(['lastz', cache_utils.GetToolVersion('lastz'), self.lastz_params])
+        return self.fingerprint
 
-    def AlignTwoFasta(self, fasta1, fasta2, output_fname):
-        os.system('lastz ' + fasta1 + ' ' + fasta2 + ' ' + self.lastz_params + ' --output=' + output_fname)
+    def _GetStreamParser(self):
+        #### under a memory budget, tables are parsed one at a time after alignment instead of being kept by all jobs
+        if self.config.memory_budget > 0:
+            return None
+        return self.GetAlignedDF
+
+    def AlignTwoFasta(self, fasta1, fasta2, output_fname, num_threads = 1):
+        return process_utils.RunAligner(['lastz', fasta1, fasta2] + shlex.split(self.lastz_params), output_fname,
+                                        stream_parser = self._GetStreamParser(), timeout = self.config.aligner_timeout)
+
+    def SupportsSymmetricSelf(self):
+        return True
+
+    def AlignSelf(self, fasta, output_fname, num_threads = 1):
+        #### neither the trivial self-alignment nor mirror copies of alignments are reported
+        return process_utils.RunAligner(['lastz', fasta, '--self', '--nomirror'] + shlex.split(self.lastz_params), output_fname,
+                                        stream_parser = self._GetStreamParser(), timeout = self.config.aligner_timeout)
+
+    def CompleteSelfAlignment(self, df, seq_len):
+        return parser_utils.CompleteSelfAlignmentTable(df, seq_len, 1, True)
 
     def GetAlignedDF(self, output_fname):
-        return pd.read_csv(output_fname, sep = '\t')
+        return parser_utils.ReadGeneralTable(output_fname, self.config.min_align_len)
 
 class YassPairwiseAligner:
     def __init__(self, config):
         self.config = config
+        self.fingerprint = None
 
-    def AlignTwoFasta(self, fasta1, fasta2, output_fname):
-        os.system('yass -d 2 -o ' + output_fname + ' ' + fasta1 + ' ' + fasta2 + ' > /dev/null 2>&1')
+    def IsMultithreaded(self):
+        return False
 
-    def GetAlignedDF(self, output_fname):
-        lines = open(output_fname).readlines()[1:]
-        df = {'id%' : [], 'start1' : [], 'end1' : [], 'start2' : [], 'end2' : []}
-        for l in lines:
-            splits = l.strip().split()
-            # 0name1	1name2	2id%	3alignment_length	4mismatches	5gap_opening	6start1	7end1	8start2	9end2	eval	bit_score
-            df['id%'].append(splits[2] + '%')
-            df['start1'].append(int(splits[6]))
-            df['end1'].append(int(splits[7]))
-            df['start2'].append(int(splits[8]))
-            df['end2'].append(int(splits[9]))
-        df = pd.DataFrame(df)
-        start_list = []
-        end_list = []
-        strand_list = []
-        for i in range(len(df)):
-            if df['start2'][i] < df['end2'][i]:
-                start_list.append(df['start2'][i])
-                end_list.append(df['end2'][i])
-                strand_list.append('+')
-            else:
-                start_list.append(df['end2'][i])
-                end_list.append(df['start2'][i])
-                strand_list.append('-')
-        df['start2+'] = start_list
-        df['end2+'] = end_list
-        df['strand2'] = strand_list
-        df['length1'] = [abs(df['start1'][i] - df['end1'][i]) for i in range(len(df))]
-        df['length2'] = [abs(df['start2'][i] - df['end2'][i]) for i in range(len(df))]
+    def SupportsSymmetricSelf(self):
+        return False
 
+    def SupportsBatches(self):
+        return False
+
+    def GetFingerprint(self):
+        if self.fingerprint is None:
+            self.fingerprint = '\t'.join(['yass', cache_utils.GetToolVersion('yass'), '-d 2'])
+        return self.fingerprint
+
+    def AlignTwoFasta(self, fasta1, fasta2, output_fname, num_threads = 1):
+        tmp_fname = process_utils.GetTmpFname(output_fname)
+        return process_utils.RunAligner(['yass', '-d', '2', '-o', tmp_fname, fasta1, fasta2], output_fname, tmp_fname = tmp_fname,
+                                        timeout = self.config.aligner_timeout)
+
+    def GetAlignedDF(self, output_fname):
         print('Parsing ' + output_fname + '...')
-        return df
+        return parser_utils.ReadYassTable(output_fname, self.config.min_align_len)
 
 
 class Minimap2Aligner:
     def __init__(self, config):
         self.config = config
-
-    def AlignTwoFasta(self, fasta1, fasta2, output_fname):
-        os.system(f'minimap2 {self.config.minimap2_params} {fasta1} {fasta2} > {output_fname} 2>/dev/null')
+        self.fingerprint = None
+
+    def IsMultithreaded(self):
+        return True
+
+    def GetFingerprint(self):
+        if self.fingerprint is None:
+            self.fingerprint = '\t'.join(['minimap2', cache_utils.GetToolVersion('minimap2'), self.config.minimap2_params])
+        return self.fingerprint
+
+    def _GetStreamParser(self):
+        #### under a memory budget, tables are parsed one at a time after alignment instead of being kept by all jobs
+        if self.config.memory_budget > 0:
+            return None
+        return self.GetAlignedDF
+
+    def AlignTwoFasta(self, fasta1, fasta2, output_fname, num_threads = 1):
+        argv = ['minimap2', '-t', str(num_threads)] + shlex.split(self.config.minimap2_params) + [fasta1, fasta2]
+        return process_utils.RunAligner(argv, output_fname, stream_parser = self._GetStreamParser(), timeout = self.config.aligner_timeout)
+
+    def _GetIndex(self, fasta, num_threads):
+        #### indices are reused by later runs while the FASTA file and parameters are the same
+        stamp = manifest_utils.GetFastaStamp(fasta)
+        index_key = '\t'.join([stamp['path'], str(stamp['size']), str(stamp['mtime_ns']), self.GetFingerprint()])
+        index_dir = os.path.join(self.config.align_dir, 'minimap2_index')
+        index_fname = os.path.join(index_dir, hashlib.sha256(index_key.encode()).hexdigest()[:32] + '.mmi')
+        if not os.path.exists(index_fname):
+            os.makedirs(index_dir, exist_ok = True)
+            tmp_fname = process_utils.GetTmpFname(index_fname)
+            argv = ['minimap2', '-t', str(num_threads)] + shlex.split(self.config.minimap2_params) + ['-d', tmp_fname, fasta]
+            process_utils.RunAligner(argv, index_fname, tmp_fname = tmp_fname, timeout = self.config.aligner_timeout)
+        return index_fname
+
+    def SupportsSymmetricSelf(self):
+        return True
+
+    def AlignSelf(self, fasta, output_fname, num_threads = 1):
+        #### -X skips the trivial self-alignment; mappings of a sequence to itself are still reported in both directions
+        argv = ['minimap2', '-t', str(num_threads)] + shlex.split(self.config.minimap2_params) + ['-X', fasta, fasta]
+        return process_utils.RunAligner(argv, output_fname, stream_parser = self._GetStreamParser(), timeout = self.config.aligner_timeout)
+
+    def CompleteSelfAlignment(self, df, seq_len):
+        return parser_utils.CompleteSelfAlignmentTable(df, seq_len, 0, False)
+
+    def SupportsBatches(self):
+        return True
+
+    def AlignBatch(self, fasta1, query_outputs, num_threads = 1):
+        index_fname = self._GetIndex(fasta1, num_threads)
+        argv = ['minimap2', '-t', str(num_threads)] + shlex.split(self.config.minimap2_params) + [index_fname]
+        return process_utils.RunBatchAligner(lambda query_fasta, tmp_fname : argv + [query_fasta], query_outputs,
+                                             timeout = self.config.aligner_timeout)
 
     def GetAlignedDF(self, output_fname):
-        parser = paf_utils.PafReader(output_fname, sep='\t')
-        df = parser.ParsePaf()
-        return df
+        return parser_utils.ReadPafTable(output_fname, '\t', self.config.min_align_len)
 
 
 class MashmapAligner:
     def __init__(self, config):
         self.config = config
+        self.fingerprint = None
+
+    def IsMultithreaded(self):
+        return True
+
+    def SupportsSymmetricSelf(self):
+        return False
+
+    def GetFingerprint(self):
+        if self.fingerprint is None:
+            self.fingerprint = '\t'.join(['mashmap', cache_utils.GetToolVersion('mashmap'), self.config.mashmap_params])
+        return self.fingerprint
 
-    def AlignTwoFasta(self, fasta1, fasta2, output_fname):
-        os.system(f'mashmap -r {fasta1} -q {fasta2} {self.config.mashmap_params} -o {output_fname} 2>/dev/null')
+    def AlignTwoFasta(self, fasta1, fasta2, output_fname, num_threads = 1):
+        tmp_fname = process_utils.GetTmpFname(output_fname)
+        argv = ['mashmap', '-t', str(num_threads), '-r', fasta1, '-q', fasta2] + shlex.split(self.config.mashmap_params) + ['-o', tmp_fname]
+        return process_utils.RunAligner(argv, output_fname, tmp_fname = tmp_fname, timeout = self.config.aligner_timeout)
+
+    def SupportsBatches(self):
+        return True
+
+    def AlignBatch(self, fasta1, query_outputs, num_threads = 1):
+        #### the reference is sketched once per run of mashmap
+        return process_utils.RunBatchAligner(lambda query_fasta, tmp_fname : ['mashmap', '-t', str(num_threads), '-r', fasta1, '-q', query_fasta] +
+                                             shlex.split(self.config.mashmap_params) + ['-o', tmp_fname],
+                                             query_outputs, output_in_stdout = False, timeout = self.config.aligner_timeout)
 
     def GetAlignedDF(self, output_fname):
-        parser = paf_utils.PafReader(output_fname, sep=' ')
-        df = parser.ParsePaf()
-        return df
+        return parser_utils.ReadPafTable(output_fname, ' ', self.config.min_align_len)
+
+
+class KmerAligner:
+    #### a built-in engine chaining exact k-mer matches; each sequence is indexed once and shared by all its pairs.
+    #### Sequences are taken from input_data, so that each of them is read once for all stages
+    def __init__(self, config, input_data):
+        self.config = config
+        self.input_data = input_data
+        self.lock = threading.Lock()
+        self.indices = dict()
+
+    def IsMultithreaded(self):
+        return False
+
+    def SupportsSymmetricSelf(self):
+        return False
+
+    def SupportsBatches(self):
+        return False
+
+    def GetFingerprint(self):
+        return '\t'.join(['kmer', str(kmer_utils.ENGINE_VERSION), str(self.config.kmer_size), str(self.config.kmer_window)])
+
+    def _GetIndex(self, fasta):
+        idx = self.input_data.GetIdxByFasta(fasta)
+        with self.lock:
+            if idx in self.indices:
+                return self.indices[idx]
+        #### concurrent jobs may index the same sequence at once, only the first index is kept
+        index = kmer_utils.SequenceIndex(fasta_utils.ReadFirstRecordName(fasta), self.input_data.GetSequenceByIdx(idx),
+                                         self.config.kmer_size, self.config.kmer_window)
+        with self.lock:
+            return self.indices.setdefault(idx, index)
+
+    def AlignTwoFasta(self, fasta1, fasta2, output_fname, num_threads = 1):
+        start_time = time.perf_counter()
+        start_cpu_time = time.thread_time()
+        df = kmer_utils.AlignIndices(self._GetIndex(fasta1), self._GetIndex(fasta2), self.config.kmer_size)
+        tmp_fname = process_utils.GetTmpFname(output_fname)
+        df.to_csv(tmp_fname, sep = '\t', index = False)
+        os.replace(tmp_fname, output_fname)
+        return process_utils.AlignerResult(None, time.thread_time() - start_cpu_time, time.perf_counter() - start_time)
+
+    def GetAlignedDF(self, output_fname):
+        return parser_utils.ReadGeneralTable(output_fname, self.config.min_align_len)
 
 
 class CustomAligner:
     def __init__(self, config):
         self.config = config
-
-    def AlignTwoFasta(self, fasta1, fasta2, output_fname):
+        #### PAF files of pairs listed in --paf-config, by pairs of names; otherwise tables are read from the alignment directory
+        self.paf_fnames = None
+        if config.paf_config != '':
+            align_config = paf_utils.ReadAlignmentConfig(config.paf_config)
+            self.paf_fnames = {(str(name1), str(name2)) : paf_fname for name1, name2, paf_fname in
+                               zip(align_config['name1'], align_config['name2'], align_config['pafPath'])}
+
+    def FindPafAlignment(self, names1, names2):
+        #### sequences can be named by SampleID or INDEX-SampleID; returns the PAF file and whether the sequences are swapped in it
+        for name1 in names1:
+            for name2 in names2:
+                if (name1, name2) in self.paf_fnames:
+                    return self.paf_fnames[name1, name2], False
+                if (name2, name1) in self.paf_fnames:
+                    return self.paf_fnames[name2, name1], True
+        return None
+
+    def IsMultithreaded(self):
+        return False
+
+    def SupportsSymmetricSelf(self):
+        return False
+
+    def SupportsBatches(self):
+        return False
+
+    def GetFingerprint(self):
+        return None
+
+    def AlignTwoFasta(self, fasta1, fasta2, output_fname, num_threads = 1):
         print('Alignment stage is skipped.')
+        return None
 
     def GetAlignedDF(self, output_fname):
-        return pd.read_csv(output_fname, sep='\t')
+        if self.paf_fnames is not None:
+            return parser_utils.ReadPafTable(output_fname, '\t', self.config.min_align_len)
+        return parser_utils.ReadGeneralTable(output_fname, self.config.min_align_len)
 
 
 class AlignedData:
@@ -159,52 +360,207 @@ class AlignedData:
         self.align_dir = config.align_dir
         self.config = config
 
+        profiler = profile_utils.profiler
+        with profiler.Stage('PrescreenPairs'):
+            self._PrescreenPairs()
         print('Computing pairwise alignments...')
-        self._PerformPairwiseAlignments()
-        self._ReadAlignments()
+        with profiler.Stage('PerformPairwiseAlignments'):
+            self._PerformPairwiseAlignments()
+        with profiler.Stage('ReadAlignments'):
+            self._ReadAlignments()
 
         print('Redefining strands...')
-        self._RedefineStrands()
+        with profiler.Stage('RedefineStrands'):
+            self._RedefineStrands()
 
         print('Redirecting alignments...')
-        self._RedirectAlignments()
+        with profiler.Stage('RedirectAlignments'):
+            self._RedirectAlignments()
+
+    @classmethod
+    def FromSnapshot(cls, input_data, config, snapshot_meta):
+        #### processed alignments of an earlier run; raises snapshot_utils.SnapshotError if the snapshot is outdated
+        aligned_data = cls.__new__(cls)
+        aligned_data.input_data = input_data
+        aligned_data.pairwise_aligner = None
+        aligned_data.align_dir = config.align_dir
+        aligned_data.config = config
+        aligned_data.align_dfs, aligned_data.strands, aligned_data.pruned_pairs = snapshot_utils.LoadSnapshot(input_data, config, snapshot_meta)
+        return aligned_data
+
+    def _ReadSequenceToSketch(self, idx):
+        #### the built-in aligner indexes the same sequences later, so they are kept in input_data for it.
+        #### External aligners read FASTA files themselves, and sequences are only held while they are sketched
+        if isinstance(self.pairwise_aligner, KmerAligner):
+            return self.input_data.GetSequenceByIdx(idx)
+        return fasta_utils.ReadFirstRecord(self.input_data.GetFastaByIdx(idx))
+
+    def _PrescreenPairs(self):
+        #### pairs of samples sharing too few k-mers are not aligned; self-alignments are always computed
+        self.pruned_pairs = set()
+        if self.config.prescreen_threshold == 0:
+            return
+        if self.pairwise_aligner.GetFingerprint() is None:
+            print('WARNING: prescreen is not supported by the custom aligner and will be ignored')
+            return
+        print('Sketching sequences...')
+        sketches = [sketch_utils.GetSketch(self._ReadSequenceToSketch(i)) for i in range(self.input_data.NumSamples())]
+        for i in range(self.input_data.NumSamples()):
+            for j in range(i + 1, self.input_data.NumSamples()):
+                containment = sketch_utils.GetContainment(sketches[i], sketches[j])
+                if containment < self.config.prescreen_threshold:
+                    self.pruned_pairs.add((i, j))
+                if self.config.verbose == 2:
+                    print('  ' + self.input_data.GetSampleNameByIdx(i) + ' vs ' + self.input_data.GetSampleNameByIdx(j) + ': containment ' + str(round(containment, 4)))
+        num_pairs = self.input_data.NumSamples() * (self.input_data.NumSamples() - 1) // 2
+        print(str(len(self.pruned_pairs)) + ' of ' + str(num_pairs) + ' pairs share less than ' + str(self.config.prescreen_threshold) + ' of k-mers and will not be aligned')
+
+    def _GetAlignmentCache(self):
+        #### without the cache, existing alignment files are reused as they are
+        if self.config.cache_dir == '' or self.pairwise_aligner.GetFingerprint() is None:
+            return None
+        return cache_utils.AlignmentCache(self.config.cache_dir, self.config.cache_max_size)
+
+    def _IsSymmetricSelf(self, idx1, idx2):
+        return idx1 == idx2 and self.config.symmetric_self and self.pairwise_aligner.SupportsSymmetricSelf()
+
+    def _GetPairFingerprint(self, idx1, idx2):
+        #### half self-alignments are stored separately from full ones
+        fingerprint = self.pairwise_aligner.GetFingerprint()
+        if fingerprint is not None and self._IsSymmetricSelf(idx1, idx2):
+            fingerprint += '\tsymmetric-self'
+        return fingerprint
+
+    def _AddAlignmentJob(self, jobs, cache, idx1, idx2, output_fname):
+        fasta1 = self.input_data.GetFastaByIdx(idx1)
+        fasta2 = self.input_data.GetFastaByIdx(idx2)
+        job = scheduler_utils.AlignmentJob(idx1, idx2, fasta1, fasta2, output_fname, self.input_data.GetLengthByIdx(idx1), self.input_data.GetLengthByIdx(idx2))
+        job.symmetric_self = self._IsSymmetricSelf(idx1, idx2)
+        if cache is not None:
+            #### existing files are not trusted: the cache decides whether the pair has to be recomputed
+            job.cache_key = cache.GetKey(fasta1, fasta2, self._GetPairFingerprint(idx1, idx2))
+            job.cache_mirrored = cache.IsMirrored(fasta1, fasta2)
+        elif os.path.exists(output_fname):
+            return
+        jobs.append(job)
+
+    def _GetAlignmentManifest(self):
+        if not self.config.incremental:
+            return None
+        if self.pairwise_aligner.GetFingerprint() is None:
+            print('WARNING: incremental mode is not supported by the custom aligner and will be ignored')
+            return None
+        sample_names = [self.input_data.GetSampleNameByIdx(i) for i in range(self.input_data.NumSamples())]
+        if len(set(sample_names)) != len(sample_names):
+            print('ERROR: values of SampleID should be unique in incremental mode')
+            sys.exit(1)
+        return manifest_utils.AlignmentManifest(self.align_dir, self.pairwise_aligner.GetFingerprint(), self._GetPairFingerprint(0, 0))
+
+    def _GetOutputFname(self, manifest, idx1, idx2):
+        sample_name1 = self.input_data.GetSampleNameByIdx(idx1)
+        sample_name2 = self.input_data.GetSampleNameByIdx(idx2)
+        if manifest is not None:
+            return manifest.GetOutputFname(sample_name1, sample_name2)
+        if idx1 == idx2:
+            return os.path.join(self.align_dir, 'self_' + str(idx1) + '-' + sample_name1 + '.tsv')
+        return os.path.join(self.align_dir, 'pair_' + str(idx1) + '-' + sample_name1 + '_' + str(idx2) + '-' + sample_name2 + '.tsv')
+
+    def _FindStoredAlignment(self, manifest, idx1, idx2):
+        if manifest is None:
+            return False
+        stored = manifest.FindPair(self.input_data.GetSampleNameByIdx(idx1), self.input_data.GetSampleNameByIdx(idx2),
+                                   self.input_data.GetFastaByIdx(idx1), self.input_data.GetFastaByIdx(idx2))
+        if stored is None:
+            return False
+        self.align_dict[idx1, idx2], swapped = stored
+        if swapped:
+            self.swapped_pairs.add((idx1, idx2))
+        return True
+
+    def _FindPafAlignment(self, idx1, idx2):
+        if self.config.paf_config == '':
+            return False
+        names1, names2 = [[str(idx) + '-' + self.input_data.GetSampleNameByIdx(idx), self.input_data.GetSampleNameByIdx(idx)] for idx in [idx1, idx2]]
+        found = self.pairwise_aligner.FindPafAlignment(names1, names2)
+        if found is None:
+            print('ERROR: alignments of ' + names1[1] + ' and ' + names2[1] + ' were not found in ' + self.config.paf_config)
+            sys.exit(1)
+        self.align_dict[idx1, idx2], swapped = found
+        if swapped and idx1 != idx2:
+            self.swapped_pairs.add((idx1, idx2))
+        return True
 
     def _PerformPairwiseAlignments(self):
         self.align_dict = dict()
+        self.swapped_pairs = set()
+        cache = self._GetAlignmentCache()
+        manifest = self._GetAlignmentManifest()
+        jobs = []
+        new_pairs = []
+        #### self dot plots and pairwise dot plots
         for i in range(self.input_data.NumSamples()):
-            if self.config.verbose == 2:
-                print('Aligning ' + self.input_data.GetSampleNameByIdx(i) + '...')
-
-            #self dot plot
-            sample_name1 = self.input_data.GetSampleNameByIdx(i)
-            fasta1 = self.input_data.GetFastaByIdx(i)
-            out_self = os.path.join(self.align_dir, 'self_' + str(i) + '-' + sample_name1 + '.tsv')
-            if not os.path.exists(out_self):
-                self.pairwise_aligner.AlignTwoFasta(fasta1, fasta1, out_self)
-
-            if self.config.verbose == 2:
-                print('  ' + out_self + ' was computed')
-            self.align_dict[i, i] = out_self
-
-            # pairwise dot plots
-            for j in range(i + 1, self.input_data.NumSamples()):
-                sample_name2 = self.input_data.GetSampleNameByIdx(j)
-                fasta2 = self.input_data.GetFastaByIdx(j)
-                out_pair = os.path.join(self.align_dir, 'pair_' + str(i) + '-' + sample_name1 + '_' + str(j) + '-' + sample_name2 + '.tsv')
-                if not os.path.exists(out_pair):
-                    self.pairwise_aligner.AlignTwoFasta(fasta1, fasta2, out_pair)
-                if self.config.verbose == 2:
-                    print('  ' + out_pair + ' was computed')
-                self.align_dict[i, j] = out_pair
+            for j in range(i, self.input_data.NumSamples()):
+                if (i, j) in self.pruned_pairs or self._FindStoredAlignment(manifest, i, j) or self._FindPafAlignment(i, j):
+                    continue
+                output_fname = self._GetOutputFname(manifest, i, j)
+                self._AddAlignmentJob(jobs, cache, i, j, output_fname)
+                self.align_dict[i, j] = output_fname
+                new_pairs.append((i, j))
+
+        if manifest is not None:
+            print(str(len(self.align_dict) - len(new_pairs)) + ' pairs were found in ' + manifest.manifest_json + ', ' + str(len(new_pairs)) + ' pairs will be aligned')
+        scheduler = scheduler_utils.AlignmentScheduler(self.pairwise_aligner, self.config, cache)
+        scheduler.RunJobs(jobs)
+        #### tables parsed while aligners were running are not read from the files again
+        self.streamed_dfs = {(job.idx1, job.idx2) : job.aligned_df for job in jobs if job.aligned_df is not None}
+        #### pairs restored from cache entries of the reverse order are read like swapped pairs of the manifest
+        self.swapped_pairs.update((job.idx1, job.idx2) for job in jobs if job.swapped)
+        if manifest is None:
+            return
+        for i, j in new_pairs:
+            if not os.path.exists(self.align_dict[i, j]):
+                continue
+            #### files of swapped pairs are stored in the manifest in the order of their sequences
+            idx1, idx2 = (j, i) if (i, j) in self.swapped_pairs else (i, j)
+            manifest.AddPair(self.input_data.GetSampleNameByIdx(idx1), self.input_data.GetSampleNameByIdx(idx2),
+                             self.input_data.GetFastaByIdx(idx1), self.input_data.GetFastaByIdx(idx2), self.align_dict[i, j])
+        manifest.Save()
+
+    def _LoadAlignmentTable(self, align_fname, streamed_df = None):
+        if not self.config.binary_tables:
+            return streamed_df if streamed_df is not None else self.pairwise_aligner.GetAlignedDF(align_fname)
+        table_dir = align_fname + '.columns'
+        if os.path.dirname(os.path.abspath(align_fname)) != os.path.abspath(self.align_dir):
+            #### tables of alignment files given by --paf-config are kept in the output directory, e.g., if PAF files are read-only
+            path_hash = hashlib.sha1(os.path.abspath(align_fname).encode()).hexdigest()[:16]
+            table_dir = os.path.join(self.align_dir, 'paf_' + path_hash + '.columns')
+        parser_name = type(self.pairwise_aligner).__name__
+        df = None
+        if streamed_df is None:
+            df = table_utils.LoadParsedTable(table_dir, align_fname, parser_name, self.config.min_align_len)
+        if df is None:
+            df = streamed_df if streamed_df is not None else self.pairwise_aligner.GetAlignedDF(align_fname)
+            table_utils.SaveParsedTable(df, table_dir, align_fname, parser_name, self.config.min_align_len)
+        return df
 
     def _ReadAlignments(self):
-        self.align_dfs = dict()
+        self.align_dfs = store_utils.AlignmentStore(self.config.output_dir, self.config.memory_budget)
         for i in range(self.input_data.NumSamples()):
             for j in range(i, self.input_data.NumSamples()):
-                raw_df = self.pairwise_aligner.GetAlignedDF(self.align_dict[i, j])
+                if (i, j) in self.pruned_pairs:
+                    self.align_dfs[i, j] = parser_utils.EmptyAlignmentTable().reset_index()
+                    continue
+                raw_df = self._LoadAlignmentTable(self.align_dict[i, j], self.streamed_dfs.pop((i, j), None))
+                if (i, j) in self.swapped_pairs:
+                    raw_df = parser_utils.SwapAlignedSequences(raw_df)
+                if self._IsSymmetricSelf(i, j):
+                    raw_df = self.pairwise_aligner.CompleteSelfAlignment(raw_df, self.input_data.GetLengthByIdx(i))
                 df = raw_df.loc[(raw_df['length1'] >= self.config.min_align_len) & (raw_df['length2'] >= self.config.min_align_len)].reset_index()
-                df['id%'] = [float(df['id%'][i][:-1]) for i in range(len(df))]
+                df['id%'] = utils.PercentToFloat(df['id%'])
                 self.align_dfs[i, j] = df
+                profile_utils.profiler.RecordPairRows(i, j, len(df))
+        if self.align_dfs.NumSpilled() != 0:
+            print(str(self.align_dfs.NumSpilled()) + ' of ' + str(len(self.align_dfs)) + ' alignment tables exceed the memory budget and will be loaded from disk on demand')
 
     def _RedefineStrands(self):
         self.strands = ['+']
@@ -228,19 +584,13 @@ class AlignedData:
             len1 = self.input_data.GetLengthByIdx(idx1)
             len2 = self.input_data.GetLengthByIdx(idx2)
             df = self.align_dfs[idx1, idx2]
-            directed_pos_list = []
-            for i in range(len(df)):
-                pos1 = df['start1'][i], df['end1'][i]
-                pos2 = df['start2+'][i], df['end2+'][i]
-                if df['strand2'][i] == '-':
-                    pos2 = df['end2+'][i], df['start2+'][i]
-                pos1 = utils.ModifyPos(pos1[0], len1, self.strands[idx1]) - 1, utils.ModifyPos(pos1[1], len1, self.strands[idx1]) - 1
-                pos2 = utils.ModifyPos(pos2[0], len2, self.strands[idx2]) - 1, utils.ModifyPos(pos2[1], len2, self.strands[idx2]) - 1
-                directed_pos_list.append([pos1[0], pos1[1], pos2[0], pos2[1]])
-            df['start1_dir'] = [p[0] for p in directed_pos_list]
-            df['end1_dir'] = [p[1] for p in directed_pos_list]
-            df['start2_dir'] = [p[2] for p in directed_pos_list]
-            df['end2_dir'] = [p[3] for p in directed_pos_list]
+            reverse2 = (df['strand2'] == '-').to_numpy()
+            start2 = np.where(reverse2, df['end2+'].to_numpy(), df['start2+'].to_numpy())
+            end2 = np.where(reverse2, df['start2+'].to_numpy(), df['end2+'].to_numpy())
+            self.align_dfs.AddColumns((idx1, idx2), {'start1_dir' : utils.ModifyPos(df['start1'].to_numpy(), len1, self.strands[idx1]) - 1,
+                                                     'end1_dir' : utils.ModifyPos(df['end1'].to_numpy(), len1, self.strands[idx1]) - 1,
+                                                     'start2_dir' : utils.ModifyPos(start2, len2, self.strands[idx2]) - 1,
+                                                     'end2_dir' : utils.ModifyPos(end2, len2, self.strands[idx2]) - 1})
 
     def GetLengthByIdx(self, idx):
         return self.input_data.GetLengthByIdx(idx)
@@ -267,17 +617,20 @@ class AlignedData:
         return self.strands[idx]
 
     def ReportSummaryAlignmentStats(self, output_fname):
-        stats_df = {'Label1' : [], 'Label2' : [], 'Idx1' : [], 'Idx2' : [], 'PI' : []}
+        #### pairs pruned by the prescreen are reported by a single row without PI
+        stats_df = {'Label1' : [], 'Label2' : [], 'Idx1' : [], 'Idx2' : [], 'PI' : [], 'Pruned' : []}
         for idx1, idx2 in self.align_dfs:
             if idx1 == idx2:
                 continue
             df = self.align_dfs[idx1, idx2]
-            for i in range(len(df)):
+            pruned = (idx1, idx2) in self.pruned_pairs
+            for i in range(1 if pruned else len(df)):
                 stats_df['Label1'].append(self.GetSampleNameByIdx(idx1))
                 stats_df['Idx1'].append(idx1)
                 stats_df['Label2'].append(self.GetSampleNameByIdx(idx2))
                 stats_df['Idx2'].append(idx2)
-                stats_df['PI'].append(df['id%'][i])
+                stats_df['PI'].append(None if pruned else df['id%'][i])
+                stats_df['Pruned'].append(pruned)
         stats_df = pd.DataFrame(stats_df)
         stats_df.to_csv(output_fname, index = False)
 
@@ -0,0 +1,66 @@
+import os
+import sys
+
+def ReadFaiLength(fasta):
+    fai = fasta + '.fai'
+    if not os.path.exists(fai) or os.path.getmtime(fai) < os.path.getmtime(fasta):
+        return None
+    with open(fai) as fh:
+        splits = fh.readline().strip().split('\t')
+    if len(splits) < 2:
+        return None
+    return int(splits[1])
+
+def ScanFirstRecordLength(fasta, block_size = 1 << 20):
+    seq_len = 0
+    with open(fasta, 'rb') as fh:
+        #### skipping everything up to the end of the first header line
+        line = fh.readline()
+        while line and not line.startswith(b'>'):
+            line = fh.readline()
+        prev_byte = b'\n'
+        while True:
+            block = fh.read(block_size)
+            if not block:
+                break
+            end = 0 if prev_byte == b'\n' and block.startswith(b'>') else block.find(b'\n>')
+            if end != -1:
+                block = block[:end]
+            seq_len += len(block) - block.count(b'\n') - block.count(b'\r') - block.count(b' ')
+            if end != -1:
+                break
+            prev_byte = block[-1:]
+    return seq_len
+
+def GetFirstRecordLength(fasta):
+    seq_len = ReadFaiLength(fasta)
+    if seq_len is None:
+        seq_len = ScanFirstRecordLength(fasta)
+    return seq_len
+
+def ReadFirstRecordName(fasta):
+    with open(fasta) as fh:
+        for line in fh:
+            if line.startswith('>'):
+                splits = line[1:].split()
+                return splits[0] if len(splits) != 0 else ''
+    return ''
+
+def ReadFirstRecord(fasta):
+    #### Biopython is only needed if sequences are read, lengths are known without it
+    from Bio import SeqIO
+    for record in SeqIO.parse(fasta, 'fasta'):
+        return str(record.seq).upper()
+    return ''
+
+def WriteTaggedRecords(tagged_fastas, output_fasta):
+    #### all records of the input files are concatenated; record IDs are prefixed with the tag of their file
+    with open(output_fasta, 'wb') as out_fh:
+        for tag, fasta in tagged_fastas:
+            with open(fasta, 'rb') as fh:
+                for line in fh:
+                    if line.startswith(b'>'):
+                        line = b'>' + tag.encode() + b'|' + line[1:]
+                    elif not line.endswith(b'\n'):
+                        line += b'\n'
+                    out_fh.write(line)
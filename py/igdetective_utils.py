@@ -0,0 +1,67 @@
+import os
+import sys
+import pandas as pd
+
+LOCI = ['IGH', 'IGK', 'IGL', 'TRA', 'TRB', 'TRG']
+BED_COLOR = '0,0,0'
+
+def SplitDirList(dirs_str):
+    #### paths can be separated by spaces or commas
+    return [path for path in dirs_str.replace(',', ' ').split() if path != '']
+
+
+class IgDetectiveSample:
+    #### an output directory of IgDetective; the summary and gene tables are read once and shared by all loci
+    def __init__(self, igdetect_dir, loci):
+        self.igdetect_dir = igdetect_dir
+        self.label = '_'.join(os.path.basename(os.path.normpath(igdetect_dir)).split('_')[:-1])
+        self.locus_dir = os.path.join(igdetect_dir, 'refined_ig_loci')
+        self.summary_df = pd.read_csv(os.path.join(self.locus_dir, 'summary.csv'))
+        self.gene_dfs = dict()
+        for locus in loci:
+            gene_txt = os.path.join(igdetect_dir, 'combined_genes_' + locus + '.txt')
+            if self.HasLocus(locus):
+                self.gene_dfs[locus] = pd.read_csv(gene_txt, sep = '\t', usecols = ['Pos', 'Sequence'])
+
+    def HasLocus(self, locus):
+        #### samples with zero or several loci of the type are skipped
+        return (self.summary_df['Locus'] == locus).sum() == 1
+
+    def _GetLocusRow(self, locus):
+        return self.summary_df.loc[self.summary_df['Locus'] == locus].iloc[0]
+
+    def GetFasta(self, locus):
+        locus_row = self._GetLocusRow(locus)
+        fasta_fname = locus + '_' + locus_row['Contig'] + '_' + str(locus_row['NumV']) + 'Vs.fasta'
+        return os.path.abspath(os.path.join(self.locus_dir, 'igloci_fasta', fasta_fname))
+
+    def WriteBed(self, locus, bed_fname):
+        #### gene positions are converted to coordinates of the locus sequence
+        gene_df = self.gene_dfs[locus]
+        starts = gene_df['Pos'] - self._GetLocusRow(locus)['StartPos']
+        bed_df = pd.DataFrame({'name' : 'NA', 'start' : starts, 'end' : starts + gene_df['Sequence'].str.len()})
+        for column in ['score', 'strand', 'thick_start', 'thick_end', 'rgb']:
+            bed_df[column] = 'NA'
+        bed_df['color'] = BED_COLOR
+        bed_df.to_csv(bed_fname, sep = '\t', header = False, index = False)
+
+
+def ReadSamples(igdetect_dirs, loci):
+    return [IgDetectiveSample(igdetect_dir, loci) for igdetect_dir in igdetect_dirs]
+
+def WriteLocusConfig(samples, locus, output_dir):
+    #### writes BED files of genes and the config of PatchWorkPlot to output_dir; returns the config and the number of samples
+    df = {'SampleID' : [], 'Label' : [], 'Fasta' : [], 'Annotation' : [], 'Strand' : []}
+    for sample in samples:
+        if not sample.HasLocus(locus):
+            continue
+        annot_bed = os.path.abspath(os.path.join(output_dir, sample.label + '.bed'))
+        sample.WriteBed(locus, annot_bed)
+        df['SampleID'].append(sample.label)
+        df['Label'].append(sample.label)
+        df['Fasta'].append(sample.GetFasta(locus))
+        df['Annotation'].append(annot_bed)
+        df['Strand'].append('')
+    output_csv = os.path.join(output_dir, 'config.csv')
+    pd.DataFrame(df).to_csv(output_csv, index = False)
+    return output_csv, len(df['SampleID'])
@@ -0,0 +1,199 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+import parser_utils
+
+#### a part of the fingerprint of alignments, should be increased if the engine produces different alignments
+ENGINE_VERSION = 2
+#### consecutive seeds of a chain are at most MAX_GAP apart along the first sequence and their diagonals differ by at most MAX_DRIFT
+MAX_GAP = 1000
+MAX_DRIFT = 100
+#### the most frequent FREQUENT_SEED_FRACTION of distinct minimizers of a sequence are not used as seeds (as -f of minimap2),
+#### unless they occur at most MIN_OCCURRENCE_CAP times
+FREQUENT_SEED_FRACTION = 0.0002
+MIN_OCCURRENCE_CAP = 10
+#### chains of fewer seeds are random matches of short repeats rather than alignments
+MIN_CHAIN_SEEDS = 4
+INVALID_HASH = np.iinfo(np.uint64).max
+
+def EncodeSequence(seq):
+    #### A, C, G, T are encoded as 0..3, other characters as 4
+    codes = np.full(256, 4, dtype = np.uint8)
+    for code, nucl in enumerate(b'ACGT'):
+        codes[nucl] = code
+        codes[ord(chr(nucl).lower())] = code
+    return codes[np.frombuffer(seq.encode(), dtype = np.uint8)]
+
+def ReverseComplement(codes):
+    complement = np.array([3, 2, 1, 0, 4], dtype = np.uint8)
+    return complement[codes[::-1]]
+
+def GetKmerHashes(codes, k):
+    #### k-mers are packed into 2 bits per nucleotide and mixed by an invertible function, so that distinct k-mers
+    #### have distinct hashes and minimizers are not biased towards poly-A. K-mers with other characters get INVALID_HASH
+    num_kmers = len(codes) - k + 1
+    if num_kmers <= 0:
+        return np.zeros(0, dtype = np.uint64)
+    packed = np.zeros(num_kmers, dtype = np.uint64)
+    for shift in range(k):
+        packed = (packed << np.uint64(2)) | (codes[shift : shift + num_kmers] & 3).astype(np.uint64)
+    hashes = packed * np.uint64(0x9E3779B97F4A7C15)
+    hashes ^= hashes >> np.uint64(29)
+    invalid_prefix = np.concatenate([[0], np.cumsum(codes == 4)])
+    hashes[invalid_prefix[k:] - invalid_prefix[:num_kmers] != 0] = INVALID_HASH
+    return hashes
+
+def GetMinimizers(hashes, window):
+    #### positions of the smallest hash in each window of consecutive k-mers (the leftmost one in case of ties)
+    if len(hashes) < window:
+        positions = np.arange(len(hashes))
+    else:
+        windows = np.lib.stride_tricks.sliding_window_view(hashes, window)
+        #### positions of minimizers of consecutive windows do not decrease, so repeats are adjacent
+        positions = np.argmin(windows, axis = 1) + np.arange(len(windows))
+        positions = positions[np.concatenate([[True], positions[1:] != positions[:-1]])]
+    return positions[hashes[positions] != INVALID_HASH]
+
+
+class SequenceIndex:
+    #### minimizers of a sequence sorted by their hashes, for the forward strand and the reverse complement
+    def __init__(self, name, seq, k, window):
+        self.name = name
+        self.seq_len = len(seq)
+        codes = EncodeSequence(seq)
+        self.forward = self._IndexStrand(codes, k, window)
+        self.reverse = self._IndexStrand(ReverseComplement(codes), k, window)
+        #### positions of forward minimizers are used to estimate identities
+        self.sorted_positions = np.sort(self.forward[1])
+
+    @staticmethod
+    def _IndexStrand(codes, k, window):
+        hashes = GetKmerHashes(codes, k)
+        positions = GetMinimizers(hashes, window)
+        order = np.argsort(hashes[positions], kind = 'stable')
+        return hashes[positions][order], positions[order].astype(np.int64)
+
+
+def GetOccurrenceCap(counts):
+    return max(MIN_OCCURRENCE_CAP, int(np.quantile(counts, 1 - FREQUENT_SEED_FRACTION)))
+
+def FindSharedSeeds(index1, index2):
+    #### all pairs of positions sharing a hash, found by a join of the sorted hash arrays
+    hashes1, positions1 = index1
+    hashes2, positions2 = index2
+    unique1, starts1, counts1 = np.unique(hashes1, return_index = True, return_counts = True)
+    unique2, starts2, counts2 = np.unique(hashes2, return_index = True, return_counts = True)
+    if len(unique1) == 0 or len(unique2) == 0:
+        return np.zeros(0, dtype = np.int64), np.zeros(0, dtype = np.int64)
+    max_occurrences1, max_occurrences2 = GetOccurrenceCap(counts1), GetOccurrenceCap(counts2)
+    shared, shared_idx1, shared_idx2 = np.intersect1d(unique1, unique2, assume_unique = True, return_indices = True)
+    starts1, counts1 = starts1[shared_idx1], counts1[shared_idx1]
+    starts2, counts2 = starts2[shared_idx2], counts2[shared_idx2]
+    frequent = (counts1 > max_occurrences1) | (counts2 > max_occurrences2)
+    starts1, counts1, starts2, counts2 = starts1[~frequent], counts1[~frequent], starts2[~frequent], counts2[~frequent]
+    #### each shared hash gives counts1 * counts2 seeds
+    num_pairs = counts1 * counts2
+    group = np.repeat(np.arange(len(num_pairs)), num_pairs)
+    offset = np.arange(num_pairs.sum()) - np.repeat(np.cumsum(num_pairs) - num_pairs, num_pairs)
+    seeds1 = positions1[starts1[group] + offset // counts2[group]]
+    seeds2 = positions2[starts2[group] + offset % counts2[group]]
+    return seeds1, seeds2
+
+def GetBandRuns(seeds1, seeds2, k):
+    #### seeds in the same band of MAX_DRIFT diagonals closer than MAX_GAP to each other form runs.
+    #### Returns starts, ends, diagonals of the first and the last seeds and numbers of seeds of runs
+    if len(seeds1) == 0:
+        return tuple(np.zeros(0, dtype = np.int64) for i in range(5))
+    diagonals = seeds2 - seeds1
+    bands = diagonals // MAX_DRIFT
+    order = np.lexsort((seeds1, bands))
+    seeds1, diagonals, bands = seeds1[order], diagonals[order], bands[order]
+    run_starts = np.concatenate([[0], np.nonzero((bands[1:] != bands[:-1]) | (seeds1[1:] - seeds1[:-1] > MAX_GAP))[0] + 1])
+    run_ends = np.concatenate([run_starts[1:], [len(seeds1)]])
+    #### isolated seeds are mostly random matches of repeats and are not chained
+    multiple = run_ends - run_starts > 1
+    run_starts, run_ends = run_starts[multiple], run_ends[multiple]
+    return seeds1[run_starts], seeds1[run_ends - 1] + k, diagonals[run_starts], diagonals[run_ends - 1], run_ends - run_starts
+
+def _FindSuccessors(starts, ends, first_diagonals, last_diagonals):
+    #### runs of a band do not overlap, so their ends are sorted along with their starts. For each run, the first run ending
+    #### after it in its band and in both neighbouring bands is a candidate successor, and the one with the smallest gap
+    #### and diagonal shift is chosen. Returns successors (-1 if none) and their scores
+    bands = first_diagonals // MAX_DRIFT
+    band_stride = int(ends.max()) + 1
+    band_offsets = (bands - bands.min() + 1) * band_stride
+    order = np.argsort(band_offsets + ends, kind = 'stable')
+    sorted_keys = (band_offsets + ends)[order]
+    successors = np.full(len(starts), -1, dtype = np.int64)
+    scores = np.full(len(starts), np.iinfo(np.int64).max, dtype = np.int64)
+    for band_shift in [-1, 0, 1]:
+        candidate_pos = np.searchsorted(sorted_keys, band_offsets + band_shift * band_stride + ends, side = 'right')
+        candidates = order[np.minimum(candidate_pos, len(order) - 1)]
+        drifts = np.abs(first_diagonals[candidates] - last_diagonals)
+        valid = (candidate_pos < len(order)) & (bands[candidates] == bands + band_shift) & (drifts <= MAX_DRIFT) & \
+                (starts[candidates] >= starts) & (starts[candidates] <= ends + MAX_GAP)
+        candidate_scores = drifts + np.maximum(0, starts[candidates] - ends)
+        better = valid & (candidate_scores < scores)
+        successors[better], scores[better] = candidates[better], candidate_scores[better]
+    return successors, scores
+
+def ChainRuns(starts, ends, first_diagonals, last_diagonals, num_seeds):
+    #### runs are joined into chains if they follow each other with small gaps and diagonal shifts (indels).
+    #### Each run is linked to its best successor, a run claimed by several predecessors keeps the best one,
+    #### and the resulting paths are labelled by pointer jumping.
+    #### Returns chains as an array of rows [start1, end1, first diagonal, last diagonal, number of seeds]
+    if len(starts) == 0:
+        return np.zeros((0, 5), dtype = np.int64)
+    successors, scores = _FindSuccessors(starts, ends, first_diagonals, last_diagonals)
+    linked = np.nonzero(successors >= 0)[0]
+    linked = linked[np.lexsort((scores[linked], successors[linked]))]
+    best_link = np.ones(len(linked), dtype = bool)
+    best_link[1:] = successors[linked][1:] != successors[linked][:-1]
+    predecessors = np.arange(len(starts))
+    predecessors[successors[linked[best_link]]] = linked[best_link]
+    #### heads of chains are their own predecessors; each run is moved to the head of its chain in log(length) steps
+    heads = predecessors
+    while True:
+        next_heads = heads[heads]
+        if np.array_equal(next_heads, heads):
+            break
+        heads = next_heads
+    #### ends and diagonals of a chain are taken from its rightmost run, since ends grow along a chain
+    order = np.lexsort((ends, heads))
+    heads = heads[order]
+    chain_starts = np.concatenate([[0], np.nonzero(heads[1:] != heads[:-1])[0] + 1])
+    chain_ends = np.concatenate([chain_starts[1:], [len(heads)]])
+    last_runs = order[chain_ends - 1]
+    chain_heads = heads[chain_starts]
+    return np.stack([starts[chain_heads], ends[last_runs], first_diagonals[chain_heads], last_diagonals[last_runs],
+                     np.add.reduceat(num_seeds[order], chain_starts)], axis = 1)
+
+def EstimateIdentity(num_seeds, num_minimizers, k):
+    #### a minimizer is shared by two sequences if its k-mer is conserved, i.e., with the probability identity^k
+    fraction = np.clip(num_seeds / np.maximum(num_minimizers, 1), 0, 1)
+    return np.round(100 * fraction ** (1 / k), 1)
+
+def AlignIndices(index1, index2, k):
+    #### returns the alignment table in the LASTZ general format (1-based closed coordinates)
+    rows = []
+    for strand, strand_index in [('+', index2.forward), ('-', index2.reverse)]:
+        seeds1, seeds2 = FindSharedSeeds(index1.forward, strand_index)
+        chains = ChainRuns(*GetBandRuns(seeds1, seeds2, k))
+        chains = chains[chains[:, 4] >= MIN_CHAIN_SEEDS]
+        if len(chains) == 0:
+            continue
+        start1, end1 = chains[:, 0], np.minimum(chains[:, 1], index1.seq_len)
+        start2, end2 = start1 + chains[:, 2], np.minimum(end1 + chains[:, 3], index2.seq_len)
+        if strand == '-':
+            #### coordinates of the reverse complement are converted to the forward strand
+            start2, end2 = index2.seq_len - end2, index2.seq_len - start2
+        num_minimizers = np.searchsorted(index1.sorted_positions, end1 - k + 1) - np.searchsorted(index1.sorted_positions, start1)
+        identities = EstimateIdentity(chains[:, 4], num_minimizers, k)
+        rows.append(pd.DataFrame({'#name1' : index1.name, 'strand1' : '+', 'start1' : start1 + 1, 'end1' : end1, 'length1' : end1 - start1,
+                                  'name2' : index2.name, 'strand2' : strand, 'start2+' : start2 + 1, 'end2+' : end2, 'length2' : end2 - start2,
+                                  'id%' : [str(identity) + '%' for identity in identities]}))
+    if len(rows) == 0:
+        return pd.DataFrame(columns = parser_utils.ALIGNMENT_COLUMNS)
+    return pd.concat(rows, ignore_index = True)[parser_utils.ALIGNMENT_COLUMNS]
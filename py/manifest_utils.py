@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+
+import cache_utils
+
+MANIFEST_VERSION = 1
+
+def GetFastaStamp(fasta):
+    stat = os.stat(fasta)
+    return {'path' : os.path.abspath(fasta), 'size' : stat.st_size, 'mtime_ns' : stat.st_mtime_ns}
+
+def GetSelfFname(sample_name):
+    return 'self_' + sample_name + '.tsv'
+
+def GetPairFname(sample_name1, sample_name2):
+    return 'pair_' + sample_name1 + '_' + sample_name2 + '.tsv'
+
+
+class AlignmentManifest:
+    #### stored alignments identified by sample IDs, so that they survive adding, removing and reordering samples
+    def __init__(self, align_dir, aligner_fingerprint, self_fingerprint = None):
+        self.align_dir = align_dir
+        self.aligner_fingerprint = aligner_fingerprint
+        self.self_fingerprint = aligner_fingerprint if self_fingerprint is None else self_fingerprint
+        self.manifest_json = os.path.join(align_dir, 'manifest.json')
+        self.lock_fname = os.path.join(align_dir, 'manifest.lock')
+        self.new_entries = dict()
+        with cache_utils.FileLock(self.lock_fname, shared = True):
+            self.entries = self._ReadEntries()
+
+    def _ReadEntries(self):
+        if not os.path.exists(self.manifest_json):
+            return dict()
+        with open(self.manifest_json) as fh:
+            manifest = json.load(fh)
+        if manifest.get('version') != MANIFEST_VERSION:
+            return dict()
+        return {self._GetEntryKey(entry['sample1'], entry['sample2']) : entry for entry in manifest['pairs']}
+
+    @staticmethod
+    def _GetEntryKey(sample_name1, sample_name2):
+        return sample_name1 + '\t' + sample_name2
+
+    def GetOutputFname(self, sample_name1, sample_name2):
+        if sample_name1 == sample_name2:
+            return os.path.join(self.align_dir, GetSelfFname(sample_name1))
+        return os.path.join(self.align_dir, GetPairFname(sample_name1, sample_name2))
+
+    def _GetFingerprint(self, sample_name1, sample_name2):
+        if sample_name1 == sample_name2:
+            return self.self_fingerprint
+        return self.aligner_fingerprint
+
+    def _IsValid(self, entry, fasta1, fasta2):
+        if entry['fingerprint'] != self._GetFingerprint(entry['sample1'], entry['sample2']):
+            return False
+        if entry['fasta1'] != GetFastaStamp(fasta1) or entry['fasta2'] != GetFastaStamp(fasta2):
+            return False
+        return os.path.exists(os.path.join(self.align_dir, entry['file']))
+
+    def FindPair(self, sample_name1, sample_name2, fasta1, fasta2):
+        #### returns the stored alignment file and whether sequences are stored in the reverse order, or None
+        entry = self.entries.get(self._GetEntryKey(sample_name1, sample_name2))
+        if entry is not None and self._IsValid(entry, fasta1, fasta2):
+            return os.path.join(self.align_dir, entry['file']), False
+        entry = self.entries.get(self._GetEntryKey(sample_name2, sample_name1))
+        if entry is not None and self._IsValid(entry, fasta2, fasta1):
+            return os.path.join(self.align_dir, entry['file']), True
+        return None
+
+    def AddPair(self, sample_name1, sample_name2, fasta1, fasta2, output_fname):
+        entry = {'sample1' : sample_name1, 'sample2' : sample_name2, 'file' : os.path.relpath(output_fname, self.align_dir),
+                 'fasta1' : GetFastaStamp(fasta1), 'fasta2' : GetFastaStamp(fasta2), 'fingerprint' : self._GetFingerprint(sample_name1, sample_name2)}
+        key = self._GetEntryKey(sample_name1, sample_name2)
+        self.entries[key] = entry
+        self.new_entries[key] = entry
+
+    def Save(self):
+        #### entries of concurrent runs are merged with the ones added by this run
+        with cache_utils.FileLock(self.lock_fname):
+            entries = self._ReadEntries()
+            entries.update(self.new_entries)
+            tmp_json = self.manifest_json + '.' + str(os.getpid()) + '.tmp'
+            with open(tmp_json, 'w') as fh:
+                json.dump({'version' : MANIFEST_VERSION, 'pairs' : [entries[key] for key in sorted(entries)]}, fh, indent = 1)
+            os.replace(tmp_json, self.manifest_json)
+        self.entries = entries
+        self.new_entries = dict()
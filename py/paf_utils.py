@@ -1,5 +1,18 @@
+import os
 import pandas as pd
 
+import parser_utils
+import process_utils
+
+#### rows of a PAF file converted at once; memory of a conversion does not depend on the size of the file
+CONVERT_CHUNK_SIZE = 200000
+
+def ReadAlignmentConfig(align_config_path):
+    #### a table with columns name1, name2 and pafPath; tab-separated if the extension is .tsv
+    sep = '\t' if align_config_path.endswith('.tsv') else ','
+    return pd.read_csv(align_config_path, sep = sep)
+
+
 class PafReader:
 
     def __init__(self, path, sep):
@@ -7,34 +20,21 @@ class PafReader:
         self.sep = sep
 
     def ParsePaf(self):
-
-        df = pd.read_csv(self.path, header=None, sep=self.sep,
-                         usecols=range(10), comment="#", engine="python")
-
-        df = df.rename(columns={5: '#name1',
-                                4: 'strand1',
-                                7: 'start1',
-                                8: 'end1',
-                                0: 'name2',
-                                2: 'start2+',
-                                3: 'end2+',
-                                9: 'id%'})
-
-#        df['strand2'] = '+'
-
-        df['length1'] = (df['end1'].astype(int) - df['start1'].astype(int))
-        df['length2'] = (df['end2+'].astype(int) - df['start2+'].astype(int))
-
-#        mask = df['strand1'] == '-'
-#        df.loc[mask, ['start2+', 'end2+']] = df.loc[mask, ['end2+', 'start2+']].values
-        df['strand2'] = df['strand1']
-        df['strand1'] = '+'
-
-        if self.sep == '\t':
-            df['id%'] = df['id%'] / df[['length1', 'length2']].min(axis=1) * 100
-        df['id%'] = df['id%'].apply(lambda x: str(round(x, 1)) + '%')
-
-        df = df[['#name1', 'strand1', 'start1', 'end1', 'length1', 'name2',
-                 'strand2', 'start2+', 'end2+', 'length2', 'id%']]
-
+        df = parser_utils.ReadPafTable(self.path, self.sep)
+        #### the text tables written from PAF keep the LASTZ-style percent strings
+        df['id%'] = df['id%'].map(lambda x : str(x) + '%')
         return df
+
+def ConvertPaf(paf_path, output_tsv, sep = '\t'):
+    #### streams the PAF file to an alignment table in chunks; the table is written to a temporary file and renamed at the end.
+    #### Returns the number of alignments
+    tmp_tsv = process_utils.GetTmpFname(output_tsv)
+    num_rows = 0
+    with open(tmp_tsv, 'w') as fh:
+        fh.write('\t'.join(parser_utils.ALIGNMENT_COLUMNS) + '\n')
+        for chunk in parser_utils.IteratePafChunks(paf_path, sep, CONVERT_CHUNK_SIZE):
+            chunk['id%'] = chunk['id%'].astype(str) + '%'
+            chunk.to_csv(fh, sep = '\t', index = False, header = False)
+            num_rows += len(chunk)
+    os.replace(tmp_tsv, output_tsv)
+    return num_rows
@@ -0,0 +1,153 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+ALIGNMENT_COLUMNS = ['#name1', 'strand1', 'start1', 'end1', 'length1', 'name2', 'strand2', 'start2+', 'end2+', 'length2', 'id%']
+CATEGORY_COLUMNS = ['#name1', 'strand1', 'name2', 'strand2']
+CHUNK_SIZE = 1000000
+PAF_DTYPES = {0 : 'str', 2 : 'int64', 3 : 'int64', 4 : 'str', 5 : 'str', 7 : 'int64', 8 : 'int64', 9 : 'float64'}
+
+def EmptyAlignmentTable():
+    df = pd.DataFrame({c : pd.Series(dtype = 'int64') for c in ALIGNMENT_COLUMNS})
+    df['id%'] = df['id%'].astype('float64')
+    for c in CATEGORY_COLUMNS:
+        df[c] = df[c].astype('category')
+    return df
+
+def RoundIdentity(identity):
+    #### rounds to 0.1 like round(x, 1) of the previous text-based output. np.round scales by 10 and may round decimal
+    #### ties such as 85.35 (stored as 85.34999...) up, so values close to ties are rounded by round() one by one
+    rounded = np.round(identity, 1)
+    scaled = identity * 10
+    ties = np.nonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)[0]
+    rounded[ties] = [round(float(value), 1) for value in identity[ties]]
+    return rounded
+
+def _ReadFiltered(source, convert_chunk, min_align_len, **read_args):
+    chunks = []
+    try:
+        reader = pd.read_csv(source, engine = 'c', chunksize = CHUNK_SIZE, **read_args)
+    except pd.errors.EmptyDataError:
+        return EmptyAlignmentTable()
+    for chunk in reader:
+        chunk = convert_chunk(chunk)
+        chunk = chunk.loc[(chunk['length1'].to_numpy() >= min_align_len) & (chunk['length2'].to_numpy() >= min_align_len)]
+        if len(chunk) != 0:
+            #### sequence names repeat in every row, so they are stored as categories already in chunks
+            chunk = chunk[ALIGNMENT_COLUMNS].astype({c : 'category' for c in CATEGORY_COLUMNS})
+            chunks.append(chunk)
+    if len(chunks) == 0:
+        return EmptyAlignmentTable()
+    category_columns = {c : union_categoricals([chunk[c] for chunk in chunks]) for c in CATEGORY_COLUMNS}
+    df = pd.concat([chunk.drop(columns = CATEGORY_COLUMNS) for chunk in chunks], ignore_index = True)
+    for c in CATEGORY_COLUMNS:
+        df[c] = category_columns[c]
+    return df[ALIGNMENT_COLUMNS]
+
+def _ConvertGeneralChunk(chunk):
+    if not pd.api.types.is_numeric_dtype(chunk['id%']):
+        chunk['id%'] = chunk['id%'].str.rstrip('%').astype('float64')
+    return chunk
+
+def ReadGeneralTable(source, min_align_len = 0):
+    #### LASTZ general format and custom alignment tables share the same columns
+    dtypes = {'start1' : 'int64', 'end1' : 'int64', 'length1' : 'int64', 'start2+' : 'int64', 'end2+' : 'int64', 'length2' : 'int64'}
+    return _ReadFiltered(source, _ConvertGeneralChunk, min_align_len, sep = '\t', dtype = dtypes)
+
+def _ConvertYassChunk(chunk):
+    start2 = chunk[8].to_numpy()
+    end2 = chunk[9].to_numpy()
+    reverse = start2 > end2
+    df = pd.DataFrame({'#name1' : chunk[0].to_numpy(), 'name2' : chunk[1].to_numpy(), 'id%' : chunk[2].to_numpy()})
+    df['strand1'] = '+'
+    df['start1'] = chunk[6].to_numpy()
+    df['end1'] = chunk[7].to_numpy()
+    df['start2+'] = np.where(reverse, end2, start2)
+    df['end2+'] = np.where(reverse, start2, end2)
+    df['strand2'] = np.where(reverse, '-', '+')
+    df['length1'] = np.abs(df['start1'].to_numpy() - df['end1'].to_numpy())
+    df['length2'] = np.abs(start2 - end2)
+    return df
+
+def ReadYassTable(source, min_align_len = 0):
+    # 0name1	1name2	2id%	3alignment_length	4mismatches	5gap_opening	6start1	7end1	8start2	9end2	eval	bit_score
+    dtypes = {0 : 'str', 1 : 'str', 2 : 'float64', 6 : 'int64', 7 : 'int64', 8 : 'int64', 9 : 'int64'}
+    return _ReadFiltered(source, _ConvertYassChunk, min_align_len, sep = r'\s+', header = None, skiprows = 1,
+                         usecols = [0, 1, 2, 6, 7, 8, 9], dtype = dtypes)
+
+def _ConvertPafChunk(chunk, matches_column):
+    df = pd.DataFrame({'#name1' : chunk[5].to_numpy(), 'name2' : chunk[0].to_numpy()})
+    df['strand1'] = '+'
+    df['start1'] = chunk[7].to_numpy()
+    df['end1'] = chunk[8].to_numpy()
+    df['strand2'] = chunk[4].to_numpy()
+    df['start2+'] = chunk[2].to_numpy()
+    df['end2+'] = chunk[3].to_numpy()
+    df['length1'] = df['end1'].to_numpy() - df['start1'].to_numpy()
+    df['length2'] = df['end2+'].to_numpy() - df['start2+'].to_numpy()
+    identity = chunk[9].to_numpy(dtype = 'float64')
+    if matches_column:
+        identity = identity / np.minimum(df['length1'].to_numpy(), df['length2'].to_numpy()) * 100
+    #### identities are kept with the precision of the previous text-based output
+    df['id%'] = RoundIdentity(identity)
+    return df
+
+def ReadPafTable(source, sep = '\t', min_align_len = 0):
+    #### tab-separated PAF (minimap2) stores the number of matches in column 9, space-separated one (mashmap) stores identity
+    matches_column = sep == '\t'
+    return _ReadFiltered(source, lambda chunk : _ConvertPafChunk(chunk, matches_column), min_align_len, sep = sep, header = None,
+                         usecols = range(10), comment = '#', dtype = PAF_DTYPES)
+
+def IteratePafChunks(source, sep = '\t', chunk_size = CHUNK_SIZE):
+    #### unfiltered alignment tables of consecutive chunks of a PAF file, for files that do not fit into memory
+    matches_column = sep == '\t'
+    try:
+        reader = pd.read_csv(source, engine = 'c', chunksize = chunk_size, sep = sep, header = None,
+                             usecols = range(10), comment = '#', dtype = PAF_DTYPES)
+    except pd.errors.EmptyDataError:
+        return
+    for chunk in reader:
+        yield _ConvertPafChunk(chunk, matches_column)[ALIGNMENT_COLUMNS]
+
+def SwapAlignedSequences(df):
+    #### alignments of the second sequence against the first one; strands are relative to the new first sequence
+    swapped = pd.DataFrame({'#name1' : df['name2'].to_numpy(), 'strand1' : '+',
+                            'start1' : df['start2+'].to_numpy(), 'end1' : df['end2+'].to_numpy(), 'length1' : df['length2'].to_numpy(),
+                            'name2' : df['#name1'].to_numpy(),
+                            'strand2' : np.where(df['strand1'].astype(str).to_numpy() == df['strand2'].astype(str).to_numpy(), '+', '-'),
+                            'start2+' : df['start1'].to_numpy(), 'end2+' : df['end1'].to_numpy(), 'length2' : df['length1'].to_numpy(),
+                            'id%' : df['id%'].to_numpy()})
+    for c in ['strand1', 'strand2']:
+        swapped[c] = swapped[c].astype('category')
+    return swapped
+
+def SplitTableByQueryTag(combined_fname, output_fnames):
+    #### rows of a PAF-like table of tagged queries (see fasta_utils.WriteTaggedRecords) are split into
+    #### tables of separate queries. output_fnames maps tags to file names; original query names are restored
+    out_fhs = {tag : open(output_fname, 'wb') for tag, output_fname in output_fnames.items()}
+    try:
+        with open(combined_fname, 'rb') as fh:
+            for line in fh:
+                tag, sep_found, line_rest = line.partition(b'|')
+                if sep_found and tag.decode() in out_fhs:
+                    out_fhs[tag.decode()].write(line_rest)
+    finally:
+        for out_fh in out_fhs.values():
+            out_fh.close()
+
+def CompleteSelfAlignmentTable(df, seq_len, origin, add_mirror):
+    #### restores a full self-alignment table from the one computed in the self mode of an aligner:
+    #### mirror copies of alignments (if add_mirror) and the trivial alignment of the sequence to itself are added
+    seq_name = df['#name1'].iloc[0] if len(df) != 0 else ''
+    #### origin is 1 for closed intervals (LASTZ) and 0 for half-open ones (PAF), the end is the same
+    diagonal = pd.DataFrame({'#name1' : [seq_name], 'strand1' : ['+'], 'start1' : [origin], 'end1' : [seq_len], 'length1' : [seq_len],
+                             'name2' : [seq_name], 'strand2' : ['+'], 'start2+' : [origin], 'end2+' : [seq_len], 'length2' : [seq_len], 'id%' : [100.0]})
+    tables = [diagonal, df[ALIGNMENT_COLUMNS]]
+    if add_mirror:
+        tables.append(SwapAlignedSequences(df))
+    complete_df = pd.concat([table.astype({'strand1' : str, 'strand2' : str}) for table in tables], ignore_index = True)
+    for c in ['strand1', 'strand2']:
+        complete_df[c] = complete_df[c].astype('category')
+    return complete_df
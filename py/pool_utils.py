@@ -0,0 +1,30 @@
+import os
+import sys
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+#### pools opened by SharedPools are used by all stages instead of their own pools, e.g., when several plots
+#### are built by one process; each stage still submits at most its own number of workers' tasks ahead
+shared_pools = dict()
+
+@contextmanager
+def WorkerPool(executor_class, num_workers):
+    if executor_class in shared_pools:
+        yield shared_pools[executor_class]
+        return
+    with executor_class(max_workers = num_workers) as executor:
+        yield executor
+
+@contextmanager
+def SharedPools(num_workers):
+    #### a thread pool for aligners and a process pool for rendering that live until the end of the block
+    if num_workers <= 1:
+        yield
+        return
+    with ThreadPoolExecutor(max_workers = num_workers) as thread_pool, ProcessPoolExecutor(max_workers = num_workers) as process_pool:
+        shared_pools[ThreadPoolExecutor] = thread_pool
+        shared_pools[ProcessPoolExecutor] = process_pool
+        try:
+            yield
+        finally:
+            shared_pools.clear()
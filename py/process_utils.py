@@ -0,0 +1,170 @@
+import io
+import os
+import sys
+import time
+import shlex
+import signal
+import tempfile
+import threading
+import subprocess
+
+import fasta_utils
+import parser_utils
+
+STDERR_TAIL_LINES = 20
+
+class AlignerError(Exception):
+    pass
+
+
+class AlignerResult:
+    def __init__(self, aligned_df, cpu_time, wall_time):
+        #### aligned_df is None if the output was not parsed while the aligner was running
+        self.aligned_df = aligned_df
+        self.cpu_time = cpu_time
+        self.wall_time = wall_time
+
+
+class TeeReader(io.RawIOBase):
+    #### a binary stream passing the aligner output to the parser and copying it to the output file
+    def __init__(self, stream, copy_fh):
+        self.stream = stream
+        self.copy_fh = copy_fh
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        num_bytes = self.stream.readinto(buffer)
+        if num_bytes:
+            self.copy_fh.write(memoryview(buffer)[:num_bytes])
+        return num_bytes
+
+
+class ProcessRegistry:
+    #### running aligners are killed at once if one of the jobs fails
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.processes = set()
+        self.stopped = False
+
+    def Add(self, process):
+        with self.lock:
+            if self.stopped:
+                KillProcess(process)
+            self.processes.add(process)
+
+    def Remove(self, process):
+        with self.lock:
+            self.processes.discard(process)
+
+    def KillAll(self):
+        with self.lock:
+            self.stopped = True
+            for process in self.processes:
+                KillProcess(process)
+
+registry = ProcessRegistry()
+
+def KillProcess(process):
+    #### aligners are started in their own process groups, so that wrapper scripts are killed with their children
+    if process.returncode is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+def FormatCommand(argv):
+    return ' '.join(shlex.quote(arg) for arg in argv)
+
+def _ReadTail(fh):
+    fh.seek(0)
+    lines = fh.read().decode(errors = 'replace').strip().splitlines()
+    return '\n'.join(lines[-STDERR_TAIL_LINES:])
+
+def GetTmpFname(output_fname):
+    return output_fname + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp'
+
+def _WaitProcess(process):
+    #### os.wait4 provides resources of this child only, so that CPU time is known also for concurrent jobs
+    pid, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return usage.ru_utime + usage.ru_stime
+
+def RunAligner(argv, output_fname, tmp_fname = None, stream_parser = None, timeout = None):
+    #### runs the aligner and moves its output to output_fname only if it succeeded.
+    #### If tmp_fname is None, stdout is the output; the aligner writes to tmp_fname otherwise.
+    #### stream_parser, if given, reads stdout while the aligner is running
+    output_in_stdout = tmp_fname is None
+    if output_in_stdout:
+        tmp_fname = GetTmpFname(output_fname)
+    timed_out = threading.Event()
+    start_time = time.perf_counter()
+    aligned_df = None
+    parse_error = None
+    with tempfile.TemporaryFile() as stderr_fh:
+        try:
+            process = subprocess.Popen(argv, stdin = subprocess.DEVNULL, stderr = stderr_fh, start_new_session = True,
+                                       stdout = subprocess.PIPE if output_in_stdout else subprocess.DEVNULL)
+        except OSError as e:
+            raise AlignerError('cannot run ' + FormatCommand(argv) + ': ' + str(e))
+        registry.Add(process)
+        timer = None
+        if timeout is not None and timeout > 0:
+            timer = threading.Timer(timeout, lambda : (timed_out.set(), KillProcess(process)))
+            timer.start()
+        try:
+            if output_in_stdout:
+                with open(tmp_fname, 'wb') as tmp_fh:
+                    tee = io.BufferedReader(TeeReader(process.stdout, tmp_fh), 1 << 20)
+                    try:
+                        if stream_parser is not None:
+                            aligned_df = stream_parser(tee)
+                        #### the rest of the output is copied, e.g., if the parser stopped before the end of the stream
+                        for block in iter(lambda : tee.read(1 << 20), b''):
+                            pass
+                    except Exception as e:
+                        KillProcess(process)
+                        parse_error = e
+                    process.stdout.close()
+            cpu_time = _WaitProcess(process)
+        finally:
+            if timer is not None:
+                timer.cancel()
+            registry.Remove(process)
+        if timed_out.is_set() or parse_error is not None or process.returncode != 0:
+            if os.path.exists(tmp_fname):
+                os.remove(tmp_fname)
+            if timed_out.is_set():
+                reason = 'timed out after ' + str(timeout) + ' s'
+            elif parse_error is not None:
+                reason = 'produced an output that cannot be parsed: ' + str(parse_error)
+            else:
+                reason = 'failed with exit code ' + str(process.returncode)
+            raise AlignerError(FormatCommand(argv) + ' ' + reason + '\n' + _ReadTail(stderr_fh))
+    if not os.path.exists(tmp_fname):
+        raise AlignerError(FormatCommand(argv) + ' did not produce an output file')
+    os.replace(tmp_fname, output_fname)
+    return AlignerResult(aligned_df, cpu_time, time.perf_counter() - start_time)
+
+def RunBatchAligner(build_argv, query_outputs, output_in_stdout = True, timeout = None):
+    #### aligns all queries against one reference by a single aligner run. build_argv(query_fasta, output_fname)
+    #### returns the command for the combined query; query_outputs is a list of (query FASTA, output file)
+    work_prefix = GetTmpFname(os.path.join(os.path.dirname(query_outputs[0][1]), 'batch'))
+    query_fasta = work_prefix + '.query.fasta'
+    combined_fname = work_prefix + '.out'
+    tags = ['q' + str(query_idx) for query_idx in range(len(query_outputs))]
+    try:
+        fasta_utils.WriteTaggedRecords([(tag, fasta) for tag, (fasta, output_fname) in zip(tags, query_outputs)], query_fasta)
+        tmp_fname = None if output_in_stdout else GetTmpFname(combined_fname)
+        result = RunAligner(build_argv(query_fasta, tmp_fname), combined_fname, tmp_fname = tmp_fname, timeout = timeout)
+        tmp_outputs = {tag : GetTmpFname(output_fname) for tag, (fasta, output_fname) in zip(tags, query_outputs)}
+        parser_utils.SplitTableByQueryTag(combined_fname, tmp_outputs)
+        for tag, (fasta, output_fname) in zip(tags, query_outputs):
+            os.replace(tmp_outputs[tag], output_fname)
+    finally:
+        for fname in [query_fasta, combined_fname]:
+            if os.path.exists(fname):
+                os.remove(fname)
+    return result
@@ -0,0 +1,130 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import resource
+import threading
+from contextlib import contextmanager
+
+def GetCurrentRss():
+    #### /proc is only available on Linux, elsewhere the process-wide peak is used
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def GetChildrenCpuTime():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def ToMegabytes(num_bytes):
+    return round(num_bytes / 1024 / 1024, 2)
+
+
+class RssSampler:
+    def __init__(self, interval = 0.01):
+        self.interval = interval
+        self.peak_rss = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target = self._Sample, daemon = True)
+
+    def _Sample(self):
+        while not self.stop_event.is_set():
+            self.peak_rss = max(self.peak_rss, GetCurrentRss())
+            self.stop_event.wait(self.interval)
+
+    def Start(self):
+        self.peak_rss = GetCurrentRss()
+        self.thread.start()
+
+    def Stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        self.peak_rss = max(self.peak_rss, GetCurrentRss())
+        return self.peak_rss
+
+
+class RunProfiler:
+    def __init__(self):
+        self.enabled = False
+        self.cprofile = None
+        self.lock = threading.Lock()
+        self.stages = []
+        self.jobs = []
+        self.pair_rows = dict()
+        self.panels = []
+
+    def Enable(self, use_cprofile = False):
+        self.enabled = True
+        if use_cprofile:
+            self.cprofile = cProfile.Profile()
+
+    def IsEnabled(self):
+        return self.enabled
+
+    @contextmanager
+    def Stage(self, stage_name):
+        if not self.enabled:
+            yield
+            return
+        sampler = RssSampler()
+        sampler.Start()
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        start_children_cpu = GetChildrenCpuTime()
+        if self.cprofile is not None:
+            self.cprofile.enable()
+        try:
+            yield
+        finally:
+            if self.cprofile is not None:
+                self.cprofile.disable()
+            peak_rss = sampler.Stop()
+            self.stages.append({'stage' : stage_name,
+                                'wall_s' : round(time.perf_counter() - start_wall, 4),
+                                'cpu_s' : round(time.process_time() - start_cpu, 4),
+                                'children_cpu_s' : round(GetChildrenCpuTime() - start_children_cpu, 4),
+                                'peak_rss_mb' : ToMegabytes(peak_rss)})
+
+    def RecordJob(self, job, wall_time, cpu_time):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.jobs.append({'idx1' : job.idx1, 'idx2' : job.idx2, 'len1' : job.len1, 'len2' : job.len2,
+                              'output' : job.output_fname, 'cached' : job.cached,
+                              'wall_s' : round(wall_time, 4), 'cpu_s' : None if cpu_time is None else round(cpu_time, 4)})
+
+    def RecordPairRows(self, idx1, idx2, num_rows):
+        if self.enabled:
+            self.pair_rows[idx1, idx2] = num_rows
+
+    def RecordPanel(self, figure_name, idx1, idx2, num_artists, num_segments, num_dropped = 0):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.panels.append({'figure' : figure_name, 'idx1' : idx1, 'idx2' : idx2, 'artists' : num_artists,
+                                'segments' : num_segments, 'dropped_segments' : num_dropped})
+
+    def Write(self, output_dir):
+        if not self.enabled:
+            return
+        for job in self.jobs:
+            job['rows'] = self.pair_rows.get((job['idx1'], job['idx2']))
+        metrics = {'stages' : self.stages,
+                   'alignment_jobs' : sorted(self.jobs, key = lambda job : (job['idx1'], job['idx2'])),
+                   'panels' : self.panels,
+                   'peak_rss_mb' : ToMegabytes(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024),
+                   'children_peak_rss_mb' : ToMegabytes(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024)}
+        with open(os.path.join(output_dir, 'run_metrics.json'), 'w') as fh:
+            json.dump(metrics, fh, indent = 2)
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(os.path.join(output_dir, 'run_profile.pstats'))
+
+
+#### a single profiler per process; stages are recorded only after Enable() is called
+profiler = RunProfiler()
+
+def CountArtists(ax):
+    return len(ax.lines) + len(ax.collections) + len(ax.patches)
@@ -0,0 +1,178 @@
+import os
+import sys
+import time
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pool_utils
+import profile_utils
+import process_utils
+
+class AlignmentJob:
+    def __init__(self, idx1, idx2, fasta1, fasta2, output_fname, len1, len2):
+        self.idx1 = idx1
+        self.idx2 = idx2
+        self.fasta1 = fasta1
+        self.fasta2 = fasta2
+        self.output_fname = output_fname
+        self.len1 = len1
+        self.len2 = len2
+        self.cache_key = None
+        self.cache_mirrored = False
+        self.cached = False
+        #### the output file was restored from an entry computed for the reverse order of sequences
+        self.swapped = False
+        self.aligned_df = None
+        self.cpu_time = None
+        self.symmetric_self = False
+
+    def Cost(self):
+        return self.len1 * self.len2
+
+
+class AlignmentBatch:
+    #### jobs sharing the first sequence; batched jobs are aligned by a single run of the aligner
+    def __init__(self, jobs, batched):
+        self.jobs = jobs
+        self.batched = batched
+
+    def Cost(self):
+        return sum(job.Cost() for job in self.jobs)
+
+
+class AlignmentScheduler:
+    def __init__(self, pairwise_aligner, config, cache = None):
+        self.pairwise_aligner = pairwise_aligner
+        self.config = config
+        self.cache = cache
+
+    def _GetWorkerLayout(self, num_jobs):
+        num_threads = max(1, self.config.num_threads)
+        num_workers = max(1, min(num_jobs, num_threads))
+        threads_per_job = 1
+        if self.pairwise_aligner.IsMultithreaded():
+            threads_per_job = max(1, num_threads // num_workers)
+        return num_workers, threads_per_job
+
+    def _Align(self, job, threads_per_job):
+        if job.symmetric_self:
+            result = self.pairwise_aligner.AlignSelf(job.fasta1, job.output_fname, threads_per_job)
+        else:
+            result = self.pairwise_aligner.AlignTwoFasta(job.fasta1, job.fasta2, job.output_fname, threads_per_job)
+        if result is not None:
+            job.aligned_df = result.aligned_df
+            job.cpu_time = result.cpu_time
+
+    def _Restore(self, job):
+        swapped = self.cache.Get(job.cache_key, job.output_fname, job.cache_mirrored)
+        if swapped is None:
+            return False
+        job.cached = True
+        job.swapped = swapped
+        return True
+
+    def _AlignOrRestore(self, job, threads_per_job):
+        if self.cache is None or job.cache_key is None:
+            self._Align(job, threads_per_job)
+            return
+        with self.cache.KeyLock(job.cache_key):
+            if self._Restore(job):
+                return
+            self._Align(job, threads_per_job)
+            if os.path.exists(job.output_fname):
+                self.cache.Put(job.cache_key, job.output_fname, job.cache_mirrored)
+
+    def _RunJob(self, job, threads_per_job, serial):
+        start_wall = time.perf_counter()
+        start_cpu = profile_utils.GetChildrenCpuTime()
+        self._AlignOrRestore(job, threads_per_job)
+        cpu_time = job.cpu_time
+        if cpu_time is None and serial:
+            #### CPU time of processes not started via process_utils can be attributed to a job only if jobs do not overlap
+            cpu_time = profile_utils.GetChildrenCpuTime() - start_cpu
+        profile_utils.profiler.RecordJob(job, time.perf_counter() - start_wall, cpu_time)
+        return job
+
+    def _RunBatch(self, batch, threads_per_job, serial):
+        if not batch.batched:
+            self._RunJob(batch.jobs[0], threads_per_job, serial)
+            return batch
+        start_wall = time.perf_counter()
+        jobs = batch.jobs
+        with ExitStack() as lock_stack:
+            if self.cache is not None:
+                #### locks are taken in the same order by all runs, so that concurrent runs cannot deadlock
+                for cache_key in sorted(set(job.cache_key for job in jobs if job.cache_key is not None)):
+                    lock_stack.enter_context(self.cache.KeyLock(cache_key))
+                for job in jobs:
+                    job.cached = job.cache_key is not None and self._Restore(job)
+            jobs = [job for job in jobs if not job.cached]
+            result = None
+            if len(jobs) != 0:
+                result = self.pairwise_aligner.AlignBatch(jobs[0].fasta1, [(job.fasta2, job.output_fname) for job in jobs], threads_per_job)
+            for job in jobs:
+                if self.cache is not None and job.cache_key is not None and os.path.exists(job.output_fname):
+                    self.cache.Put(job.cache_key, job.output_fname, job.cache_mirrored)
+        #### time of a batch is shared by its jobs proportionally to their costs
+        wall_time = time.perf_counter() - start_wall
+        total_cost = max(1, sum(job.Cost() for job in jobs))
+        for job in batch.jobs:
+            share = job.Cost() / total_cost if not job.cached else 0
+            cpu_time = result.cpu_time * share if result is not None else None
+            profile_utils.profiler.RecordJob(job, wall_time * share, cpu_time)
+        return batch
+
+    def _GetBatches(self, jobs):
+        if not self.config.batch_align or not self.pairwise_aligner.SupportsBatches():
+            return [AlignmentBatch([job], False) for job in jobs]
+        #### self-alignments in the symmetric mode use other aligner options and run separately
+        batches = [AlignmentBatch([job], False) for job in jobs if job.symmetric_self]
+        jobs_by_reference = dict()
+        for job in jobs:
+            if not job.symmetric_self:
+                jobs_by_reference.setdefault(job.idx1, []).append(job)
+        return batches + [AlignmentBatch(ref_jobs, True) for ref_jobs in jobs_by_reference.values()]
+
+    def _ReportBatch(self, batch):
+        for job in batch.jobs:
+            self._ReportJob(job)
+
+    def _ReportJob(self, job):
+        if self.config.verbose != 2:
+            return
+        if job.cached:
+            print('  ' + job.output_fname + ' was taken from the cache')
+        else:
+            print('  ' + job.output_fname + ' was computed')
+
+    def _ReportFailure(self, error):
+        #### other aligners are stopped at once, finished results stay in the cache
+        process_utils.registry.KillAll()
+        print('ERROR: alignment job failed: ' + str(error))
+        sys.exit(1)
+
+    def RunJobs(self, jobs):
+        if len(jobs) == 0:
+            return
+        #### largest jobs go first, so that the longest ones do not end up running alone at the end
+        batches = sorted(self._GetBatches(jobs), key = lambda batch : batch.Cost(), reverse = True)
+        num_workers, threads_per_job = self._GetWorkerLayout(len(batches))
+        if self.config.verbose == 2:
+            print('Running ' + str(len(jobs)) + ' alignment jobs in ' + str(len(batches)) + ' aligner runs: ' + str(num_workers) + ' worker(s), ' + str(threads_per_job) + ' thread(s) per run')
+        if num_workers == 1:
+            for batch in batches:
+                try:
+                    self._ReportBatch(self._RunBatch(batch, threads_per_job, True))
+                except process_utils.AlignerError as e:
+                    self._ReportFailure(e)
+            return
+        with pool_utils.WorkerPool(ThreadPoolExecutor, num_workers) as executor:
+            futures = [executor.submit(self._RunBatch, batch, threads_per_job, False) for batch in batches]
+            for future in as_completed(futures):
+                try:
+                    self._ReportBatch(future.result())
+                except process_utils.AlignerError as e:
+                    #### pending runs are cancelled one by one, since the pool can be shared with other stages
+                    for pending_future in futures:
+                        pending_future.cancel()
+                    self._ReportFailure(e)
@@ -0,0 +1,260 @@
+import io
+import os
+import sys
+import copy
+import threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+import matplotlib as mplt
+mplt.use('Agg')
+import matplotlib.pyplot as plt
+
+import tool_builder
+import visualization_utils as vis_utils
+
+RENDER_CACHE_MB = 256
+DEFAULT_DPI = 100
+MAX_DPI = 300
+
+def ParseFlag(value):
+    #### flags of requests are given explicitly, so that a flag set on the command line can be switched off
+    if value.lower() in ['1', 'true']:
+        return True
+    if value.lower() in ['0', 'false']:
+        return False
+    raise ValueError('values of flags should be 0 or 1, got ' + value)
+
+#### visualization options that can be given in requests, with the config attributes they set and parsers of their values
+VIEW_OPTIONS = {'min-pi' : ('pi_min', float), 'max-pi' : ('pi_max', float), 'cmap' : ('cmap', str),
+                'reverse-cmap' : ('cmap_reverse', ParseFlag), 'color' : ('color', str), 'lwidth' : ('linewidth', float),
+                'lower' : ('upper_triangle', lambda value : not ParseFlag(value)), 'show-bp' : ('show_breakpoints', ParseFlag),
+                'bp-color' : ('bp_color', str), 'bp-min-len' : ('bp_min_len', int), 'bp-lwidth' : ('bp_linewidth', float),
+                'lod' : ('lod', ParseFlag), 'lod-color-bins' : ('lod_color_bins', int), 'hide-legend' : ('hide_legend', ParseFlag),
+                'transparent' : ('transparent', ParseFlag)}
+#### rendered images are cached by values of these attributes
+VIEW_ATTRIBUTES = [attribute for attribute, parser in VIEW_OPTIONS.values()]
+
+INDEX_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>PatchWorkPlot</title>
+<style>
+body { font-family: sans-serif; margin: 12px; }
+form { margin-bottom: 12px; }
+label { margin-right: 12px; }
+input[type=text] { width: 70px; }
+img { max-width: 100%; border: 1px solid #ddd; }
+</style>
+</head>
+<body>
+<form id="params">
+<label>view <select name="view">%PANEL_OPTIONS%</select></label>
+<label>min-pi <input type="text" name="min-pi" value="%MIN_PI%"></label>
+<label>max-pi <input type="text" name="max-pi" value="%MAX_PI%"></label>
+<label>cmap <input type="text" name="cmap" value="%CMAP%"></label>
+<label>color <input type="text" name="color" value="%COLOR%"></label>
+<label>lwidth <input type="text" name="lwidth" value="%LWIDTH%"></label>
+<label>dpi <input type="text" name="dpi" value="%DPI%"></label>
+<label><input type="checkbox" name="lower"%LOWER%> lower</label>
+<label><input type="checkbox" name="show-bp"%SHOW_BP%> show-bp</label>
+<label><input type="checkbox" name="lod"%LOD%> lod</label>
+<label><input type="checkbox" name="transparent"%TRANSPARENT%> transparent</label>
+<span id="status"></span>
+</form>
+<img id="plot">
+<script>
+const form = document.getElementById('params');
+const plot = document.getElementById('plot');
+const status = document.getElementById('status');
+function Update() {
+  const params = new URLSearchParams();
+  for (const element of form.elements) {
+    if (element.name === 'view' || element.name === '') {
+      continue;
+    }
+    if (element.type === 'checkbox') {
+      params.set(element.name, element.checked ? '1' : '0');
+    } else if (element.value !== '') {
+      params.set(element.name, element.value);
+    }
+  }
+  const view = form.elements['view'].value;
+  status.textContent = 'rendering...';
+  const start = performance.now();
+  plot.onload = () => { status.textContent = 'rendered in ' + Math.round(performance.now() - start) + ' ms'; };
+  plot.onerror = () => { status.textContent = 'cannot render the plot, check the parameters'; };
+  plot.src = view + (view.includes('?') ? '&' : '?') + params.toString();
+}
+form.addEventListener('change', Update);
+form.addEventListener('submit', (event) => { event.preventDefault(); Update(); });
+Update();
+</script>
+</body>
+</html>
+"""
+
+class RenderCache:
+    #### rendered PNG images in the least recently used order, limited by their total size
+    def __init__(self, max_size_mb):
+        self.max_size = max_size_mb * 1024 * 1024
+        self.lock = threading.Lock()
+        self.images = OrderedDict()
+        self.size = 0
+
+    def Get(self, key):
+        with self.lock:
+            if key not in self.images:
+                return None
+            self.images.move_to_end(key)
+            return self.images[key]
+
+    def Put(self, key, image):
+        with self.lock:
+            if key in self.images:
+                return
+            self.images[key] = image
+            self.size += len(image)
+            while self.size > self.max_size and len(self.images) > 1:
+                old_key, old_image = self.images.popitem(last = False)
+                self.size -= len(old_image)
+
+
+class PlotServer:
+    #### renders the matrix and pairwise plots of alignments loaded once with the visualization options of each request
+    def __init__(self, aligned_data, config):
+        self.aligned_data = aligned_data
+        self.config = config
+        self.cache = RenderCache(RENDER_CACHE_MB)
+        #### pyplot keeps global state, so plots are rendered one at a time
+        self.render_lock = threading.Lock()
+        self.plot_utils = dict()
+
+    def GetViewConfig(self, query):
+        #### options of the query override the command line ones; raises ValueError if an option is unknown or its value cannot be parsed
+        view_config = copy.copy(self.config)
+        for option, values in query.items():
+            if option == 'dpi' or option == 'idx1' or option == 'idx2':
+                continue
+            if option not in VIEW_OPTIONS:
+                raise ValueError('unknown option ' + option)
+            attribute, parser = VIEW_OPTIONS[option]
+            setattr(view_config, attribute, parser(values[-1]))
+        return view_config
+
+    def GetPlotUtils(self, view_config):
+        #### gene tracks are computed once per triangle
+        if view_config.upper_triangle not in self.plot_utils:
+            self.plot_utils[view_config.upper_triangle] = tool_builder.VisualizerBuilder(view_config, self.aligned_data).GetPlotVisualizer()
+        return self.plot_utils[view_config.upper_triangle]
+
+    @staticmethod
+    def GetDpi(query):
+        dpi = int(query.get('dpi', [DEFAULT_DPI])[-1])
+        if dpi <= 0 or dpi > MAX_DPI:
+            raise ValueError('dpi should be between 1 and ' + str(MAX_DPI))
+        return dpi
+
+    def GetPairIndices(self, query):
+        idx1 = int(query['idx1'][-1])
+        idx2 = int(query['idx2'][-1])
+        if not 0 <= idx1 <= idx2 < self.aligned_data.NumSamples():
+            raise ValueError('idx1 and idx2 should satisfy 0 <= idx1 <= idx2 < ' + str(self.aligned_data.NumSamples()))
+        return idx1, idx2
+
+    def Render(self, path, query):
+        #### returns the PNG image; raises KeyError or ValueError for invalid requests
+        view_config = self.GetViewConfig(query)
+        dpi = self.GetDpi(query)
+        if path == '/matrix.png':
+            panel = None
+        else:
+            panel = self.GetPairIndices(query)
+        key = (panel, dpi) + tuple(getattr(view_config, attribute) for attribute in VIEW_ATTRIBUTES)
+        image = self.cache.Get(key)
+        if image is not None:
+            return image
+        output = io.BytesIO()
+        with self.render_lock:
+            plot_utils = self.GetPlotUtils(view_config)
+            if panel is None:
+                #### the figure is closed also if, e.g., the colormap is unknown
+                try:
+                    fig, axes = vis_utils.BuildMatrixPlot(plot_utils, self.aligned_data, view_config)
+                    fig.savefig(output, format = 'png', dpi = dpi, bbox_inches = 'tight', transparent = view_config.transparent)
+                finally:
+                    plt.close('all')
+            else:
+                task = vis_utils.PairPlotTask(plot_utils, self.aligned_data, view_config, panel[0], panel[1])
+                fig, num_drawn, num_dropped = vis_utils.BuildPairwisePlot(task)
+                fig.savefig(output, format = 'png', dpi = dpi, transparent = view_config.transparent)
+        image = output.getvalue()
+        self.cache.Put(key, image)
+        return image
+
+    def GetIndexPage(self):
+        panel_options = ['<option value="matrix.png">matrix</option>']
+        for idx1 in range(self.aligned_data.NumSamples()):
+            for idx2 in range(idx1, self.aligned_data.NumSamples()):
+                name = self._GetLabel(idx1) + ' vs ' + self._GetLabel(idx2)
+                panel_options.append('<option value="pair.png?idx1=' + str(idx1) + '&amp;idx2=' + str(idx2) + '">' + name + '</option>')
+        replacements = {'%PANEL_OPTIONS%' : ''.join(panel_options), '%MIN_PI%' : str(self.config.pi_min), '%MAX_PI%' : str(self.config.pi_max),
+                        '%CMAP%' : self.config.cmap, '%COLOR%' : self.config.color, '%LWIDTH%' : str(self.config.linewidth), '%DPI%' : str(DEFAULT_DPI)}
+        #### checkboxes start with the command line values, since unchecked ones switch their flags off
+        for pattern, checked in [('%LOWER%', not self.config.upper_triangle), ('%SHOW_BP%', self.config.show_breakpoints),
+                                 ('%LOD%', self.config.lod), ('%TRANSPARENT%', self.config.transparent)]:
+            replacements[pattern] = ' checked' if checked else ''
+        html = INDEX_HTML
+        for pattern, value in replacements.items():
+            html = html.replace(pattern, value)
+        return html.encode()
+
+    def _GetLabel(self, idx):
+        label = self.aligned_data.GetLabelByIdx(idx)
+        if pd.isnull(label):
+            label = self.aligned_data.GetSampleNameByIdx(idx)
+        return str(label).replace('&', '&amp;').replace('<', '&lt;')
+
+
+class PlotRequestHandler(BaseHTTPRequestHandler):
+    plot_server = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/' or url.path == '/index.html':
+            self._Reply(200, 'text/html; charset=utf-8', self.plot_server.GetIndexPage())
+            return
+        if url.path not in ['/matrix.png', '/pair.png']:
+            self._Reply(404, 'text/plain', b'not found\n')
+            return
+        try:
+            image = self.plot_server.Render(url.path, parse_qs(url.query))
+        except (KeyError, ValueError) as e:
+            self._Reply(400, 'text/plain', ('invalid request: ' + str(e) + '\n').encode())
+            return
+        self._Reply(200, 'image/png', image)
+
+    def _Reply(self, code, content_type, body):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.plot_server.config.verbose == 2:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+def Serve(aligned_data, config):
+    #### serves only on localhost until interrupted
+    PlotRequestHandler.plot_server = PlotServer(aligned_data, config)
+    httpd = ThreadingHTTPServer(('127.0.0.1', config.serve_port), PlotRequestHandler)
+    print('Serving plots on http://127.0.0.1:' + str(httpd.server_address[1]) + '/, press Ctrl+C to stop')
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
@@ -0,0 +1,26 @@
+import os
+import sys
+import numpy as np
+
+import kmer_utils
+
+#### k-mers of sketches are longer than seeds of aligners, so that unrelated sequences rarely share them by chance
+SKETCH_K = 21
+#### a sketch keeps about 1 / SKETCH_SCALE of distinct k-mers (FracMinHash)
+SKETCH_SCALE = 200
+MAX_SKETCH_HASH = np.iinfo(np.uint64).max // np.uint64(SKETCH_SCALE)
+
+def GetSketch(seq):
+    #### sorted distinct hashes of canonical k-mers below MAX_SKETCH_HASH, so that sketches do not depend on strands
+    codes = kmer_utils.EncodeSequence(seq)
+    forward = kmer_utils.GetKmerHashes(codes, SKETCH_K)
+    reverse = kmer_utils.GetKmerHashes(kmer_utils.ReverseComplement(codes), SKETCH_K)[::-1]
+    hashes = np.minimum(forward, reverse)
+    return np.unique(hashes[hashes < MAX_SKETCH_HASH])
+
+def GetContainment(sketch1, sketch2):
+    #### the fraction of k-mers of the smaller sequence that are found in the larger one
+    if len(sketch1) == 0 or len(sketch2) == 0:
+        return 0.0
+    num_shared = len(np.intersect1d(sketch1, sketch2, assume_unique = True))
+    return num_shared / min(len(sketch1), len(sketch2))
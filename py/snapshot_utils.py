@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+
+import table_utils
+import store_utils
+import manifest_utils
+
+SNAPSHOT_VERSION = 1
+#### columns used by the visualization stage and the alignment statistics
+SNAPSHOT_COLUMNS = ['start1_dir', 'end1_dir', 'start2_dir', 'end2_dir', 'id%', 'length1', 'length2', 'strand2']
+#### parameters that change the processed alignments; visualization parameters are not included
+PROCESSING_PARAMETERS = ['alignment_method', 'lastz_params', 'minimap2_params', 'mashmap_params', 'kmer_size', 'kmer_window', 'paf_config', 'min_align_len', 'symmetric_self', 'prescreen_threshold']
+
+class SnapshotError(Exception):
+    pass
+
+
+def GetFingerprint(config, input_data):
+    sha = hashlib.sha256()
+    with open(config.input_csv, 'rb') as fh:
+        sha.update(fh.read())
+    state = {'parameters' : [getattr(config, parameter) for parameter in PROCESSING_PARAMETERS],
+             'fastas' : [manifest_utils.GetFastaStamp(input_data.GetFastaByIdx(idx)) for idx in range(input_data.NumSamples())]}
+    sha.update(json.dumps(state, sort_keys = True).encode())
+    return sha.hexdigest()
+
+def _GetTableDir(snapshot_dir, idx1, idx2):
+    return os.path.join(snapshot_dir, 'pair_' + str(idx1) + '_' + str(idx2))
+
+def SaveSnapshot(aligned_data, config):
+    #### processed alignments, strands and sequence lengths; the directory is replaced at once
+    tmp_dir = config.snapshot_dir + '.' + str(os.getpid()) + '.tmp'
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+    pairs = []
+    for idx1, idx2 in aligned_data.IndexPairIterator():
+        df = aligned_data.GetAlignmentDF(idx1, idx2)
+        df = df[[column for column in SNAPSHOT_COLUMNS if column in df.columns]]
+        table_utils.SaveColumnTable(df, _GetTableDir(tmp_dir, idx1, idx2), dict())
+        pairs.append([idx1, idx2])
+    #### alignment files are checked as well, e.g., in case custom alignments were replaced
+    sources = {os.path.abspath(fname) : table_utils.GetSourceStamp(fname) for fname in aligned_data.align_dict.values() if os.path.exists(fname)}
+    meta = {'version' : SNAPSHOT_VERSION, 'fingerprint' : GetFingerprint(config, aligned_data.input_data),
+            'locus_lens' : [int(aligned_data.GetLengthByIdx(idx)) for idx in range(aligned_data.NumSamples())],
+            'strands' : list(aligned_data.strands), 'pairs' : pairs, 'pruned_pairs' : sorted(aligned_data.pruned_pairs), 'sources' : sources}
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as fh:
+        json.dump(meta, fh)
+    if os.path.exists(config.snapshot_dir):
+        shutil.rmtree(config.snapshot_dir)
+    os.replace(tmp_dir, config.snapshot_dir)
+
+def ReadSnapshotMeta(config):
+    #### raises SnapshotError if the snapshot is missing or was written by another version
+    meta_json = os.path.join(config.snapshot_dir, 'meta.json')
+    if not os.path.exists(meta_json):
+        raise SnapshotError('snapshot ' + config.snapshot_dir + ' was not found, run PatchWorkPlot without --render-only first')
+    with open(meta_json) as fh:
+        meta = json.load(fh)
+    if meta.get('version') != SNAPSHOT_VERSION:
+        raise SnapshotError('snapshot ' + config.snapshot_dir + ' was written by another version of PatchWorkPlot')
+    return meta
+
+def LoadSnapshot(input_data, config, meta):
+    #### returns alignment tables, strands and pairs pruned by the prescreen; tables stay on disk and are memory-mapped on demand.
+    #### Raises SnapshotError if inputs or processing parameters have changed since the snapshot was written
+    if meta['fingerprint'] != GetFingerprint(config, input_data):
+        raise SnapshotError('input files or alignment parameters have changed since snapshot ' + config.snapshot_dir + ' was written')
+    for fname, stamp in meta['sources'].items():
+        if not os.path.exists(fname) or table_utils.GetSourceStamp(fname) != stamp:
+            raise SnapshotError('alignment file ' + fname + ' has changed since snapshot ' + config.snapshot_dir + ' was written')
+    align_dfs = store_utils.AlignmentStore(config.output_dir, config.memory_budget)
+    for idx1, idx2 in meta['pairs']:
+        align_dfs.AddTableDir((idx1, idx2), _GetTableDir(config.snapshot_dir, idx1, idx2))
+    return align_dfs, meta['strands'], set((idx1, idx2) for idx1, idx2 in meta['pruned_pairs'])
@@ -0,0 +1,91 @@
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+import table_utils
+
+class AlignmentStore:
+    #### alignment tables of sequence pairs. Tables are kept in memory while their total size fits the memory budget,
+    #### the rest are spilled to disk as memory-mapped columns and loaded on demand. The budget is checked when a table is
+    #### stored, i.e., after it was parsed, so the peak memory can exceed the budget by the size of one table
+    def __init__(self, spill_parent_dir, memory_budget_mb = 0):
+        self.spill_parent_dir = spill_parent_dir
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.spill_dir = None
+        self.tables = dict()
+        self.spilled_tables = dict()
+        self.keys = []
+        self.table_sizes = dict()
+        self.memory_size = 0
+
+    def _GetSpillDir(self):
+        if self.spill_dir is None:
+            #### spilled tables are temporary and are removed when the run is finished
+            self.spill_dir = tempfile.mkdtemp(prefix = 'spilled_tables_', dir = self.spill_parent_dir)
+            atexit.register(shutil.rmtree, self.spill_dir, True)
+        return self.spill_dir
+
+    def _Fits(self, table_size):
+        return self.memory_budget <= 0 or self.memory_size + table_size <= self.memory_budget
+
+    def _Remove(self, key):
+        #### an overwritten table no longer takes memory; its spilled columns are removed unless they were written elsewhere
+        if key in self.tables:
+            del self.tables[key]
+            self.memory_size -= self.table_sizes.pop(key)
+        elif key in self.spilled_tables:
+            table_dir = self.spilled_tables.pop(key)
+            if self.spill_dir is not None and os.path.dirname(table_dir) == self.spill_dir:
+                shutil.rmtree(table_dir, True)
+
+    def __setitem__(self, key, df):
+        if key in self:
+            self._Remove(key)
+        else:
+            self.keys.append(key)
+        table_size = int(df.memory_usage(deep = True).sum())
+        if self._Fits(table_size):
+            self.tables[key] = df
+            self.table_sizes[key] = table_size
+            self.memory_size += table_size
+            return
+        table_dir = os.path.join(self._GetSpillDir(), '_'.join(str(k) for k in key))
+        table_utils.SaveColumnTable(df, table_dir, dict())
+        self.spilled_tables[key] = table_dir
+
+    def __getitem__(self, key):
+        if key in self.tables:
+            return self.tables[key]
+        return table_utils.LoadColumnTable(self.spilled_tables[key])
+
+    def __contains__(self, key):
+        return key in self.tables or key in self.spilled_tables
+
+    def __iter__(self):
+        for key in self.keys:
+            yield key
+
+    def __len__(self):
+        return len(self.keys)
+
+    def AddTableDir(self, key, table_dir):
+        #### a column table written elsewhere, e.g., by a snapshot, is loaded on demand and is not removed
+        if key in self:
+            self._Remove(key)
+        else:
+            self.keys.append(key)
+        self.spilled_tables[key] = table_dir
+
+    def NumSpilled(self):
+        return len(self.spilled_tables)
+
+    def AddColumns(self, key, columns):
+        if key in self.tables:
+            for column, values in columns.items():
+                self.tables[key][column] = values
+                self.table_sizes[key] += values.nbytes
+                self.memory_size += values.nbytes
+            return
+        table_utils.AppendColumns(self.spilled_tables[key], columns)
@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+TABLE_VERSION = 2
+
+def GetSourceStamp(source_fname):
+    stat = os.stat(source_fname)
+    return {'source_size' : stat.st_size, 'source_mtime_ns' : stat.st_mtime_ns}
+
+def ReadTableMeta(table_dir):
+    meta_json = os.path.join(table_dir, 'meta.json')
+    if not os.path.exists(meta_json):
+        return None
+    with open(meta_json) as fh:
+        return json.load(fh)
+
+def SaveColumnTable(df, table_dir, meta):
+    tmp_dir = table_dir + '.' + str(os.getpid()) + '.tmp'
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+    columns = list(df.columns)
+    categories = dict()
+    for col_idx, column in enumerate(columns):
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            #### categorical columns are stored as codes, categories are kept in the metadata
+            values = df[column].cat.codes.to_numpy()
+            categories[column] = [str(c) for c in df[column].cat.categories]
+        else:
+            values = df[column].to_numpy()
+            if values.dtype == object:
+                values = np.asarray(df[column].astype(str).to_numpy(), dtype = str)
+        np.save(os.path.join(tmp_dir, 'col_' + str(col_idx) + '.npy'), values, allow_pickle = False)
+    meta = dict(meta)
+    meta['version'] = TABLE_VERSION
+    meta['columns'] = columns
+    meta['categories'] = categories
+    meta['num_rows'] = len(df)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as fh:
+        json.dump(meta, fh)
+    if os.path.exists(table_dir):
+        shutil.rmtree(table_dir)
+    os.replace(tmp_dir, table_dir)
+
+def LoadColumnTable(table_dir, meta = None):
+    if meta is None:
+        meta = ReadTableMeta(table_dir)
+    columns = dict()
+    for col_idx, column in enumerate(meta['columns']):
+        #### numeric columns stay memory-mapped, so loading does not copy them
+        values = np.load(os.path.join(table_dir, 'col_' + str(col_idx) + '.npy'), mmap_mode = 'r', allow_pickle = False)
+        if column in meta['categories']:
+            values = pd.Categorical.from_codes(values, meta['categories'][column])
+        elif values.dtype.kind == 'U':
+            values = values.astype(object)
+        columns[column] = values
+    return pd.DataFrame(columns, copy = False)
+
+def LoadParsedTable(table_dir, source_fname, parser_name, min_align_len):
+    meta = ReadTableMeta(table_dir)
+    if meta is None or meta.get('version') != TABLE_VERSION or meta.get('parser') != parser_name:
+        return None
+    stamp = GetSourceStamp(source_fname)
+    if any(meta.get(key) != stamp[key] for key in stamp) or meta['min_align_len'] > min_align_len:
+        return None
+    df = LoadColumnTable(table_dir, meta)
+    if meta['min_align_len'] < min_align_len:
+        df = df.loc[(df['length1'] >= min_align_len) & (df['length2'] >= min_align_len)].reset_index(drop = True)
+    return df
+
+def SaveParsedTable(df, table_dir, source_fname, parser_name, min_align_len):
+    meta = GetSourceStamp(source_fname)
+    meta['parser'] = parser_name
+    meta['min_align_len'] = min_align_len
+    SaveColumnTable(df, table_dir, meta)
+
+def AppendColumns(table_dir, columns):
+    #### new columns are written next to the existing ones, which are left untouched
+    meta = ReadTableMeta(table_dir)
+    for column, values in columns.items():
+        if column in meta['columns']:
+            col_idx = meta['columns'].index(column)
+        else:
+            col_idx = len(meta['columns'])
+            meta['columns'].append(column)
+        np.save(os.path.join(table_dir, 'col_' + str(col_idx) + '.npy'), np.asarray(values), allow_pickle = False)
+    tmp_json = os.path.join(table_dir, 'meta.json.' + str(os.getpid()) + '.tmp')
+    with open(tmp_json, 'w') as fh:
+        json.dump(meta, fh)
+    os.replace(tmp_json, os.path.join(table_dir, 'meta.json'))
@@ -0,0 +1,321 @@
+import os
+import sys
+import json
+import math
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import numpy as np
+import matplotlib as mplt
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+
+import pool_utils
+import visualization_utils as vis_utils
+
+TILE_SIZE = 256
+#### at 72 dpi, line widths given in points are drawn in pixels
+TILE_DPI = 72
+#### the automatic maximum zoom gives the smallest panel at least this number of pixels
+MIN_PANEL_PIXELS = 512
+MAX_AUTO_ZOOM = 8
+
+#### a static viewer without external dependencies; %TILE_META% is replaced by the layout of the matrix
+VIEWER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>PatchWorkPlot</title>
+<style>
+html, body { margin: 0; height: 100%; overflow: hidden; font-family: sans-serif; }
+#view { position: absolute; left: 0; top: 0; right: 0; bottom: 0; background: white; cursor: grab; }
+#view img { position: absolute; pointer-events: none; }
+#status { position: absolute; left: 8px; bottom: 8px; padding: 4px 8px; font-size: 13px;
+          background: rgba(255, 255, 255, 0.85); border: 1px solid #ccc; }
+</style>
+</head>
+<body>
+<div id="view"></div>
+<div id="status">Scroll to zoom, drag to move, double click to reset</div>
+<script>
+const META = %TILE_META%;
+const view = document.getElementById('view');
+const status = document.getElementById('status');
+const tiles = new Map();
+let scale = 1, offsetLeft = 0, offsetTop = 0, drag = null;
+
+function Reset() {
+  scale = Math.min(view.clientWidth, view.clientHeight) / META.world_size;
+  offsetLeft = 0;
+  offsetTop = 0;
+  Render();
+}
+
+function Render() {
+  const zoom = Math.max(0, Math.min(META.max_zoom, Math.ceil(Math.log2(scale * META.world_size / META.tile_size))));
+  const num_tiles = 1 << zoom;
+  const tile_world = META.world_size / num_tiles;
+  const x0 = Math.max(0, Math.floor(offsetLeft / tile_world));
+  const x1 = Math.min(num_tiles - 1, Math.floor((offsetLeft + view.clientWidth / scale) / tile_world));
+  const y0 = Math.max(0, Math.floor(offsetTop / tile_world));
+  const y1 = Math.min(num_tiles - 1, Math.floor((offsetTop + view.clientHeight / scale) / tile_world));
+  const visible = new Set();
+  for (let x = x0; x <= x1; x++) {
+    for (let y = y0; y <= y1; y++) {
+      const key = zoom + '/' + x + '/' + y;
+      visible.add(key);
+      let img = tiles.get(key);
+      if (img === undefined) {
+        img = new Image();
+        // tiles without alignments are not written
+        img.onerror = () => { img.style.display = 'none'; };
+        img.src = key + '.png';
+        view.appendChild(img);
+        tiles.set(key, img);
+      }
+      img.style.left = ((x * tile_world - offsetLeft) * scale) + 'px';
+      img.style.top = ((y * tile_world - offsetTop) * scale) + 'px';
+      img.style.width = img.style.height = (tile_world * scale) + 'px';
+    }
+  }
+  for (const [key, img] of tiles) {
+    if (!visible.has(key)) {
+      img.remove();
+      tiles.delete(key);
+    }
+  }
+}
+
+function FindSample(pos) {
+  for (let idx = 0; idx < META.labels.length; idx++) {
+    if (pos >= META.offsets[idx] && pos < META.offsets[idx + 1]) {
+      return idx;
+    }
+  }
+  return -1;
+}
+
+function Describe(idx, pos) {
+  const share = (pos - META.offsets[idx]) / (META.offsets[idx + 1] - META.offsets[idx]);
+  return META.labels[idx] + ' ' + Math.round(share * META.lengths[idx]).toLocaleString() + ' bp';
+}
+
+view.addEventListener('wheel', (event) => {
+  event.preventDefault();
+  const x = offsetLeft + event.clientX / scale, y = offsetTop + event.clientY / scale;
+  scale *= Math.exp(-event.deltaY * 0.002);
+  offsetLeft = x - event.clientX / scale;
+  offsetTop = y - event.clientY / scale;
+  Render();
+}, { passive: false });
+view.addEventListener('mousedown', (event) => {
+  drag = { x: event.clientX, y: event.clientY, left: offsetLeft, top: offsetTop };
+  view.style.cursor = 'grabbing';
+});
+window.addEventListener('mouseup', () => {
+  drag = null;
+  view.style.cursor = 'grab';
+});
+window.addEventListener('mousemove', (event) => {
+  if (drag !== null) {
+    offsetLeft = drag.left - (event.clientX - drag.x) / scale;
+    offsetTop = drag.top - (event.clientY - drag.y) / scale;
+    Render();
+  }
+  const x = offsetLeft + event.clientX / scale, y = offsetTop + event.clientY / scale;
+  const row = FindSample(y), col = FindSample(x);
+  if (row >= 0 && col >= 0) {
+    status.textContent = 'row: ' + Describe(row, y) + ' | column: ' + Describe(col, x);
+  }
+});
+view.addEventListener('dblclick', Reset);
+window.addEventListener('resize', Render);
+Reset();
+</script>
+</body>
+</html>
+"""
+
+class TileLayout:
+    #### the matrix in world coordinates: column and row j span offsets[j]..offsets[j + 1], y goes down as in image tiles
+    def __init__(self, plot_utils, aligned_data, config):
+        self.plot_utils = plot_utils
+        self.config = config
+        self.ratios = np.array(vis_utils.GetRatios(aligned_data), dtype = float)
+        self.offsets = np.concatenate([[0], np.cumsum(self.ratios)])
+        self.world_size = self.offsets[-1]
+
+    def ToWorld(self, segments, idx1, idx2):
+        row, col = self.plot_utils.GetPanelPosition(idx1, idx2)
+        scale = self.config.plot_scale
+        world = np.empty(segments.shape)
+        world[..., 0] = self.offsets[col] + segments[..., 0] / scale * self.ratios[col]
+        world[..., 1] = self.offsets[row] + (scale - segments[..., 1]) / scale * self.ratios[row]
+        return world
+
+    def GetFrameSegments(self, idx1, idx2):
+        row, col = self.plot_utils.GetPanelPosition(idx1, idx2)
+        x0, x1 = self.offsets[col], self.offsets[col + 1]
+        y0, y1 = self.offsets[row], self.offsets[row + 1]
+        return np.array([[[x0, y0], [x1, y0]], [[x1, y0], [x1, y1]], [[x1, y1], [x0, y1]], [[x0, y1], [x0, y0]]])
+
+    def GetMaxZoom(self):
+        if self.config.tile_max_zoom > 0:
+            return self.config.tile_max_zoom
+        min_panel_share = self.ratios.min() / self.world_size
+        zoom = math.ceil(math.log2(MIN_PANEL_PIXELS / (TILE_SIZE * min_panel_share)))
+        return max(0, min(MAX_AUTO_ZOOM, zoom))
+
+
+class TileSegments:
+    #### all lines of the matrix in world coordinates; alignments keep identities for decimation and coloring
+    def __init__(self, plot_utils, aligned_data, layout, config):
+        color_utils = vis_utils.ColorUtils(config)
+        align_segments, pi_values, bp_segments, frame_segments = [], [], [], []
+        for idx1, idx2 in aligned_data.IndexPairIterator():
+            df = aligned_data.GetAlignmentDF(idx1, idx2)
+            len1 = aligned_data.GetLengthByIdx(idx1)
+            len2 = aligned_data.GetLengthByIdx(idx2)
+            if len(df) != 0:
+                align_segments.append(layout.ToWorld(vis_utils.GetAlignmentSegments(plot_utils, df, len1, len2, config), idx1, idx2))
+                pi_values.append(df['id%'].to_numpy(dtype = float))
+                if config.show_breakpoints:
+                    bp_segments.append(layout.ToWorld(vis_utils.GetBreakpointSegments(plot_utils, df, len1, len2, config), idx1, idx2))
+            frame_segments.append(layout.GetFrameSegments(idx1, idx2))
+        self.align_segments = np.concatenate(align_segments) if len(align_segments) != 0 else np.zeros((0, 2, 2))
+        self.pi_values = np.concatenate(pi_values) if len(pi_values) != 0 else np.zeros(0)
+        self.color_bins = color_utils.GetColorBins(self.pi_values)
+        self.bp_segments = np.concatenate(bp_segments) if len(bp_segments) != 0 else np.zeros((0, 2, 2))
+        self.frame_segments = np.concatenate(frame_segments)
+        self.color_utils = color_utils
+        self.config = config
+
+    def GetLevelSegments(self, pixel_size):
+        #### lines of a zoom level in the drawing order (breakpoints, alignments, frames) with their colors and widths;
+        #### lines that cannot be told apart at this level are dropped
+        align_idx = vis_utils.DecimateSegments(self.align_segments, self.pi_values, self.color_bins, (pixel_size, pixel_size))
+        bp_idx = vis_utils.DecimateSegments(self.bp_segments, np.zeros(len(self.bp_segments)), np.zeros(len(self.bp_segments), dtype = np.int64), (pixel_size, pixel_size))
+        layers = [(self.bp_segments[bp_idx], mplt.colors.to_rgba_array([self.config.bp_color] * len(bp_idx)), self.config.bp_linewidth),
+                  (self.align_segments[align_idx], self.color_utils.GetColors(self.pi_values[align_idx]), self.config.linewidth),
+                  (self.frame_segments, mplt.colors.to_rgba_array(['black'] * len(self.frame_segments)), mplt.rcParams['axes.linewidth'])]
+        segments = np.concatenate([layer[0] for layer in layers])
+        colors = np.concatenate([np.asarray(layer[1]).reshape(-1, 4) for layer in layers])
+        linewidths = np.concatenate([np.full(len(layer[0]), layer[2], dtype = float) for layer in layers])
+        return segments, colors, linewidths, len(self.align_segments) - len(align_idx)
+
+
+def SplitSegments(segments, max_len):
+    #### long segments are cut into pieces no longer than max_len, so that each piece touches at most 2 x 2 tiles.
+    #### Returns the pieces and indices of their source segments
+    lengths = np.abs(segments[:, 1] - segments[:, 0]).max(axis = 1)
+    num_pieces = np.maximum(1, np.ceil(lengths / max_len)).astype(np.int64)
+    source_idx = np.repeat(np.arange(len(segments)), num_pieces)
+    piece_idx = np.arange(len(source_idx)) - np.repeat(np.cumsum(num_pieces) - num_pieces, num_pieces)
+    starts = segments[source_idx, 0]
+    steps = (segments[source_idx, 1] - starts) / num_pieces[source_idx][:, np.newaxis]
+    pieces = np.stack([starts + steps * piece_idx[:, np.newaxis], starts + steps * (piece_idx + 1)[:, np.newaxis]], axis = 1)
+    return pieces, source_idx
+
+def GroupByTiles(segments, linewidths, zoom, world_size):
+    #### yields (tile x, tile y, indices of segments) for every tile touched by segments; the order of segments is kept
+    num_tiles = 1 << zoom
+    tile_world = world_size / num_tiles
+    pieces, source_idx = SplitSegments(segments, tile_world)
+    #### lines are widened by their widths, so that a line along a tile border is drawn in both tiles
+    margins = (linewidths[source_idx] / TILE_SIZE + 1 / TILE_SIZE) * tile_world
+    low = (pieces.min(axis = 1) - margins[:, np.newaxis]) // tile_world
+    high = (pieces.max(axis = 1) + margins[:, np.newaxis]) // tile_world
+    low = np.clip(low, 0, num_tiles - 1).astype(np.int64)
+    high = np.clip(high, 0, num_tiles - 1).astype(np.int64)
+    tile_ids, piece_ids = [], []
+    for dx in range(3):
+        for dy in range(3):
+            mask = (low[:, 0] + dx <= high[:, 0]) & (low[:, 1] + dy <= high[:, 1])
+            tile_ids.append((low[mask, 0] + dx) * num_tiles + low[mask, 1] + dy)
+            piece_ids.append(np.nonzero(mask)[0])
+    tile_ids = np.concatenate(tile_ids)
+    piece_ids = np.concatenate(piece_ids)
+    order = np.lexsort((piece_ids, tile_ids))
+    tile_ids = tile_ids[order]
+    piece_ids = piece_ids[order]
+    unique_tiles, starts = np.unique(tile_ids, return_index = True)
+    for tile_id, piece_group in zip(unique_tiles, np.split(piece_ids, starts[1:])):
+        yield tile_id // num_tiles, tile_id % num_tiles, pieces[piece_group], source_idx[piece_group]
+
+
+class TileTask:
+    def __init__(self, zoom, tile_x, tile_y, tile_world, segments, colors, linewidths, config):
+        self.x0 = tile_x * tile_world
+        self.y0 = tile_y * tile_world
+        self.tile_world = tile_world
+        self.segments = segments
+        self.colors = colors
+        self.linewidths = linewidths
+        self.transparent = config.transparent
+        self.output_png = os.path.join(config.tile_dir, str(zoom), str(tile_x), str(tile_y) + '.png')
+
+def RenderTile(task):
+    fig = Figure(figsize = (TILE_SIZE / TILE_DPI, TILE_SIZE / TILE_DPI), dpi = TILE_DPI)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.axis('off')
+    ax.add_collection(LineCollection(task.segments, colors = task.colors, linewidths = task.linewidths, linestyle = '-', capstyle = 'projecting'))
+    ax.set_xlim(task.x0, task.x0 + task.tile_world)
+    ax.set_ylim(task.y0 + task.tile_world, task.y0)
+    os.makedirs(os.path.dirname(task.output_png), exist_ok = True)
+    fig.savefig(task.output_png, dpi = TILE_DPI, transparent = task.transparent)
+    return task.output_png
+
+def GetTileTasks(tile_segments, layout, max_zoom, config):
+    for zoom in range(max_zoom + 1):
+        tile_world = layout.world_size / (1 << zoom)
+        segments, colors, linewidths, num_dropped = tile_segments.GetLevelSegments(tile_world / TILE_SIZE)
+        if config.verbose == 2:
+            print('  zoom level ' + str(zoom) + ': ' + str(len(tile_segments.align_segments) - num_dropped) + ' of ' + str(len(tile_segments.align_segments)) + ' alignment segments are drawn')
+        for tile_x, tile_y, pieces, source_idx in GroupByTiles(segments, linewidths, zoom, layout.world_size):
+            yield TileTask(zoom, tile_x, tile_y, tile_world, pieces, colors[source_idx], linewidths[source_idx], config)
+
+def WriteViewer(layout, aligned_data, max_zoom, config):
+    labels = []
+    for idx in range(aligned_data.NumSamples()):
+        label = aligned_data.GetSampleNameByIdx(idx)
+        if not pd.isnull(aligned_data.GetLabelByIdx(idx)):
+            label = aligned_data.GetLabelByIdx(idx)
+        labels.append(str(label))
+    meta = {'tile_size' : TILE_SIZE, 'max_zoom' : max_zoom, 'world_size' : layout.world_size,
+            'offsets' : list(layout.offsets), 'labels' : labels,
+            'lengths' : [int(aligned_data.GetLengthByIdx(idx)) for idx in range(aligned_data.NumSamples())]}
+    with open(os.path.join(config.tile_dir, 'index.html'), 'w') as fh:
+        fh.write(VIEWER_HTML.replace('%TILE_META%', json.dumps(meta)))
+
+def RenderTiles(plot_utils, aligned_data, config):
+    #### tiles are written to tile_dir/{zoom}/{x}/{y}.png; tiles without lines are not written and shown as blank
+    layout = TileLayout(plot_utils, aligned_data, config)
+    max_zoom = layout.GetMaxZoom()
+    tile_segments = TileSegments(plot_utils, aligned_data, layout, config)
+    if os.path.exists(config.tile_dir):
+        shutil.rmtree(config.tile_dir)
+    os.makedirs(config.tile_dir)
+    if config.verbose > 0:
+        print('Rendering tiles of zoom levels 0-' + str(max_zoom) + ' to ' + config.tile_dir)
+    tasks = GetTileTasks(tile_segments, layout, max_zoom, config)
+    num_tiles = 0
+    if config.num_threads <= 1:
+        for task in tasks:
+            RenderTile(task)
+            num_tiles += 1
+    else:
+        with pool_utils.WorkerPool(ProcessPoolExecutor, config.num_threads) as executor:
+            #### at most two tiles per worker are submitted ahead
+            futures = deque()
+            for task in tasks:
+                futures.append(executor.submit(RenderTile, task))
+                if len(futures) >= 2 * config.num_threads:
+                    futures.popleft().result()
+                    num_tiles += 1
+            while len(futures) != 0:
+                futures.popleft().result()
+                num_tiles += 1
+    WriteViewer(layout, aligned_data, max_zoom, config)
+    if config.verbose > 0:
+        print(str(num_tiles) + ' tiles were rendered, the viewer is ' + os.path.join(config.tile_dir, 'index.html'))
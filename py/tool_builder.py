@@ -2,11 +2,11 @@ import os
 import sys
 
 import data_utils
-import visualization_utils as vis_utils
 
 class AlignerFactory:
-    def __init__(self, config):
+    def __init__(self, config, input_data):
         self.config = config
+        self.input_data = input_data
 
     def GetAligner(self):
         if self.config.alignment_method == 'yass':
@@ -17,6 +17,8 @@ class AlignerFactory:
             return data_utils.MashmapAligner(self.config)
         elif self.config.alignment_method == 'custom':
             return data_utils.CustomAligner(self.config)
+        elif self.config.alignment_method == 'kmer':
+            return data_utils.KmerAligner(self.config, self.input_data)
         return data_utils.LastZPairwiseAligner(self.config)
 
 
@@ -26,11 +28,14 @@ class VisualizerBuilder:
         self.aligned_data = aligned_data
 
     def _GetGeneVisualizer(self):
+        #### visualization modules load matplotlib, so they are imported only when plots are built
+        import visualization_utils as vis_utils
         if self.config.show_annotation:
             return vis_utils.SimpleGeneVisualizer(self.config, self.aligned_data)
         return vis_utils.EmptyGeneVisualizer(self.config, self.aligned_data)
 
     def GetPlotVisualizer(self):
+        import visualization_utils as vis_utils
         gene_visualizer = self._GetGeneVisualizer()
         if self.config.upper_triangle:
             return vis_utils.UpperTriangleUtils(self.aligned_data, gene_visualizer)
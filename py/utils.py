@@ -1,18 +1,20 @@
 import os
 import sys
 import pandas as pd
-
-import matplotlib as mplt
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
 
+def GetColormap(cmap_name):
+    #### matplotlib is imported on the first use of colors, so that the alignment stage does not load it
+    import matplotlib as mplt
+    return mplt.colormaps[cmap_name]
+
 def GetColorByNormalizedValue(cmap_name, norm_value):
+    from matplotlib.colors import rgb2hex
     if norm_value < 0 or norm_value > 1:
         print("ERROR: value " + str(norm_value) + ' does not belong to [0, 1]')
-    cmap =  mplt.colormaps[cmap_name] #plt.cm.get_cmap(cmap_name)
+    cmap = GetColormap(cmap_name)
     color = cmap(norm_value)
-    return mplt.colors.rgb2hex(color[:3])
+    return rgb2hex(color[:3])
 
 def ColorByPercentIdentity(cmap, pi, min_pi, max_pi, cmap_reverse):
     fraction = (min(max(pi, min_pi), max_pi) - min_pi) / (max_pi - min_pi)
@@ -20,6 +22,23 @@ def ColorByPercentIdentity(cmap, pi, min_pi, max_pi, cmap_reverse):
         fraction = 1 - fraction
     return GetColorByNormalizedValue(cmap, fraction)
 
+def ColorsByPercentIdentity(cmap, pi_values, min_pi, max_pi, cmap_reverse):
+    fractions = (np.clip(np.asarray(pi_values, dtype = float), min_pi, max_pi) - min_pi) / (max_pi - min_pi)
+    if cmap_reverse:
+        fractions = 1 - fractions
+    colors = GetColormap(cmap)(fractions)
+    colors[:, 3] = 1
+    return colors
+
+def ColorBinsByPercentIdentity(cmap, pi_values, min_pi, max_pi, cmap_reverse, num_bins):
+    #### the colormap is split into at most num_bins bins of neighbouring colors;
+    #### if num_bins is not less than the size of the colormap, a bin is a single color
+    num_bins = min(num_bins, GetColormap(cmap).N)
+    fractions = (np.clip(np.asarray(pi_values, dtype = float), min_pi, max_pi) - min_pi) / (max_pi - min_pi)
+    if cmap_reverse:
+        fractions = 1 - fractions
+    return np.minimum((fractions * num_bins).astype(np.int64), num_bins - 1)
+
 def rgb2hex(r,g,b):
     return "#{:02x}{:02x}{:02x}".format(r,g,b)
 
@@ -35,6 +54,11 @@ def ModifyPos(pos, seq_len, strand):
         return pos
     return seq_len - pos + 1
 
+def PercentToFloat(values):
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    return values.astype(str).str[:-1].astype(float)
+
 def PrepareDir(dir_name):
     if not os.path.exists(dir_name):
         os.mkdir(dir_name)
@@ -1,11 +1,23 @@
 import os
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
+import numpy as np
+import matplotlib as mplt
+#### plots are only saved to files, so the interactive backends are never looked up
+mplt.use('Agg')
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.figure import Figure
 from matplotlib.colorbar import ColorbarBase
 
 import utils
+import pool_utils
+import profile_utils
+
+OUTPUT_DPI = 300
 
 class EmptyGeneVisualizer:
     def __init__(self, config, aligned_data):
@@ -23,14 +35,17 @@ class EmptyGeneVisualizer:
     def VisualizeGenes(self, axes, gene_column_idx):
         return
 
+    def GetPairwiseGeneTracks(self, idx1, idx2):
+        return None
+
     def VisualizePairwiseGenes(self, axes, idx1, idx2):
-        axes[1, 0].axis("off")
-        axes[0, 1].axis("off")
+        DrawPairwiseGenes(axes, self.GetPairwiseGeneTracks(idx1, idx2), self.config)
 
 class SimpleGeneVisualizer:
     def __init__(self, config, aligned_data):
         self.config = config
         self.aligned_data = aligned_data
+        self.gene_tracks = dict()
 
     def ShowGenesFlag(self):
         return True
@@ -41,57 +56,69 @@ class SimpleGeneVisualizer:
     def NumGeneColumns(self):
         return 1
 
-    def VisualizeGenes(self, axes, gene_col_idx):
-        for idx in range(self.aligned_data.NumSamples()):
-            plt.sca(axes[idx][gene_col_idx])
-            axes[idx][gene_col_idx].axis('on')
+    def GetGeneTrack(self, idx):
+        #### strand-flipped and scaled gene coordinates are computed once per sample
+        if idx not in self.gene_tracks:
             gene_df = self.aligned_data.GetGeneTableByIdx(idx)
             locus_len = self.aligned_data.GetLengthByIdx(idx)
             strand = self.aligned_data.GetStrandByIdx(idx)
-            for i in range(len(gene_df)):
-                pos_list = utils.ModifyPos(gene_df['Start'][i], locus_len, strand), utils.ModifyPos(gene_df['End'][i], locus_len, strand)
-                scaled_pos_list = [(self.config.plot_scale - gene_pos / locus_len * self.config.plot_scale) for gene_pos in pos_list]
-                width = max(2, abs(scaled_pos_list[0] - scaled_pos_list[1]))
-                rect = patches.Rectangle((0, min(scaled_pos_list)), 1, width, linewidth=0, edgecolor='r', facecolor=gene_df['Color'][i])
-                plt.gca().add_patch(rect)
-            plt.xlim(0, 1)
-            plt.ylim(0, self.config.plot_scale)
-            plt.xticks([], [])
-            plt.yticks([], [])
+            scaled_start = utils.ModifyPos(gene_df['Start'].to_numpy(), locus_len, strand) / locus_len * self.config.plot_scale
+            scaled_end = utils.ModifyPos(gene_df['End'].to_numpy(), locus_len, strand) / locus_len * self.config.plot_scale
+            self.gene_tracks[idx] = {'low' : np.minimum(scaled_start, scaled_end),
+                                     'high' : np.maximum(scaled_start, scaled_end),
+                                     'width' : np.maximum(2, np.abs(scaled_start - scaled_end)),
+                                     'colors' : list(gene_df['Color'])}
+        return self.gene_tracks[idx]
 
-    def VisualizePairwiseGenes(self, axes, idx1, idx2):
-        plt.sca(axes[1, 0])
-        gene_df2 = self.aligned_data.GetGeneTableByIdx(idx2)
-        locus_len2 = self.aligned_data.GetLengthByIdx(idx2)
-        strand2 = self.aligned_data.GetStrandByIdx(idx2)
-        for i in range(len(gene_df2)):
-            pos_list = utils.ModifyPos(gene_df2['Start'][i], locus_len2, strand2), utils.ModifyPos(gene_df2['End'][i], locus_len2, strand2)
-            scaled_pos_list = [gene_pos / locus_len2 * self.config.plot_scale for gene_pos in pos_list]
-            width = max(2, abs(scaled_pos_list[0] - scaled_pos_list[1]))
-            rect = patches.Rectangle((min(scaled_pos_list), 0), width, 1, linewidth=0, edgecolor='r', facecolor=gene_df2['Color'][i])
-            plt.gca().add_patch(rect)
-        plt.xlim(0, self.config.plot_scale)
-        plt.ylim(0, 1)
-        plt.xticks([], [])
-        plt.yticks([], [])
-        ####
+    def VisualizeGenes(self, axes, gene_col_idx):
+        for idx in range(self.aligned_data.NumSamples()):
+            axes[idx][gene_col_idx].axis('on')
+            DrawVerticalGeneTrack(axes[idx][gene_col_idx], self.GetGeneTrack(idx), self.config)
+
+    def GetPairwiseGeneTracks(self, idx1, idx2):
         if idx1 == idx2:
-            axes[0, 1].axis("off")
-            return
-        plt.sca(axes[0, 1])
-        gene_df1 = self.aligned_data.GetGeneTableByIdx(idx1)
-        locus_len1 = self.aligned_data.GetLengthByIdx(idx1)
-        strand1 = self.aligned_data.GetStrandByIdx(idx1)
-        for i in range(len(gene_df1)):
-            pos_list = utils.ModifyPos(gene_df1['Start'][i], locus_len1, strand1), utils.ModifyPos(gene_df1['End'][i], locus_len1, strand1)
-            scaled_pos_list = [(self.config.plot_scale - gene_pos / locus_len1 * self.config.plot_scale) for gene_pos in pos_list]
-            width = max(2, abs(scaled_pos_list[0] - scaled_pos_list[1]))
-            rect = patches.Rectangle((0, min(scaled_pos_list)), 1, width, linewidth=0, edgecolor='r', facecolor=gene_df1['Color'][i])
-            plt.gca().add_patch(rect)
-        plt.xlim(0, 1)
-        plt.ylim(0, self.config.plot_scale)
-        plt.xticks([], [])
-        plt.yticks([], [])
+            return self.GetGeneTrack(idx2), None
+        return self.GetGeneTrack(idx2), self.GetGeneTrack(idx1)
+
+    def VisualizePairwiseGenes(self, axes, idx1, idx2):
+        DrawPairwiseGenes(axes, self.GetPairwiseGeneTracks(idx1, idx2), self.config)
+
+
+def GetRectangleVertices(x, y, width, height):
+    #### vertices of rectangles with the shape (num_rectangles, 4 corners, 2 coordinates)
+    x, y, width, height = np.broadcast_arrays(*[np.asarray(v, dtype = float) for v in [x, y, width, height]])
+    return np.stack([np.column_stack([x, y]), np.column_stack([x + width, y]),
+                     np.column_stack([x + width, y + height]), np.column_stack([x, y + height])], axis = 1)
+
+def DrawVerticalGeneTrack(ax, gene_track, config):
+    if len(gene_track['colors']) != 0:
+        vertices = GetRectangleVertices(0, config.plot_scale - gene_track['high'], 1, gene_track['width'])
+        ax.add_collection(PolyCollection(vertices, facecolors = gene_track['colors'], linewidths = 0))
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0, config.plot_scale)
+    ax.set_xticks([], [])
+    ax.set_yticks([], [])
+
+def DrawHorizontalGeneTrack(ax, gene_track, config):
+    if len(gene_track['colors']) != 0:
+        vertices = GetRectangleVertices(gene_track['low'], 0, gene_track['width'], 1)
+        ax.add_collection(PolyCollection(vertices, facecolors = gene_track['colors'], linewidths = 0))
+    ax.set_xlim(0, config.plot_scale)
+    ax.set_ylim(0, 1)
+    ax.set_xticks([], [])
+    ax.set_yticks([], [])
+
+def DrawPairwiseGenes(axes, gene_tracks, config):
+    if gene_tracks is None:
+        axes[1, 0].axis("off")
+        axes[0, 1].axis("off")
+        return
+    horizontal_track, vertical_track = gene_tracks
+    DrawHorizontalGeneTrack(axes[1, 0], horizontal_track, config)
+    if vertical_track is None:
+        axes[0, 1].axis("off")
+        return
+    DrawVerticalGeneTrack(axes[0, 1], vertical_track, config)
 
 
 class ColorUtils:
@@ -103,6 +130,16 @@ class ColorUtils:
             return self.config.color
         return utils.ColorByPercentIdentity(self.config.cmap, pi, self.config.pi_min, self.config.pi_max, self.config.cmap_reverse)
 
+    def GetColors(self, pi_values):
+        if self.config.color != '':
+            return mplt.colors.to_rgba_array([self.config.color] * len(pi_values))
+        return utils.ColorsByPercentIdentity(self.config.cmap, pi_values, self.config.pi_min, self.config.pi_max, self.config.cmap_reverse)
+
+    def GetColorBins(self, pi_values):
+        if self.config.color != '':
+            return np.zeros(len(pi_values), dtype = np.int64)
+        return utils.ColorBinsByPercentIdentity(self.config.cmap, pi_values, self.config.pi_min, self.config.pi_max, self.config.cmap_reverse, self.config.lod_color_bins)
+
 class UpperTriangleUtils:
     def __init__(self, aligned_data, gene_vis_utils):
         self.aligned_data = aligned_data
@@ -112,6 +149,12 @@ class UpperTriangleUtils:
     def SetCurrentAxes(self, axes, idx1, idx2):
         plt.sca(axes[idx1][idx2])
         axes[idx1][idx2].axis('on')
+        return axes[idx1][idx2]
+
+    @staticmethod
+    def GetPanelPosition(idx1, idx2):
+        #### row and column of the panel in the matrix of samples, gene columns are not counted
+        return idx1, idx2
 
     def GetGeneColumnIndex(self):
         return self.num_samples
@@ -125,7 +168,8 @@ class UpperTriangleUtils:
     def NumRows(self):
         return self.num_samples
 
-    def GetLineCoordinates(self, x1, x2, y1, y2, scale):
+    @staticmethod
+    def GetLineCoordinates(x1, x2, y1, y2, scale):
         return [y1, y2], [scale - x1, scale - x2]
 
     def SetLabels(self, axes, sample_labels):
@@ -150,6 +194,11 @@ class LowerTriangleUtils:
     def SetCurrentAxes(self, axes, idx1, idx2):
         plt.sca(axes[idx2][idx1 + self.col_shift])
         axes[idx2][idx1 + self.col_shift].axis('on')
+        return axes[idx2][idx1 + self.col_shift]
+
+    @staticmethod
+    def GetPanelPosition(idx1, idx2):
+        return idx2, idx1
 
     def GetGeneColumnIndex(self):
         return 0
@@ -163,7 +212,8 @@ class LowerTriangleUtils:
     def NumRows(self):
         return self.num_samples
 
-    def GetLineCoordinates(self, x1, x2, y1, y2, scale):
+    @staticmethod
+    def GetLineCoordinates(x1, x2, y1, y2, scale):
         return [x1, x2], [scale - y1, scale - y2]
 
     def SetLabels(self, axes, sample_labels):
@@ -179,6 +229,78 @@ class LowerTriangleUtils:
         self.gene_vis_utils.VisualizePairwiseGenes(axes, idx1, idx2)
 
 
+def GetAlignmentSegments(plot_utils, df, len1, len2, config):
+    scaled_start1 = df['start1_dir'].to_numpy() / len1 * config.plot_scale
+    scaled_end1 = df['end1_dir'].to_numpy() / len1 * config.plot_scale
+    scaled_start2 = df['start2_dir'].to_numpy() / len2 * config.plot_scale
+    scaled_end2 = df['end2_dir'].to_numpy() / len2 * config.plot_scale
+    x, y = plot_utils.GetLineCoordinates(scaled_start1, scaled_end1, scaled_start2, scaled_end2, config.plot_scale)
+    #### segments have the shape (num_alignments, 2 endpoints, 2 coordinates)
+    return np.stack([np.column_stack([x[0], y[0]]), np.column_stack([x[1], y[1]])], axis = 1)
+
+def GetPixelSize(ax, config):
+    #### sizes of an output pixel in data coordinates; axes positions should be final, i.e., set after subplots_adjust
+    position = ax.get_position()
+    fig_width, fig_height = ax.get_figure().get_size_inches()
+    return config.plot_scale / (position.width * fig_width * OUTPUT_DPI), config.plot_scale / (position.height * fig_height * OUTPUT_DPI)
+
+def DecimateSegments(segments, pi_values, color_bins, pixel_size):
+    #### segments sharing both end pixels and the color bin cannot be told apart in the output,
+    #### only the one with the highest identity is kept. Returns sorted indices of kept segments
+    pixels = np.floor(segments / np.asarray(pixel_size)).astype(np.int64)
+    #### a segment is drawn the same way in both directions
+    swap = (pixels[:, 0, 0] > pixels[:, 1, 0]) | ((pixels[:, 0, 0] == pixels[:, 1, 0]) & (pixels[:, 0, 1] > pixels[:, 1, 1]))
+    pixels[swap] = pixels[swap][:, ::-1]
+    keys = np.column_stack([pixels.reshape(len(pixels), 4), color_bins])
+    #### segments are grouped by keys, the one with the highest identity goes first in each group
+    order = np.lexsort((-np.asarray(pi_values, dtype = float),) + tuple(keys.T[::-1]))
+    sorted_keys = keys[order]
+    first_in_group = np.ones(len(order), dtype = bool)
+    first_in_group[1:] = np.any(sorted_keys[1:] != sorted_keys[:-1], axis = 1)
+    return np.sort(order[first_in_group])
+
+def DrawAlignments(ax, plot_utils, color_utils, df, len1, len2, config):
+    #### returns the number of drawn alignment segments
+    if len(df) == 0:
+        return 0
+    segments = GetAlignmentSegments(plot_utils, df, len1, len2, config)
+    pi_values = df['id%'].to_numpy()
+    if config.lod:
+        kept_idx = DecimateSegments(segments, pi_values, color_utils.GetColorBins(pi_values), GetPixelSize(ax, config))
+        segments = segments[kept_idx]
+        pi_values = pi_values[kept_idx]
+    colors = color_utils.GetColors(pi_values)
+    ax.add_collection(LineCollection(segments, colors = colors, linewidths = config.linewidth, linestyle = '-', capstyle = 'projecting'))
+    return len(segments)
+
+def GetBreakpointSegments(plot_utils, df, len1, len2, config, pixel_size = None):
+    #### lines through the ends of long alignments; if pixel_size is given, only one line per output pixel is kept
+    align_lens = np.minimum(np.abs(df['end2_dir'].to_numpy() - df['start2_dir'].to_numpy()), np.abs(df['end1_dir'].to_numpy() - df['start1_dir'].to_numpy()))
+    df = df.loc[align_lens > config.bp_min_len]
+    if len(df) == 0:
+        return np.zeros((0, 2, 2))
+    segments = GetAlignmentSegments(plot_utils, df, len1, len2, config)
+    xs = np.concatenate([segments[:, 0, 0], segments[:, 1, 0]])
+    ys = np.concatenate([segments[:, 0, 1], segments[:, 1, 1]])
+    if pixel_size is not None:
+        pixel_width, pixel_height = pixel_size
+        xs = xs[np.unique(np.floor(xs / pixel_width), return_index = True)[1]]
+        ys = ys[np.unique(np.floor(ys / pixel_height), return_index = True)[1]]
+    horizontal = np.stack([np.column_stack([np.zeros(len(ys)), ys]), np.column_stack([np.full(len(ys), config.plot_scale), ys])], axis = 1)
+    vertical = np.stack([np.column_stack([xs, np.zeros(len(xs))]), np.column_stack([xs, np.full(len(xs), config.plot_scale)])], axis = 1)
+    return np.concatenate([horizontal, vertical])
+
+def DrawBreakpoints(ax, plot_utils, df, len1, len2, config):
+    segments = GetBreakpointSegments(plot_utils, df, len1, len2, config, GetPixelSize(ax, config) if config.lod else None)
+    if len(segments) == 0:
+        return
+    ax.add_collection(LineCollection(segments, colors = config.bp_color, linewidths = config.bp_linewidth, linestyle = '-', capstyle = 'projecting'))
+
+def ReportDecimation(figure_name, num_drawn, num_segments, config):
+    if not config.lod or config.verbose == 0:
+        return
+    print('Level of detail: ' + str(num_segments - num_drawn) + ' of ' + str(num_segments) + ' alignment segments were dropped from ' + figure_name)
+
 def GetRatios(aligned_data):
     locus_lens = [aligned_data.GetLengthByIdx(i) for i in range(aligned_data.NumSamples())]
     min_len = min(locus_lens)
@@ -186,10 +308,16 @@ def GetRatios(aligned_data):
     return ratios
 
 def VisualizePlot(plot_utils, aligned_data, config):
+    with profile_utils.profiler.Stage('VisualizePlot'):
+        fig, axes = BuildMatrixPlot(plot_utils, aligned_data, config)
+    SaveMatrixPlot(fig, config)
+
+def BuildMatrixPlot(plot_utils, aligned_data, config):
     #### get ratios
     ratios = GetRatios(aligned_data)
     width_ratios = plot_utils.GetWidthRatios(ratios)
     fig, axes = plt.subplots(nrows = plot_utils.NumRows(), ncols = plot_utils.NumColumns(), figsize = (20, 20), gridspec_kw={'height_ratios': ratios, 'width_ratios' : width_ratios})
+    fig.subplots_adjust(hspace = 0, wspace = 0)
 
     #### setting up axes
     for i in range(plot_utils.NumRows()):
@@ -200,28 +328,19 @@ def VisualizePlot(plot_utils, aligned_data, config):
 
     #### plotting alignments
     color_utils = ColorUtils(config)
+    num_drawn = 0
+    num_segments = 0
     for idx1, idx2 in aligned_data.IndexPairIterator():
-        plot_utils.SetCurrentAxes(axes, idx1, idx2)
+        ax = plot_utils.SetCurrentAxes(axes, idx1, idx2)
         df = aligned_data.GetAlignmentDF(idx1, idx2)
         len1 = aligned_data.GetLengthByIdx(idx1)
         len2 = aligned_data.GetLengthByIdx(idx2)
-        for i in range(len(df)):
-            pos1 = [df['start1_dir'][i], df['end1_dir'][i]]
-            pos2 = [df['start2_dir'][i], df['end2_dir'][i]]
-            scaled_pos1 = [pos / len1 * config.plot_scale for pos in pos1]
-            scaled_pos2 = [pos / len2 * config.plot_scale for pos in pos2]
-            pi = df['id%'][i]
-            pi_color = color_utils.GetColor(pi)
-            x, y = plot_utils.GetLineCoordinates(scaled_pos1[0], scaled_pos1[1], scaled_pos2[0], scaled_pos2[1], config.plot_scale)
-            plt.plot(x, y, color = pi_color, linewidth=config.linewidth, linestyle = '-', marker = 'None')
-            #### add breakpoints
-            if config.show_breakpoints:
-                if min(abs(pos2[1] - pos2[0]), abs(pos1[1] - pos1[0])) <= config.bp_min_len:
-                    continue
-                plt.plot([0, config.plot_scale], [y[0], y[0]], color = config.bp_color, linestyle = '-', marker = 'None', linewidth = config.bp_linewidth)
-                plt.plot([0, config.plot_scale], [y[1], y[1]], color = config.bp_color, linestyle = '-', marker = 'None', linewidth = config.bp_linewidth)
-                plt.plot([x[0], x[0]], [0, config.plot_scale], color = config.bp_color, linestyle = '-', marker = 'None', linewidth = config.bp_linewidth)
-                plt.plot([x[1], x[1]], [0, config.plot_scale], color = config.bp_color, linestyle = '-', marker = 'None', linewidth = config.bp_linewidth)
+        if config.show_breakpoints:
+            DrawBreakpoints(ax, plot_utils, df, len1, len2, config)
+        panel_drawn = DrawAlignments(ax, plot_utils, color_utils, df, len1, len2, config)
+        profile_utils.profiler.RecordPanel('patchworkplot', idx1, idx2, profile_utils.CountArtists(ax), panel_drawn, len(df) - panel_drawn)
+        num_drawn += panel_drawn
+        num_segments += len(df)
         plt.xlim(0, config.plot_scale)
         plt.ylim(0, config.plot_scale)
         plt.xticks([], [])
@@ -257,12 +376,15 @@ def VisualizePlot(plot_utils, aligned_data, config):
         labels.append(label)
     plot_utils.SetLabels(axes, labels)
     plot_utils.VisualizeGenes(axes)
+    ReportDecimation('patchworkplot', num_drawn, num_segments, config)
+    return fig, axes
 
+def SaveMatrixPlot(fig, config):
     #### output plot as .PNG, .PDF
-    plt.subplots_adjust(hspace = 0, wspace = 0)
-    plt.savefig(os.path.join(config.output_dir, 'patchworkplot.png'), dpi = 300, bbox_inches='tight',transparent = config.transparent)
-    plt.savefig(os.path.join(config.output_dir, 'patchworkplot.pdf'), dpi = 300, bbox_inches='tight',)
-    plt.clf()
+    with profile_utils.profiler.Stage('VisualizePlot.savefig'):
+        fig.savefig(os.path.join(config.output_dir, 'patchworkplot.png'), dpi = OUTPUT_DPI, bbox_inches='tight',transparent = config.transparent)
+        fig.savefig(os.path.join(config.output_dir, 'patchworkplot.pdf'), dpi = OUTPUT_DPI, bbox_inches='tight',)
+    plt.close(fig)
 
 def GetFigureSizes(len1, len2):
     max_len = 6
@@ -271,34 +393,68 @@ def GetFigureSizes(len1, len2):
         return min_len, max_len
     return max_len, min_len
 
-def PlotPairwiseAlignments(plot_utils, aligned_data, config):
-    color_utils = ColorUtils(config)
+class PairPlotTask:
+    def __init__(self, plot_utils, aligned_data, config, idx1, idx2):
+        df = aligned_data.GetAlignmentDF(idx1, idx2)
+        #### only the columns needed for drawing are sent to the workers
+        self.columns = {c : df[c].to_numpy() for c in ['start1_dir', 'end1_dir', 'start2_dir', 'end2_dir', 'id%']}
+        self.line_utils = type(plot_utils)
+        self.gene_tracks = plot_utils.gene_vis_utils.GetPairwiseGeneTracks(idx1, idx2)
+        self.idx1 = idx1
+        self.idx2 = idx2
+        self.len1 = aligned_data.GetLengthByIdx(idx1)
+        self.len2 = aligned_data.GetLengthByIdx(idx2)
+        self.config = config
+        self.output_png = os.path.join(config.pairwise_plot_dir, str(idx1) + '-' + aligned_data.GetSampleNameByIdx(idx1) + '_' + str(idx2) + '-' + aligned_data.GetSampleNameByIdx(idx2) + '.png')
+
+def BuildPairwisePlot(task):
+    #### returns the figure and the numbers of drawn and dropped alignment segments
+    config = task.config
+    df = pd.DataFrame(task.columns, copy = False)
     ratio = 10
-    for idx1 in range(aligned_data.NumSamples()):
-        for idx2 in range(idx1, aligned_data.NumSamples()):
-            df = aligned_data.GetAlignmentDF(idx1, idx2)
-            locus_len1 = aligned_data.GetLengthByIdx(idx1)
-            locus_len2 = aligned_data.GetLengthByIdx(idx2)
-            s1, s2 = GetFigureSizes(locus_len1, locus_len2)
-            ratio2 = s1 * (ratio + 1) / s2
-            fig, axes = plt.subplots(2, 2, figsize = (s1, s2), gridspec_kw={'height_ratios': [ratio, 1], 'width_ratios' : [(ratio2 + 1), 1]})
-            plt.sca(axes[0, 0])
-            for i in range(len(df)):
-                pos1 = [df['start1_dir'][i], df['end1_dir'][i]]
-                pos2 = [df['start2_dir'][i], df['end2_dir'][i]]
-                scaled_pos1 = [pos / locus_len1 * config.plot_scale for pos in pos1]
-                scaled_pos2 = [pos / locus_len2 * config.plot_scale for pos in pos2]
-                pi = df['id%'][i]
-                pi_color = color_utils.GetColor(pi)
-                x, y = plot_utils.GetLineCoordinates(scaled_pos1[0], scaled_pos1[1], scaled_pos2[0], scaled_pos2[1], config.plot_scale)
-                plt.plot(x, y, color = pi_color, linewidth=config.linewidth, linestyle = '-', marker = 'None')
-            plt.xlim(0, config.plot_scale)
-            plt.ylim(0, config.plot_scale)
-            plt.xticks([], [])
-            plt.yticks([], [])
-            plot_utils.VisualizePairwiseGenes(axes, idx1, idx2)
-            axes[1, 1].axis("off")
-            plt.subplots_adjust(hspace = 0, wspace = 0)
-            plt.savefig(os.path.join(config.pairwise_plot_dir, str(idx1) + '-' + aligned_data.GetSampleNameByIdx(idx1) + '_' + str(idx2) + '-' + aligned_data.GetSampleNameByIdx(idx2) + '.png'), dpi = 300)
-            plt.clf()
-            plt.close()
+    s1, s2 = GetFigureSizes(task.len1, task.len2)
+    ratio2 = s1 * (ratio + 1) / s2
+    fig = Figure(figsize = (s1, s2))
+    axes = fig.subplots(2, 2, gridspec_kw={'height_ratios': [ratio, 1], 'width_ratios' : [(ratio2 + 1), 1]})
+    fig.subplots_adjust(hspace = 0, wspace = 0)
+    num_drawn = DrawAlignments(axes[0, 0], task.line_utils, ColorUtils(config), df, task.len1, task.len2, config)
+    axes[0, 0].set_xlim(0, config.plot_scale)
+    axes[0, 0].set_ylim(0, config.plot_scale)
+    axes[0, 0].set_xticks([], [])
+    axes[0, 0].set_yticks([], [])
+    DrawPairwiseGenes(axes, task.gene_tracks, config)
+    axes[1, 1].axis("off")
+    return fig, num_drawn, len(df) - num_drawn
+
+def RenderPairwisePlot(task):
+    fig, num_drawn, num_dropped = BuildPairwisePlot(task)
+    fig.savefig(task.output_png, dpi = OUTPUT_DPI)
+    return {'output_png' : task.output_png, 'idx1' : task.idx1, 'idx2' : task.idx2,
+            'artists' : profile_utils.CountArtists(fig.axes[0]), 'segments' : num_drawn, 'dropped' : num_dropped}
+
+def PlotPairwiseAlignments(plot_utils, aligned_data, config):
+    #### tasks are created lazily, so that only tables of the pairs being rendered are loaded at once
+    pairs = [(idx1, idx2) for idx1 in range(aligned_data.NumSamples()) for idx2 in range(idx1, aligned_data.NumSamples())]
+    tasks = (PairPlotTask(plot_utils, aligned_data, config, idx1, idx2) for idx1, idx2 in pairs)
+    if config.num_threads <= 1:
+        results = [RecordPairwisePlot(RenderPairwisePlot(task), config) for task in tasks]
+    else:
+        num_workers = min(config.num_threads, len(pairs))
+        results = []
+        with pool_utils.WorkerPool(ProcessPoolExecutor, num_workers) as executor:
+            #### at most two tasks per worker are submitted ahead
+            futures = deque()
+            for task in tasks:
+                futures.append(executor.submit(RenderPairwisePlot, task))
+                if len(futures) >= 2 * num_workers:
+                    results.append(RecordPairwisePlot(futures.popleft().result(), config))
+            while len(futures) != 0:
+                results.append(RecordPairwisePlot(futures.popleft().result(), config))
+    num_drawn = sum(result['segments'] for result in results)
+    ReportDecimation('pairwise dotplots', num_drawn, num_drawn + sum(result['dropped'] for result in results), config)
+
+def RecordPairwisePlot(result, config):
+    profile_utils.profiler.RecordPanel('pairwise_dotplot', result['idx1'], result['idx2'], result['artists'], result['segments'], result['dropped'])
+    if config.verbose == 2 and config.num_threads > 1:
+        print('  ' + result['output_png'] + ' was rendered')
+    return result
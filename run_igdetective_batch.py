@@ -0,0 +1,92 @@
+import os
+import sys
+
+pwd = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(pwd, 'py'))
+
+import config_utils
+import profile_utils
+import PatchWorkPlot
+
+#### python3 run_igdetective_batch.py PATHS_TO_IGDETECTIVE_DIRS OUTPUT_DIR [--loci IGH,IGK,...] {PatchWorkPlot options}
+
+def ParseBatchParams(command_args):
+    #### returns IgDetective directories, the output directory, loci and the options passed to PatchWorkPlot
+    import igdetective_utils
+    if len(command_args) < 2:
+        print('python run_igdetective_batch.py PATHS_TO_IGDETECTIVE_DIRS OUTPUT_DIR [--loci ' + ','.join(igdetective_utils.LOCI) + '] {PatchWorkPlot options}')
+        sys.exit(1)
+    igdetect_dirs = igdetective_utils.SplitDirList(command_args[0])
+    output_dir = command_args[1]
+    loci = igdetective_utils.LOCI
+    plot_args = []
+    option_args = command_args[2:]
+    i = 0
+    while i < len(option_args):
+        if option_args[i] == '--loci' and i + 1 < len(option_args):
+            loci = [locus for locus in option_args[i + 1].split(',') if locus != '']
+            i += 2
+            continue
+        plot_args.append(option_args[i])
+        i += 1
+    unknown_loci = [locus for locus in loci if locus not in igdetective_utils.LOCI]
+    if len(unknown_loci) != 0:
+        print('ERROR: unknown loci ' + ', '.join(unknown_loci) + ', available loci: ' + ', '.join(igdetective_utils.LOCI))
+        sys.exit(1)
+    return igdetect_dirs, output_dir, loci, plot_args
+
+def WriteLocusConfigs(igdetect_dirs, output_dir, loci):
+    #### each IgDetective directory is read once for all loci; returns configs of loci found in at least one sample
+    import utils
+    import igdetective_utils
+    samples = igdetective_utils.ReadSamples(igdetect_dirs, loci)
+    config_dir = os.path.join(output_dir, 'configs')
+    utils.PrepareDir(config_dir)
+    locus_configs = []
+    for locus in loci:
+        locus_config_dir = os.path.join(config_dir, locus)
+        utils.PrepareDir(locus_config_dir)
+        config_csv, num_samples = igdetective_utils.WriteLocusConfig(samples, locus, locus_config_dir)
+        if num_samples == 0:
+            print('WARNING: locus ' + locus + ' was not found in IgDetective directories and will be skipped')
+            continue
+        print(locus + ': ' + str(num_samples) + ' sample(s), config ' + config_csv)
+        locus_configs.append((locus, config_csv))
+    return locus_configs
+
+def RunLocus(locus, config):
+    #### each locus has its own profile in its output directory
+    import utils
+    profile_utils.profiler = profile_utils.RunProfiler()
+    profiler = profile_utils.profiler
+    if config.profile:
+        profiler.Enable(config.cprofile)
+    print('\n==== ' + locus + ' ====')
+    utils.PrepareDir(config.output_dir)
+    aligned_data = PatchWorkPlot.RunAlignmentStage(config, profiler)
+    PatchWorkPlot.RunVisualizationStage(aligned_data, config, profiler)
+    profiler.Write(config.output_dir)
+
+def main(command_args):
+    igdetect_dirs, output_dir, loci, plot_args = ParseBatchParams(command_args)
+    import utils
+    import pool_utils
+    utils.PrepareDir(output_dir)
+    locus_configs = WriteLocusConfigs(igdetect_dirs, output_dir, loci)
+    #### options are checked for all loci before any of them is aligned; the alignment cache is shared by default
+    shared_args = ['--cache-dir', os.path.join(output_dir, 'alignment_cache')] + plot_args
+    configs = [(locus, config_utils.Config('config.txt', shared_args + ['-i', config_csv, '-o', os.path.join(output_dir, locus)]))
+               for locus, config_csv in locus_configs]
+    if len(configs) != 0 and configs[0][1].serve_port > 0:
+        print('ERROR: --serve is not supported by the batch mode, run PatchWorkPlot.py on a single locus instead')
+        sys.exit(1)
+    #### aligners and renderers of all loci share worker pools, so that workers are started once
+    num_threads = configs[0][1].num_threads if len(configs) != 0 else 1
+    with pool_utils.SharedPools(num_threads):
+        for locus, config in configs:
+            RunLocus(locus, config)
+    print('\nThank you for using PatchWorkPlot!')
+    PatchWorkPlot.PrintPatchWorkLogo()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,78 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+pwd = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(pwd, '..', 'py'))
+
+import utils
+import config_utils
+import data_utils
+import tool_builder
+
+SEQ_LEN = 30000
+SAMPLE_NAMES = ['a', 'b', 'c']
+
+def RandomSequence(rng, length):
+    return ''.join(rng.choice(list('ACGT'), length))
+
+def MutateSequence(rng, seq, substitution_rate = 0.03, num_indels = 5):
+    #### substitutions and a few short indels, so that k-mer chains drift across diagonals
+    chars = np.array(list(seq))
+    mutated = rng.random(len(chars)) < substitution_rate
+    chars[mutated] = rng.choice(list('ACGT'), mutated.sum())
+    seq = ''.join(chars)
+    for pos in sorted(rng.integers(0, len(seq), num_indels), reverse = True):
+        seq = seq[:pos] + RandomSequence(rng, 10) + seq[pos + 10:] if rng.random() < 0.5 else seq[:pos] + seq[pos + 10:]
+    return seq
+
+def ReverseComplement(seq):
+    return seq[::-1].translate(str.maketrans('ACGT', 'TGCA'))
+
+def WriteFasta(fasta, name, seq):
+    with open(fasta, 'w') as fh:
+        fh.write('>' + name + '\n')
+        for i in range(0, len(seq), 80):
+            fh.write(seq[i : i + 80] + '\n')
+
+def WriteConfig(config_csv, sample_fastas, sample_names):
+    pd.DataFrame({'SampleID' : sample_names, 'Label' : sample_names,
+                  'Fasta' : [sample_fastas[name] for name in sample_names]}).to_csv(config_csv, index = False)
+    return config_csv
+
+def AlignSamples(config_csv, output_dir, extra_args = []):
+    #### the alignment stage of PatchWorkPlot with the built-in k-mer aligner
+    config = config_utils.Config('', ['-i', config_csv, '-o', output_dir, '--aligner', 'kmer', '--min-len', '1000'] + extra_args)
+    for dir_name in [config.output_dir, config.align_dir]:
+        utils.PrepareDir(dir_name)
+    input_data = data_utils.InputData(config.input_csv)
+    pairwise_aligner = tool_builder.AlignerFactory(config, input_data).GetAligner()
+    return data_utils.AlignedData(input_data, pairwise_aligner, config)
+
+TABLE_COLUMNS = ['start1', 'end1', 'start2+', 'end2+', 'strand2', 'id%']
+
+def NormalizeTable(df):
+    #### raw columns of processed tables, independent of the order of rows and of categorical strands
+    df = pd.DataFrame({column : df[column].astype(str) if column == 'strand2' else df[column] for column in TABLE_COLUMNS})
+    return df.sort_values(TABLE_COLUMNS).reset_index(drop = True)
+
+def GetTablesByNames(aligned_data):
+    names = [aligned_data.GetSampleNameByIdx(i) for i in range(aligned_data.NumSamples())]
+    return {(names[idx1], names[idx2]) : aligned_data.GetAlignmentDF(idx1, idx2) for idx1, idx2 in aligned_data.align_dfs}
+
+@pytest.fixture
+def sample_fastas(tmp_path):
+    #### related sequences; the last one is reverse complemented, so that alignments of both strands are found
+    rng = np.random.default_rng(0)
+    base = RandomSequence(rng, SEQ_LEN)
+    seqs = [base, MutateSequence(rng, base), MutateSequence(rng, base)]
+    seqs[-1] = ReverseComplement(seqs[-1])
+    fasta_dir = tmp_path / 'fasta'
+    fasta_dir.mkdir()
+    sample_fastas = dict()
+    for name, seq in zip(SAMPLE_NAMES, seqs):
+        sample_fastas[name] = str(fasta_dir / (name + '.fasta'))
+        WriteFasta(sample_fastas[name], name, seq)
+    return sample_fastas
@@ -0,0 +1,58 @@
+import sys
+import numpy as np
+import pandas as pd
+
+import parser_utils
+import process_utils
+from conftest import RandomSequence, WriteFasta
+
+#### prints a PAF row of every query record against a fixed target, as minimap2 does for a combined query
+FAKE_ALIGNER = '''
+import sys
+name, length = None, 0
+def Report():
+    if name is not None:
+        print('\\t'.join([name, str(length), '0', str(length), '+', 'ref', '1000', '0', str(length), str(length), str(length), '60']))
+for line in open(sys.argv[1]):
+    if line.startswith('>'):
+        Report()
+        name, length = line[1:].split()[0], 0
+    else:
+        length += len(line.strip())
+Report()
+'''
+
+def test_split_table_by_query_tag(tmp_path):
+    combined_fname = str(tmp_path / 'combined.paf')
+    with open(combined_fname, 'w') as fh:
+        fh.write('q0|ctg1\t100\n')
+        fh.write('q1|ctg1\t200\n')
+        fh.write('q0|ctg2\t300\n')
+        #### rows of unknown tags and rows without tags are dropped
+        fh.write('q2|ctg1\t400\n')
+        fh.write('ctg1\t500\n')
+    output_fnames = {'q0' : str(tmp_path / 'q0.paf'), 'q1' : str(tmp_path / 'q1.paf')}
+    parser_utils.SplitTableByQueryTag(combined_fname, output_fnames)
+    assert open(output_fnames['q0']).read() == 'ctg1\t100\nctg2\t300\n'
+    assert open(output_fnames['q1']).read() == 'ctg1\t200\n'
+
+def test_batch_outputs_match_separate_runs(tmp_path):
+    rng = np.random.default_rng(0)
+    script = str(tmp_path / 'aligner.py')
+    with open(script, 'w') as fh:
+        fh.write(FAKE_ALIGNER)
+    query_outputs = []
+    for query_idx, length in enumerate([500, 700, 300]):
+        fasta = str(tmp_path / ('query' + str(query_idx) + '.fasta'))
+        #### all queries have the same record name, as samples of different haplotypes often do
+        WriteFasta(fasta, 'ctg1', RandomSequence(rng, length))
+        query_outputs.append((fasta, str(tmp_path / ('query' + str(query_idx) + '.paf'))))
+    process_utils.RunBatchAligner(lambda query_fasta, tmp_fname : [sys.executable, script, query_fasta], query_outputs)
+    for query_idx, (fasta, output_fname) in enumerate(query_outputs):
+        separate_fname = str(tmp_path / ('separate' + str(query_idx) + '.paf'))
+        process_utils.RunAligner([sys.executable, script, fasta], separate_fname)
+        df = parser_utils.ReadPafTable(output_fname)
+        assert len(df) == 1 and df['#name1'].iloc[0] == 'ref' and df['name2'].iloc[0] == 'ctg1'
+        pd.testing.assert_frame_equal(df, parser_utils.ReadPafTable(separate_fname))
+    #### the combined query and output are removed
+    assert not any(fname.name.startswith('batch') for fname in tmp_path.iterdir())
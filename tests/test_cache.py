@@ -0,0 +1,36 @@
+import os
+import pandas as pd
+
+import parser_utils
+import cache_utils
+from conftest import SAMPLE_NAMES, WriteConfig, AlignSamples, GetTablesByNames, NormalizeTable
+
+def test_reordered_samples_reuse_cache(tmp_path, sample_fastas):
+    cache_dir = str(tmp_path / 'cache')
+    config_csv = WriteConfig(str(tmp_path / 'config.csv'), sample_fastas, SAMPLE_NAMES)
+    first_run = AlignSamples(config_csv, str(tmp_path / 'out1'), ['--cache-dir', cache_dir])
+    entry_dir = os.path.join(cache_dir, 'entries')
+    num_entries = len(os.listdir(entry_dir))
+    assert num_entries == len(SAMPLE_NAMES) * (len(SAMPLE_NAMES) + 1) // 2
+
+    #### all pairs come from the cache, cross pairs in the reverse order
+    reversed_csv = WriteConfig(str(tmp_path / 'reversed.csv'), sample_fastas, SAMPLE_NAMES[::-1])
+    second_run = AlignSamples(reversed_csv, str(tmp_path / 'out2'), ['--cache-dir', cache_dir])
+    assert len(os.listdir(entry_dir)) == num_entries
+    assert len(second_run.swapped_pairs) == len(SAMPLE_NAMES) * (len(SAMPLE_NAMES) - 1) // 2
+
+    first_tables = GetTablesByNames(first_run)
+    for (name1, name2), df in GetTablesByNames(second_run).items():
+        if (name1, name2) in first_tables:
+            expected = first_tables[name1, name2]
+        else:
+            expected = parser_utils.SwapAlignedSequences(first_tables[name2, name1])
+        assert len(df) > 0
+        pd.testing.assert_frame_equal(NormalizeTable(df), NormalizeTable(expected))
+
+def test_key_does_not_depend_on_order(tmp_path, sample_fastas):
+    cache = cache_utils.AlignmentCache(str(tmp_path / 'cache'), 0)
+    fasta1, fasta2 = sample_fastas['a'], sample_fastas['b']
+    assert cache.GetKey(fasta1, fasta2, 'aligner') == cache.GetKey(fasta2, fasta1, 'aligner')
+    assert cache.GetKey(fasta1, fasta2, 'aligner') != cache.GetKey(fasta1, fasta2, 'other aligner')
+    assert cache.IsMirrored(fasta1, fasta2) != cache.IsMirrored(fasta2, fasta1)
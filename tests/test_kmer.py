@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+import kmer_utils
+from conftest import SEQ_LEN, RandomSequence, MutateSequence, ReverseComplement
+
+K = 15
+WINDOW = 10
+
+def AlignSequences(seq1, seq2):
+    return kmer_utils.AlignIndices(kmer_utils.SequenceIndex('seq1', seq1, K, WINDOW), kmer_utils.SequenceIndex('seq2', seq2, K, WINDOW), K)
+
+@pytest.mark.parametrize('strand', ['+', '-'])
+def test_related_sequences_give_one_long_chain(strand):
+    rng = np.random.default_rng(0)
+    seq1 = RandomSequence(rng, SEQ_LEN)
+    seq2 = MutateSequence(rng, seq1)
+    if strand == '-':
+        seq2 = ReverseComplement(seq2)
+    df = AlignSequences(seq1, seq2)
+    assert len(df) == 1
+    row = df.iloc[0]
+    assert row['strand2'] == strand
+    #### indels shift the second sequence by a few nucleotides
+    assert row['start1'] < 100 and row['end1'] > SEQ_LEN - 100
+    assert row['start2+'] < 200 and row['end2+'] > SEQ_LEN - 200
+    assert 90 <= float(row['id%'].rstrip('%')) <= 100
+
+def test_unrelated_sequences_are_not_aligned():
+    rng = np.random.default_rng(1)
+    df = AlignSequences(RandomSequence(rng, SEQ_LEN), RandomSequence(rng, SEQ_LEN))
+    assert len(df) == 0
+
+def test_kmers_with_unknown_characters_are_skipped():
+    codes = kmer_utils.EncodeSequence('ACGTNACGTacgt')
+    hashes = kmer_utils.GetKmerHashes(codes, 4)
+    assert list(hashes == kmer_utils.INVALID_HASH) == [False] + [True] * 4 + [False] * 5
+    #### lower case nucleotides are the same as upper case ones
+    assert hashes[5] == hashes[0] == hashes[9]
+    assert len(kmer_utils.GetKmerHashes(codes[:3], 4)) == 0
+
+def ChainRows(runs):
+    runs = np.array(runs, dtype = np.int64)
+    chains = kmer_utils.ChainRuns(runs[:, 0], runs[:, 1], runs[:, 2], runs[:, 3], runs[:, 4])
+    return sorted(tuple(row) for row in chains.tolist())
+
+def test_runs_separated_by_an_indel_are_chained():
+    #### rows are [start1, end1, first diagonal, last diagonal, number of seeds]; the second run is shifted by a 30 nt deletion
+    assert ChainRows([[0, 1000, 50, 55, 10], [1200, 2000, 80, 85, 8]]) == [(0, 2000, 50, 85, 18)]
+
+def test_distant_runs_are_not_chained():
+    runs = [[0, 1000, 50, 55, 10], [1000 + kmer_utils.MAX_GAP + 1, 5000, 50, 50, 8], [6000, 7000, 50 + 3 * kmer_utils.MAX_DRIFT, 350, 5]]
+    assert ChainRows(runs) == sorted(tuple(run) for run in runs)
+
+def test_run_claimed_by_two_predecessors_keeps_the_closest_one():
+    #### both first runs may precede the last one from neighbouring bands, the first run has a smaller diagonal shift
+    runs = [[0, 1000, 0, 5, 10], [0, 1000, 100, 100, 10], [1100, 2000, 10, 10, 10]]
+    assert ChainRows(runs) == [(0, 1000, 100, 100, 10), (0, 2000, 0, 10, 20)]
@@ -0,0 +1,38 @@
+import os
+import pandas as pd
+
+import parser_utils
+import manifest_utils
+from conftest import WriteConfig, AlignSamples, GetTablesByNames, NormalizeTable
+
+def test_reordered_and_inserted_samples_reuse_stored_pairs(tmp_path, sample_fastas):
+    output_dir = str(tmp_path / 'out')
+    first_run = AlignSamples(WriteConfig(str(tmp_path / 'first.csv'), sample_fastas, ['a', 'b']), output_dir, ['--incremental'])
+    align_dir = first_run.align_dir
+    stored_files = {fname : os.stat(os.path.join(align_dir, fname)).st_mtime_ns for fname in os.listdir(align_dir) if fname.endswith('.tsv')}
+    assert sorted(stored_files) == ['pair_a_b.tsv', 'self_a.tsv', 'self_b.tsv']
+
+    #### b goes before a and c is inserted between them: only pairs with c are aligned
+    second_run = AlignSamples(WriteConfig(str(tmp_path / 'second.csv'), sample_fastas, ['b', 'c', 'a']), output_dir, ['--incremental'])
+    for fname, mtime_ns in stored_files.items():
+        assert os.stat(os.path.join(align_dir, fname)).st_mtime_ns == mtime_ns
+    assert second_run.swapped_pairs == {(0, 2)}
+    manifest = manifest_utils.AlignmentManifest(align_dir, second_run.pairwise_aligner.GetFingerprint())
+    assert len(manifest.entries) == 6
+
+    first_tables = GetTablesByNames(first_run)
+    second_tables = GetTablesByNames(second_run)
+    pd.testing.assert_frame_equal(NormalizeTable(second_tables['b', 'a']), NormalizeTable(parser_utils.SwapAlignedSequences(first_tables['a', 'b'])))
+    for name in ['a', 'b']:
+        pd.testing.assert_frame_equal(NormalizeTable(second_tables[name, name]), NormalizeTable(first_tables[name, name]))
+
+def test_changed_fasta_invalidates_stored_pairs(tmp_path, sample_fastas):
+    output_dir = str(tmp_path / 'out')
+    config_csv = WriteConfig(str(tmp_path / 'config.csv'), sample_fastas, ['a', 'b'])
+    first_run = AlignSamples(config_csv, output_dir, ['--incremental'])
+    manifest = manifest_utils.AlignmentManifest(first_run.align_dir, first_run.pairwise_aligner.GetFingerprint())
+    assert manifest.FindPair('b', 'a', sample_fastas['b'], sample_fastas['a'])[1]
+    with open(sample_fastas['b'], 'a') as fh:
+        fh.write('ACGT\n')
+    assert manifest.FindPair('a', 'b', sample_fastas['a'], sample_fastas['b']) is None
+    assert manifest.FindPair('a', 'a', sample_fastas['a'], sample_fastas['a']) is not None
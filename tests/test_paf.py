@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+import parser_utils
+import paf_utils
+from conftest import SEQ_LEN, SAMPLE_NAMES, WriteConfig, AlignSamples, GetTablesByNames, NormalizeTable
+
+PAIRS = [('a', 'a'), ('b', 'b'), ('c', 'c'), ('a', 'b'), ('a', 'c'), ('b', 'c')]
+
+def RandomPafRows(rng, target, query, num_rows = 20):
+    #### minimap2 rows of the query against the target: coordinates of both sequences are on the forward strand
+    start1 = rng.integers(0, SEQ_LEN // 2, num_rows)
+    start2 = rng.integers(0, SEQ_LEN // 2, num_rows)
+    lengths = rng.integers(1000, 5000, num_rows)
+    return pd.DataFrame({0 : query, 1 : SEQ_LEN, 2 : start2, 3 : start2 + lengths, 4 : rng.choice(['+', '-'], num_rows),
+                         5 : target, 6 : SEQ_LEN, 7 : start1, 8 : start1 + lengths, 9 : (lengths * rng.uniform(0.8, 1, num_rows)).astype(int),
+                         10 : lengths, 11 : 60})
+
+def SwapPafRows(rows):
+    return rows.rename(columns = {0 : 5, 1 : 6, 2 : 7, 3 : 8, 5 : 0, 6 : 1, 7 : 2, 8 : 3})[list(range(12))]
+
+def WritePafConfig(tmp_path, config_name, paf_rows, swapped_pairs):
+    #### pairs in swapped_pairs are listed in the reverse order, with the PAF file of the reverse order
+    config = {'name1' : [], 'name2' : [], 'pafPath' : []}
+    for name1, name2 in PAIRS:
+        rows = paf_rows[name1, name2]
+        if (name1, name2) in swapped_pairs:
+            name1, name2, rows = name2, name1, SwapPafRows(rows)
+        paf_fname = str(tmp_path / (config_name + '_' + name1 + '_' + name2 + '.paf'))
+        rows.to_csv(paf_fname, sep = '\t', header = False, index = False)
+        for column, value in zip(['name1', 'name2', 'pafPath'], [name1, name2, paf_fname]):
+            config[column].append(value)
+    paf_config = str(tmp_path / (config_name + '.csv'))
+    pd.DataFrame(config).to_csv(paf_config, index = False)
+    return paf_config
+
+def test_pairs_listed_in_reverse_order_are_swapped(tmp_path, sample_fastas):
+    rng = np.random.default_rng(0)
+    paf_rows = {(name1, name2) : RandomPafRows(rng, name1, name2) for name1, name2 in PAIRS}
+    config_csv = WriteConfig(str(tmp_path / 'config.csv'), sample_fastas, SAMPLE_NAMES)
+    runs = []
+    for config_name, swapped_pairs in [('direct', []), ('reversed', [('a', 'b'), ('b', 'c')])]:
+        paf_config = WritePafConfig(tmp_path, config_name, paf_rows, swapped_pairs)
+        runs.append(AlignSamples(config_csv, str(tmp_path / config_name), ['--aligner', 'custom', '--paf-config', paf_config]))
+    assert runs[0].swapped_pairs == set() and runs[1].swapped_pairs == {(0, 1), (1, 2)}
+    direct_tables = GetTablesByNames(runs[0])
+    for names, df in GetTablesByNames(runs[1]).items():
+        assert len(df) > 0
+        pd.testing.assert_frame_equal(NormalizeTable(df), NormalizeTable(direct_tables[names]))
+        assert np.array_equal(df['start1_dir'], direct_tables[names]['start1_dir'])
+
+def test_converted_paf_matches_parsed_paf(tmp_path, monkeypatch):
+    #### generate_alignment_files.py writes the same table as PafReader parses, also across chunks
+    monkeypatch.setattr(paf_utils, 'CONVERT_CHUNK_SIZE', 7)
+    paf_fname = str(tmp_path / 'alignments.paf')
+    RandomPafRows(np.random.default_rng(1), 'a', 'b', 50).to_csv(paf_fname, sep = '\t', header = False, index = False)
+    output_tsv = str(tmp_path / 'alignments.tsv')
+    assert paf_utils.ConvertPaf(paf_fname, output_tsv) == 50
+    expected = paf_utils.PafReader(paf_fname, '\t').ParsePaf()
+    #### identities of both tables are percent strings
+    actual = pd.read_csv(output_tsv, sep = '\t', dtype = str)
+    for column in parser_utils.ALIGNMENT_COLUMNS:
+        assert list(actual[column]) == list(expected[column].astype(str))
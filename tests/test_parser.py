@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils
+import parser_utils
+
+NUM_ROWS = 50
+#### a small chunk size, so that tables are parsed in several chunks and categories of chunks are merged
+CHUNK_SIZE = 7
+MIN_ALIGN_LENS = [0, 1000]
+
+def RandomAlignments(seed):
+    rng = np.random.default_rng(seed)
+    start1 = rng.integers(0, 100000, NUM_ROWS)
+    start2 = rng.integers(0, 100000, NUM_ROWS)
+    lengths1 = rng.integers(100, 2000, NUM_ROWS)
+    lengths2 = lengths1 + rng.integers(-50, 50, NUM_ROWS)
+    return {'name1' : rng.choice(['chr1', 'chr2'], NUM_ROWS), 'name2' : rng.choice(['ctg1', 'ctg2', 'ctg3'], NUM_ROWS),
+            'start1' : start1, 'end1' : start1 + lengths1, 'start2' : start2, 'end2' : start2 + lengths2,
+            'strand2' : rng.choice(['+', '-'], NUM_ROWS), 'matches' : (np.minimum(lengths1, lengths2) * rng.uniform(0.7, 1, NUM_ROWS)).astype(int),
+            'identity' : np.round(rng.uniform(70, 100, NUM_ROWS), 2)}
+
+def FilterLegacyTable(df, min_align_len):
+    #### the part of AlignedData._ReadAlignments applied to the output of legacy parsers
+    df = df.loc[(df['length1'] >= min_align_len) & (df['length2'] >= min_align_len)].reset_index(drop = True)
+    df['id%'] = utils.PercentToFloat(df['id%'])
+    return df
+
+def NormalizeTable(df, columns):
+    #### legacy parsers kept strings and names as objects, typed parsers store them as categories
+    return pd.DataFrame({column : df[column].astype(str).to_numpy() if column in parser_utils.CATEGORY_COLUMNS else df[column].to_numpy()
+                         for column in columns})
+
+#### LASTZ general format and custom tables
+
+def WriteGeneralTable(fname, alignments, numeric_identity):
+    identity = alignments['identity'] if numeric_identity else [str(value) + '%' for value in alignments['identity']]
+    pd.DataFrame({'#name1' : alignments['name1'], 'strand1' : '+', 'start1' : alignments['start1'], 'end1' : alignments['end1'],
+                  'length1' : alignments['end1'] - alignments['start1'], 'name2' : alignments['name2'], 'strand2' : alignments['strand2'],
+                  'start2+' : alignments['start2'], 'end2+' : alignments['end2'], 'length2' : alignments['end2'] - alignments['start2'],
+                  'id%' : identity}).to_csv(fname, sep = '\t', index = False)
+
+def LegacyReadGeneralTable(fname):
+    return pd.read_csv(fname, sep = '\t')
+
+@pytest.mark.parametrize('numeric_identity', [False, True])
+@pytest.mark.parametrize('min_align_len', MIN_ALIGN_LENS)
+def test_general_table_matches_legacy_parser(tmp_path, monkeypatch, numeric_identity, min_align_len):
+    monkeypatch.setattr(parser_utils, 'CHUNK_SIZE', CHUNK_SIZE)
+    fname = str(tmp_path / 'alignments.tsv')
+    WriteGeneralTable(fname, RandomAlignments(1), numeric_identity)
+    expected = FilterLegacyTable(LegacyReadGeneralTable(fname), min_align_len)
+    actual = parser_utils.ReadGeneralTable(fname, min_align_len)
+    assert 0 < len(actual) <= NUM_ROWS
+    pd.testing.assert_frame_equal(NormalizeTable(actual, parser_utils.ALIGNMENT_COLUMNS), NormalizeTable(expected, parser_utils.ALIGNMENT_COLUMNS))
+
+#### YASS tabular output
+
+def WriteYassTable(fname, alignments):
+    #### reverse alignments have start2 > end2
+    reverse = alignments['strand2'] == '-'
+    start2 = np.where(reverse, alignments['end2'], alignments['start2'])
+    end2 = np.where(reverse, alignments['start2'], alignments['end2'])
+    with open(fname, 'w') as fh:
+        fh.write('# query_id subject_id identity alignment_length mismatches gap_openings q_start q_end s_start s_end e-value bit_score\n')
+        for i in range(NUM_ROWS):
+            fields = [alignments['name1'][i], alignments['name2'][i], alignments['identity'][i], alignments['end1'][i] - alignments['start1'][i],
+                      10, 2, alignments['start1'][i], alignments['end1'][i], start2[i], end2[i], '1e-50', 500]
+            fh.write('\t'.join(str(field) for field in fields) + '\n')
+
+def LegacyReadYassTable(fname):
+    #### the per-line parser of YassPairwiseAligner.GetAlignedDF before the typed parsers
+    lines = open(fname).readlines()[1:]
+    df = {'id%' : [], 'start1' : [], 'end1' : [], 'start2' : [], 'end2' : []}
+    for l in lines:
+        splits = l.strip().split()
+        df['id%'].append(splits[2] + '%')
+        df['start1'].append(int(splits[6]))
+        df['end1'].append(int(splits[7]))
+        df['start2'].append(int(splits[8]))
+        df['end2'].append(int(splits[9]))
+    df = pd.DataFrame(df)
+    start_list = []
+    end_list = []
+    strand_list = []
+    for i in range(len(df)):
+        if df['start2'][i] < df['end2'][i]:
+            start_list.append(df['start2'][i])
+            end_list.append(df['end2'][i])
+            strand_list.append('+')
+        else:
+            start_list.append(df['end2'][i])
+            end_list.append(df['start2'][i])
+            strand_list.append('-')
+    df['start2+'] = start_list
+    df['end2+'] = end_list
+    df['strand2'] = strand_list
+    df['length1'] = [abs(df['start1'][i] - df['end1'][i]) for i in range(len(df))]
+    df['length2'] = [abs(df['start2'][i] - df['end2'][i]) for i in range(len(df))]
+    return df
+
+@pytest.mark.parametrize('min_align_len', MIN_ALIGN_LENS)
+def test_yass_table_matches_legacy_parser(tmp_path, monkeypatch, min_align_len):
+    monkeypatch.setattr(parser_utils, 'CHUNK_SIZE', CHUNK_SIZE)
+    fname = str(tmp_path / 'alignments.yass')
+    WriteYassTable(fname, RandomAlignments(2))
+    expected = FilterLegacyTable(LegacyReadYassTable(fname), min_align_len)
+    actual = parser_utils.ReadYassTable(fname, min_align_len)
+    assert 0 < len(actual) <= NUM_ROWS
+    #### the legacy parser did not keep sequence names
+    columns = ['start1', 'end1', 'length1', 'strand2', 'start2+', 'end2+', 'length2', 'id%']
+    pd.testing.assert_frame_equal(NormalizeTable(actual, columns), NormalizeTable(expected, columns))
+
+#### PAF of minimap2 (tab-separated, number of matches) and mashmap (space-separated, identity)
+
+def WritePaf(fname, alignments, sep):
+    identity = alignments['matches'] if sep == '\t' else alignments['identity']
+    pd.DataFrame({0 : alignments['name2'], 1 : 200000, 2 : alignments['start2'], 3 : alignments['end2'], 4 : alignments['strand2'],
+                  5 : alignments['name1'], 6 : 200000, 7 : alignments['start1'], 8 : alignments['end1'], 9 : identity,
+                  10 : alignments['end1'] - alignments['start1'], 11 : 60}).to_csv(fname, sep = sep, header = False, index = False)
+
+def LegacyReadPaf(fname, sep):
+    #### PafReader.ParsePaf before the typed parsers
+    df = pd.read_csv(fname, header=None, sep=sep, usecols=range(10), comment="#", engine="python")
+    df = df.rename(columns={5: '#name1', 4: 'strand1', 7: 'start1', 8: 'end1', 0: 'name2', 2: 'start2+', 3: 'end2+', 9: 'id%'})
+    df['length1'] = (df['end1'].astype(int) - df['start1'].astype(int))
+    df['length2'] = (df['end2+'].astype(int) - df['start2+'].astype(int))
+    df['strand2'] = df['strand1']
+    df['strand1'] = '+'
+    if sep == '\t':
+        df['id%'] = df['id%'] / df[['length1', 'length2']].min(axis=1) * 100
+    df['id%'] = df['id%'].apply(lambda x: str(round(x, 1)) + '%')
+    return df[parser_utils.ALIGNMENT_COLUMNS]
+
+@pytest.mark.parametrize('sep', ['\t', ' '])
+@pytest.mark.parametrize('min_align_len', MIN_ALIGN_LENS)
+def test_paf_table_matches_legacy_parser(tmp_path, monkeypatch, sep, min_align_len):
+    monkeypatch.setattr(parser_utils, 'CHUNK_SIZE', CHUNK_SIZE)
+    fname = str(tmp_path / 'alignments.paf')
+    WritePaf(fname, RandomAlignments(3), sep)
+    expected = FilterLegacyTable(LegacyReadPaf(fname, sep), min_align_len)
+    actual = parser_utils.ReadPafTable(fname, sep, min_align_len)
+    assert 0 < len(actual) <= NUM_ROWS
+    pd.testing.assert_frame_equal(NormalizeTable(actual, parser_utils.ALIGNMENT_COLUMNS), NormalizeTable(expected, parser_utils.ALIGNMENT_COLUMNS))
+
+def test_filtered_out_table_is_empty(tmp_path):
+    fname = str(tmp_path / 'alignments.tsv')
+    WriteGeneralTable(fname, RandomAlignments(4), False)
+    df = parser_utils.ReadGeneralTable(fname, 10 ** 6)
+    pd.testing.assert_frame_equal(df, parser_utils.EmptyAlignmentTable())
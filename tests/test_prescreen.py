@@ -0,0 +1,51 @@
+import numpy as np
+
+import config_utils
+import data_utils
+import sketch_utils
+from conftest import SEQ_LEN, RandomSequence, MutateSequence, ReverseComplement, WriteFasta, WriteConfig, AlignSamples
+
+class ExternalAligner:
+    #### an aligner reading FASTA files itself, as all aligners except the built-in one do
+    def GetFingerprint(self):
+        return 'external'
+
+def test_containment_does_not_depend_on_strands():
+    rng = np.random.default_rng(0)
+    seq = RandomSequence(rng, SEQ_LEN)
+    related = MutateSequence(rng, seq, substitution_rate = 0.01)
+    sketch = sketch_utils.GetSketch(seq)
+    assert np.array_equal(sketch, sketch_utils.GetSketch(ReverseComplement(seq)))
+    containment = sketch_utils.GetContainment(sketch, sketch_utils.GetSketch(related))
+    assert containment > 0.5
+    assert sketch_utils.GetContainment(sketch, sketch_utils.GetSketch(ReverseComplement(related))) == containment
+    assert sketch_utils.GetContainment(sketch, sketch_utils.GetSketch(RandomSequence(rng, SEQ_LEN))) < 0.01
+    assert sketch_utils.GetContainment(sketch, sketch_utils.GetSketch('')) == 0
+
+def test_containment_of_a_part_is_full():
+    #### a short sequence contained in a long one is not pruned because of the difference of lengths
+    seq = RandomSequence(np.random.default_rng(1), SEQ_LEN)
+    assert sketch_utils.GetContainment(sketch_utils.GetSketch(seq), sketch_utils.GetSketch(seq[: SEQ_LEN // 3])) == 1
+
+def WriteUnrelatedSample(tmp_path, sample_fastas):
+    sample_fastas = dict(sample_fastas)
+    sample_fastas['x'] = str(tmp_path / 'fasta' / 'x.fasta')
+    WriteFasta(sample_fastas['x'], 'x', RandomSequence(np.random.default_rng(2), SEQ_LEN))
+    return WriteConfig(str(tmp_path / 'config.csv'), sample_fastas, ['a', 'x', 'c'])
+
+def test_unrelated_pairs_are_not_aligned(tmp_path, sample_fastas):
+    aligned_data = AlignSamples(WriteUnrelatedSample(tmp_path, sample_fastas), str(tmp_path / 'out'), ['--prescreen-threshold', '0.1'])
+    assert aligned_data.pruned_pairs == {(0, 1), (1, 2)}
+    assert sorted(aligned_data.align_dict) == [(0, 0), (0, 2), (1, 1), (2, 2)]
+    #### pruned pairs are shown as empty panels
+    assert len(aligned_data.GetAlignmentDF(0, 1)) == 0 and len(aligned_data.GetAlignmentDF(0, 2)) > 0
+
+def test_sequences_are_not_kept_for_external_aligners(tmp_path, sample_fastas):
+    config_csv = WriteUnrelatedSample(tmp_path, sample_fastas)
+    aligned_data = data_utils.AlignedData.__new__(data_utils.AlignedData)
+    aligned_data.config = config_utils.Config('', ['-i', config_csv, '-o', str(tmp_path / 'out'), '--prescreen-threshold', '0.1'])
+    aligned_data.input_data = data_utils.InputData(config_csv)
+    aligned_data.pairwise_aligner = ExternalAligner()
+    aligned_data._PrescreenPairs()
+    assert aligned_data.pruned_pairs == {(0, 1), (1, 2)}
+    assert len(aligned_data.input_data.seq_dict) == 0
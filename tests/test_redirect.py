@@ -0,0 +1,61 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+pwd = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(pwd, '..', 'py'))
+
+import utils
+import data_utils
+import store_utils
+
+LENGTHS = [5000, 7000, 3000]
+#### all combinations of strands of the first and the second sequences are covered by the pairs below
+STRANDS = ['+', '-', '-']
+PAIRS = [(0, 0), (0, 1), (1, 2), (2, 0)]
+
+class LengthInputData:
+    def GetLengthByIdx(self, idx):
+        return LENGTHS[idx]
+
+def RandomAlignmentTable(rng, len1, len2, num_rows = 50):
+    start1 = rng.integers(1, len1 // 2, num_rows)
+    start2 = rng.integers(1, len2 // 2, num_rows)
+    align_len = rng.integers(1, min(len1, len2) // 2, num_rows)
+    return pd.DataFrame({'start1' : start1, 'end1' : start1 + align_len, 'start2+' : start2, 'end2+' : start2 + align_len,
+                         'strand2' : rng.choice(['+', '-'], num_rows)})
+
+def LegacyRedirect(df, len1, len2, strand1, strand2):
+    #### the per-row loop used before _RedirectAlignments was vectorized
+    directed_pos_list = []
+    for i in range(len(df)):
+        pos1 = df['start1'][i], df['end1'][i]
+        pos2 = df['start2+'][i], df['end2+'][i]
+        if df['strand2'][i] == '-':
+            pos2 = df['end2+'][i], df['start2+'][i]
+        pos1 = utils.ModifyPos(pos1[0], len1, strand1) - 1, utils.ModifyPos(pos1[1], len1, strand1) - 1
+        pos2 = utils.ModifyPos(pos2[0], len2, strand2) - 1, utils.ModifyPos(pos2[1], len2, strand2) - 1
+        directed_pos_list.append([pos1[0], pos1[1], pos2[0], pos2[1]])
+    return pd.DataFrame(directed_pos_list, columns = ['start1_dir', 'end1_dir', 'start2_dir', 'end2_dir'])
+
+#### a budget of a few bytes spills every table to disk, so that AddColumns of spilled tables is checked as well
+@pytest.mark.parametrize('memory_budget_mb', [0, 1e-6])
+def test_redirect_matches_legacy_loop(tmp_path, memory_budget_mb):
+    rng = np.random.default_rng(0)
+    aligned_data = data_utils.AlignedData.__new__(data_utils.AlignedData)
+    aligned_data.input_data = LengthInputData()
+    aligned_data.strands = dict(enumerate(STRANDS))
+    aligned_data.align_dfs = store_utils.AlignmentStore(str(tmp_path), memory_budget_mb)
+    tables = dict()
+    for idx1, idx2 in PAIRS:
+        tables[idx1, idx2] = RandomAlignmentTable(rng, LENGTHS[idx1], LENGTHS[idx2])
+        aligned_data.align_dfs[idx1, idx2] = tables[idx1, idx2].copy()
+    aligned_data._RedirectAlignments()
+    for idx1, idx2 in PAIRS:
+        expected = LegacyRedirect(tables[idx1, idx2], LENGTHS[idx1], LENGTHS[idx2], STRANDS[idx1], STRANDS[idx2])
+        #### columns of spilled tables are memory-mapped and are copied to plain arrays before the comparison
+        df = aligned_data.align_dfs[idx1, idx2]
+        actual = pd.DataFrame({column : np.array(df[column]) for column in expected.columns})
+        pd.testing.assert_frame_equal(actual, expected)
@@ -0,0 +1,46 @@
+import pytest
+from urllib.parse import parse_qs
+
+import config_utils
+import server_utils
+
+class OneSampleData:
+    def NumSamples(self):
+        return 1
+
+    def GetLabelByIdx(self, idx):
+        return 'a'
+
+    def GetSampleNameByIdx(self, idx):
+        return 'a'
+
+def GetPlotServer(tmp_path, extra_args):
+    config_csv = str(tmp_path / 'config.csv')
+    with open(config_csv, 'w') as fh:
+        fh.write('SampleID,Label,Fasta\n')
+    config = config_utils.Config('', ['-i', config_csv, '-o', str(tmp_path / 'out')] + extra_args)
+    return server_utils.PlotServer(OneSampleData(), config)
+
+def test_request_flags_override_command_line(tmp_path):
+    plot_server = GetPlotServer(tmp_path, ['--lower', '--show-bp', '--lod', '--transparent', '--min-pi', '80'])
+    view_config = plot_server.GetViewConfig(parse_qs('lower=0&show-bp=0&lod=0&transparent=0&hide-legend=1&max-pi=99.5'))
+    assert view_config.upper_triangle and not view_config.show_breakpoints and not view_config.lod and not view_config.transparent
+    assert view_config.hide_legend and view_config.pi_min == 80 and view_config.pi_max == 99.5
+    #### options missing in the query keep their command line values, and the command line config is not changed
+    view_config = plot_server.GetViewConfig(parse_qs('show-bp=1'))
+    assert not view_config.upper_triangle and view_config.show_breakpoints and view_config.lod
+    assert not plot_server.config.upper_triangle
+    off_key = tuple(getattr(plot_server.GetViewConfig(parse_qs('lower=0')), attribute) for attribute in server_utils.VIEW_ATTRIBUTES)
+    on_key = tuple(getattr(plot_server.GetViewConfig(parse_qs('lower=1')), attribute) for attribute in server_utils.VIEW_ATTRIBUTES)
+    assert off_key != on_key
+
+@pytest.mark.parametrize('query', ['lower=yes', 'min-pi=high', 'threads=4', 'aligner=custom'])
+def test_invalid_requests_are_rejected(tmp_path, query):
+    plot_server = GetPlotServer(tmp_path, [])
+    with pytest.raises(ValueError):
+        plot_server.GetViewConfig(parse_qs(query))
+
+def test_checkboxes_start_with_command_line_flags(tmp_path):
+    html = GetPlotServer(tmp_path, ['--lower', '--lod']).GetIndexPage().decode()
+    assert 'name="lower" checked' in html and 'name="lod" checked' in html
+    assert 'name="show-bp">' in html and 'name="transparent">' in html
@@ -0,0 +1,66 @@
+import os
+import json
+import numpy as np
+import pytest
+
+import config_utils
+import data_utils
+import snapshot_utils
+from conftest import SAMPLE_NAMES, WriteConfig, AlignSamples
+
+def LoadSnapshot(config):
+    #### the loading part of PatchWorkPlot --render-only
+    snapshot_meta = snapshot_utils.ReadSnapshotMeta(config)
+    input_data = data_utils.InputData(config.input_csv, snapshot_meta['locus_lens'])
+    return data_utils.AlignedData.FromSnapshot(input_data, config, snapshot_meta)
+
+def RenderOnlyConfig(config, extra_args = []):
+    return config_utils.Config('', ['-i', config.input_csv, '-o', config.output_dir, '--aligner', 'kmer', '--min-len', '1000', '--render-only'] + extra_args)
+
+@pytest.fixture
+def saved_run(tmp_path, sample_fastas):
+    aligned_data = AlignSamples(WriteConfig(str(tmp_path / 'config.csv'), sample_fastas, SAMPLE_NAMES), str(tmp_path / 'out'))
+    snapshot_utils.SaveSnapshot(aligned_data, aligned_data.config)
+    return aligned_data
+
+def test_snapshot_restores_processed_alignments(saved_run):
+    restored = LoadSnapshot(RenderOnlyConfig(saved_run.config))
+    assert list(restored.strands) == list(saved_run.strands)
+    assert restored.pruned_pairs == saved_run.pruned_pairs
+    for idx1, idx2 in saved_run.IndexPairIterator():
+        expected = saved_run.GetAlignmentDF(idx1, idx2)
+        actual = restored.GetAlignmentDF(idx1, idx2)
+        assert len(actual) > 0
+        for column in snapshot_utils.SNAPSHOT_COLUMNS:
+            assert np.array_equal(np.array(actual[column]), np.array(expected[column]))
+
+def test_changed_parameters_are_rejected(saved_run):
+    with pytest.raises(snapshot_utils.SnapshotError, match = 'parameters have changed'):
+        LoadSnapshot(RenderOnlyConfig(saved_run.config, ['--min-len', '2000']))
+
+def test_changed_fasta_is_rejected(saved_run, sample_fastas):
+    with open(sample_fastas['b'], 'a') as fh:
+        fh.write('ACGT\n')
+    with pytest.raises(snapshot_utils.SnapshotError, match = 'parameters have changed'):
+        LoadSnapshot(RenderOnlyConfig(saved_run.config))
+
+def test_changed_alignment_file_is_rejected(saved_run):
+    align_fname = next(iter(saved_run.align_dict.values()))
+    with open(align_fname, 'a') as fh:
+        fh.write('\n')
+    with pytest.raises(snapshot_utils.SnapshotError, match = 'alignment file'):
+        LoadSnapshot(RenderOnlyConfig(saved_run.config))
+
+def test_missing_or_foreign_snapshot_is_rejected(saved_run):
+    config = RenderOnlyConfig(saved_run.config)
+    meta_json = os.path.join(config.snapshot_dir, 'meta.json')
+    with open(meta_json) as fh:
+        meta = json.load(fh)
+    meta['version'] = snapshot_utils.SNAPSHOT_VERSION + 1
+    with open(meta_json, 'w') as fh:
+        json.dump(meta, fh)
+    with pytest.raises(snapshot_utils.SnapshotError, match = 'another version'):
+        LoadSnapshot(config)
+    os.remove(meta_json)
+    with pytest.raises(snapshot_utils.SnapshotError, match = 'was not found'):
+        LoadSnapshot(config)
@@ -0,0 +1,65 @@
+import os
+import numpy as np
+import pandas as pd
+
+import table_utils
+import store_utils
+
+def RandomTable(rng, num_rows):
+    start1 = rng.integers(0, 100000, num_rows)
+    df = pd.DataFrame({'start1' : start1, 'end1' : start1 + rng.integers(100, 1000, num_rows),
+                       'strand2' : rng.choice(['+', '-'], num_rows), 'id%' : rng.uniform(70, 100, num_rows)})
+    df['strand2'] = df['strand2'].astype('category')
+    return df
+
+def ToPlainTable(df):
+    #### spilled columns are memory-mapped
+    return pd.DataFrame({column : df[column] if column == 'strand2' else np.array(df[column]) for column in df.columns})
+
+def TableSizeMb(df):
+    return df.memory_usage(deep = True).sum() / 1024 / 1024
+
+def test_tables_over_budget_are_spilled(tmp_path):
+    rng = np.random.default_rng(0)
+    tables = {(0, 1) : RandomTable(rng, 1000), (1, 2) : RandomTable(rng, 1000), (2, 2) : RandomTable(rng, 10)}
+    #### the first table fits the budget, the second one does not, the last small one fits again
+    store = store_utils.AlignmentStore(str(tmp_path), TableSizeMb(tables[0, 1]) + TableSizeMb(tables[2, 2]))
+    for key, df in tables.items():
+        store[key] = df.copy()
+    assert list(store) == list(tables)
+    assert store.NumSpilled() == 1 and (1, 2) in store.spilled_tables
+    for key, df in tables.items():
+        pd.testing.assert_frame_equal(ToPlainTable(store[key]), df)
+
+    #### new columns of spilled tables are appended on disk
+    directed = np.arange(len(tables[1, 2]))
+    store.AddColumns((1, 2), {'start1_dir' : directed})
+    assert np.array_equal(store[1, 2]['start1_dir'], directed)
+    store.AddColumns((0, 1), {'start1_dir' : np.arange(len(tables[0, 1]))})
+    assert store.memory_size == sum(store.table_sizes.values())
+
+def test_overwritten_tables_release_memory_and_spill_files(tmp_path):
+    rng = np.random.default_rng(1)
+    big_df = RandomTable(rng, 1000)
+    store = store_utils.AlignmentStore(str(tmp_path), TableSizeMb(big_df) * 1.5)
+    store[0, 1] = big_df
+    store[1, 2] = RandomTable(rng, 1000)
+    spilled_dir = store.spilled_tables[1, 2]
+    assert os.path.isdir(spilled_dir)
+
+    #### a smaller table takes the place of the first one, so that the second one fits into memory after overwriting
+    store[0, 1] = RandomTable(rng, 10)
+    store[1, 2] = RandomTable(rng, 1000)
+    assert store.NumSpilled() == 0 and not os.path.exists(spilled_dir)
+    assert store.memory_size == sum(store.table_sizes.values())
+    assert len(store) == 2
+
+def test_external_table_dirs_are_kept(tmp_path):
+    rng = np.random.default_rng(2)
+    table_dir = str(tmp_path / 'snapshot_table')
+    table_utils.SaveColumnTable(RandomTable(rng, 100), table_dir, dict())
+    store = store_utils.AlignmentStore(str(tmp_path), 1e-6)
+    store.AddTableDir((0, 0), table_dir)
+    store[0, 0] = RandomTable(rng, 100)
+    assert os.path.isdir(table_dir)
+    assert store.spilled_tables[0, 0] != table_dir
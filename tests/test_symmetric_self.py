@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import parser_utils
+
+SEQ_LEN = 10000
+COLUMNS = ['start1', 'end1', 'start2+', 'end2+', 'strand2', 'id%']
+
+def HalfSelfAlignmentTable(rng, num_rows = 30):
+    #### alignments of repeats above the diagonal, as reported by lastz --self --nomirror
+    start1 = rng.integers(1, SEQ_LEN // 2, num_rows)
+    start2 = start1 + rng.integers(1000, SEQ_LEN // 2 - 1000, num_rows)
+    align_len = rng.integers(100, 1000, num_rows)
+    df = pd.DataFrame({'#name1' : 'chr1', 'strand1' : '+', 'start1' : start1, 'end1' : start1 + align_len, 'length1' : align_len,
+                       'name2' : 'chr1', 'strand2' : rng.choice(['+', '-'], num_rows), 'start2+' : start2, 'end2+' : start2 + align_len,
+                       'length2' : align_len, 'id%' : np.round(rng.uniform(70, 100, num_rows), 1)})
+    for c in ['strand1', 'strand2']:
+        df[c] = df[c].astype('category')
+    return df
+
+def RowSet(df):
+    return set(zip(*[df[column].astype(str) if column == 'strand2' else df[column] for column in COLUMNS]))
+
+def test_lastz_self_table_is_mirror_symmetric():
+    half_df = HalfSelfAlignmentTable(np.random.default_rng(0))
+    complete_df = parser_utils.CompleteSelfAlignmentTable(half_df, SEQ_LEN, 1, True)
+    assert list(complete_df.columns) == parser_utils.ALIGNMENT_COLUMNS
+    assert len(complete_df) == 2 * len(half_df) + 1
+    rows = RowSet(complete_df)
+    assert rows == RowSet(parser_utils.SwapAlignedSequences(complete_df))
+    assert (1, SEQ_LEN, 1, SEQ_LEN, '+', 100.0) in rows
+    assert RowSet(half_df) <= rows
+
+@pytest.mark.parametrize('num_rows', [0, 5])
+def test_paf_self_table_gets_only_the_diagonal(num_rows):
+    #### minimap2 -X still reports both copies of repeats, the trivial alignment is the only missing one
+    half_df = HalfSelfAlignmentTable(np.random.default_rng(1), num_rows)
+    complete_df = parser_utils.CompleteSelfAlignmentTable(half_df, SEQ_LEN, 0, False)
+    assert len(complete_df) == num_rows + 1
+    assert complete_df['strand2'].dtype == 'category'
+    diagonal = complete_df.iloc[0]
+    assert (diagonal['start1'], diagonal['end1'], diagonal['start2+'], diagonal['end2+'], diagonal['length1']) == (0, SEQ_LEN, 0, SEQ_LEN, SEQ_LEN)
+    assert RowSet(complete_df.iloc[1:]) == RowSet(half_df)